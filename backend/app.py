@@ -1,34 +1,347 @@
-from flask import Flask, jsonify, request
+import base64
+import binascii
+import json
+import time
+from datetime import datetime, timezone
+
+from flask import Blueprint, Flask, Response, g, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import is_resource_modified
 # Use a direct import so the module can be run as a script
-from storage import create_item, get_all, get_by_id, delete_item, find_by_name_exact, filter_by_category, update_item
+import config
+import json_codec
+import metrics
+import profiling
+from events import format_event
+from query import Query
+from store_base import SORT_FIELDS, STAT_GROUPS
+from validation import ValidationError, is_date
+from storage import create_item, get_all, get_all_json, get_versioned, library_version, get_changes, get_page, get_stats, query_items, query_items_json, delete_item, find_by_name_exact, filter_by_category, update_item, search_items, apply_batch, broker
+
+media = Blueprint("media", __name__)
+
+ITEM_FIELDS = ("id", "name", "publication_date", "author", "category")
+PAGE_LIMIT_MAX = 1000
+EXPORT_BATCH = 1000
+
+def encode_cursor(item, sort="id", descending=False):
+    data = {"id": item["id"]}
+    if sort != "id":
+        # Other orders resume after (sort field, id) of the last item.
+        data.update(sort=sort, key=item.get(SORT_FIELDS[sort]))
+    if descending:
+        data["order"] = "desc"
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort="id", descending=False):
+    """Return ``(item id, sort field value)`` stored in a cursor, or raise ValueError."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        item_id, key = str(data["id"]), data.get("key")
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("invalid cursor")
+    if data.get("sort", "id") != sort or (data.get("order") == "desc") != descending:
+        raise ValueError("cursor belongs to a different sort order")
+    return item_id, None if key is None else str(key)
+
+def parse_fields(raw):
+    """Return the requested projection as a tuple, None for all fields, or raise ValueError."""
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in fields if f not in ITEM_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"fields must be a comma-separated subset of: {', '.join(ITEM_FIELDS)}")
+    return fields
+
+class JsonProvider(DefaultJSONProvider):
+    """Flask's JSON provider (``app.json``, used by ``jsonify``) on top of ``json_codec``.
+
+    Keys keep their order and non-ASCII text is sent as UTF-8, matching the
+    item fragments that list responses are assembled from. Debug mode
+    still pretty-prints through the stdlib.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return json_codec.dumps(obj, self.default).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_codec.dumps(obj, self.default) + b"\n", mimetype=self.mimetype)
+
+def json_array(fragments):
+    """A JSON response assembled from already encoded items."""
+    return Response(json_codec.array(fragments) + b"\n", mimetype="application/json")
+
+def project(items, fields):
+    if fields is None:
+        return items
+    return [{f: item.get(f) for f in fields} for item in items]
 
-app = Flask(__name__)
+def not_modified(etag, modified, version=None):
+    """Return a 304 response if the request's If-None-Match/If-Modified-Since
+    still match, else None. Checked before anything is serialized."""
+    last_modified = datetime.fromtimestamp(modified, timezone.utc) if modified else None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), etag, modified, version)
 
-@app.route("/media", methods=["GET"])
+def with_validators(resp, etag, modified, version=None):
+    """Add the caching headers; ``version`` is the library version the body
+    is current for, which lets clients skip revalidating until it moves."""
+    resp.set_etag(etag)
+    if version is not None:
+        resp.headers["X-Library-Version"] = str(version)
+    if modified:
+        resp.last_modified = datetime.fromtimestamp(modified, timezone.utc)
+    # Caches may keep the body but must revalidate it on every use.
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+@media.route("/media", methods=["GET"])
 def list_media():
-    category = request.args.get("category")
-    if category:
-        items = filter_by_category(category)
+    """The library, or the items matching the filters, optionally paged.
+
+    ``category`` and ``author`` may be repeated (categories also
+    comma-separated) and match any of the given values;
+    ``published_after`` and ``published_before`` (YYYY-MM-DD, also
+    accepted as ``date_from`` and ``date_to``) are inclusive. ``sort``,
+    ``order`` and ``offset`` apply with or without paging; ``limit`` or
+    ``cursor`` asks for pages, with ``X-Total-Count`` counting all matches.
+    """
+    categories = [c for raw in request.args.getlist("category") for c in raw.split(",") if c]
+    authors = [a for a in request.args.getlist("author") if a]
+    bounds = {}
+    for name, alias in (("published_after", "date_from"), ("published_before", "date_to")):
+        key = name if request.args.get(name) else alias
+        value = bounds[name] = request.args.get(key) or None
+        if value is not None and not is_date(value):
+            return jsonify({"error": f"{key} must be a date in YYYY-MM-DD format"}), 400
+    published_after, published_before = bounds["published_after"], bounds["published_before"]
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    paged = "limit" in request.args or "cursor" in request.args
+    limit = request.args.get("limit", 100, type=int)
+    if paged and (limit is None or limit < 1):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    sort = request.args.get("sort") or "id"
+    if sort not in SORT_FIELDS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_FIELDS)}"}), 400
+    order = request.args.get("order") or "asc"
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "order must be asc or desc"}), 400
+    # offset lets a scrolling view jump straight to row N; cursors are
+    # cheaper for walking page after page.
+    offset = request.args.get("offset", 0, type=int)
+    if offset is None or offset < 0:
+        return jsonify({"error": "offset must be a non-negative integer"}), 400
+    after, after_value = None, None
+    if request.args.get("cursor"):
+        if offset:
+            return jsonify({"error": "offset cannot be combined with cursor"}), 400
+        try:
+            after, after_value = decode_cursor(request.args["cursor"], sort, order == "desc")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    # Every response for this URL is the same until the library version
+    # moves. Read the version before the items so the tag is never newer
+    # than the body.
+    version, modified = library_version()
+    etag = f"v{version}"
+    cached = not_modified(etag, modified, version)
+    if cached:
+        return cached
+
+    query = Query(categories, authors, published_after, published_before, sort, order == "desc")
+    # Without limit/cursor the whole (filtered) library is returned as before.
+    # Whole items are joined from their cached encodings; projections are
+    # encoded afresh.
+    if not paged:
+        ordered = "sort" in request.args or "order" in request.args or offset
+        if ordered or len(query.categories) > 1 or query.authors or query.dated:
+            if fields is None:
+                body = json_array(query_items_json(query, offset=offset)[0])
+            else:
+                body = jsonify(project(query_items(query, offset=offset)[0], fields))
+        elif fields is None:
+            body = json_array(get_all_json(categories[0] if categories else None))
+        else:
+            items = filter_by_category(categories[0]) if categories else get_all()
+            body = jsonify(project(items, fields))
+        # Clients that mirror the list pass X-Library-Version to /media/changes later.
+        return with_validators(body, etag, modified, version), 200
+
+    limit = min(limit, PAGE_LIMIT_MAX)
+    if fields is None:
+        fragments, total, last = query_items_json(query, limit, after, after_value, offset)
+        count, resp = len(fragments), json_array(fragments)
     else:
-        items = get_all()
-    return jsonify(items), 200
+        items, total = query_items(query, limit, after, after_value, offset)
+        count, last = len(items), items[-1] if items else None
+        resp = jsonify(project(items, fields))
+    resp = with_validators(resp, etag, modified, version)
+    # Items come in sort order; the cursor resumes after the last one sent.
+    resp.headers["X-Total-Count"] = str(total)
+    if count == limit:
+        resp.headers["X-Next-Cursor"] = encode_cursor(last, sort, query.descending)
+    return resp, 200
+
+SEARCH_LIMIT_MAX = 500
+
+@media.route("/media/export", methods=["GET"])
+def export_media():
+    """Stream the (optionally category-filtered) library as NDJSON, one item per line.
+
+    Items are read from the store a batch at a time in id order, so memory
+    stays flat and the first bytes go out immediately. The export is not a
+    point-in-time snapshot: items written meanwhile may or may not appear,
+    but no id is sent twice.
+    """
+    category = request.args.get("category") or None
+
+    def generate():
+        after = None
+        while True:
+            items, _ = get_page(EXPORT_BATCH, after, category)
+            if items:
+                yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+            if len(items) < EXPORT_BATCH:
+                return
+            after = items[-1]["id"]
+
+    return Response(generate(), mimetype="application/x-ndjson")
 
-@app.route("/media/search", methods=["GET"])
+@media.route("/media/changes", methods=["GET"])
+def media_changes():
+    """Items written and ids deleted after library version ``since``.
+
+    Answers 410 with ``resync: true`` once the change journal no longer
+    reaches back that far; the client then reloads GET /media.
+    """
+    since = request.args.get("since", type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "since must be a non-negative library version"}), 400
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    changes = get_changes(since)
+    if changes is None:
+        version, _ = library_version()
+        return jsonify({"error": "Changes since this version are no longer available; reload the full list",
+                        "resync": True, "version": version}), 410
+    version, upserted, deleted = changes
+    return jsonify({"version": version, "upserted": project(upserted, fields), "deleted": deleted}), 200
+
+@media.route("/media/events", methods=["GET"])
+def media_events():
+    """Server-sent events for library changes.
+
+    ``create``/``update`` carry the item, ``delete`` its id and ``sync``
+    (sent first, after a batch, for writes made by other processes and when
+    this client fell too far behind) only the version: fetch
+    /media/changes?since=<last version seen> on it. Every event id is the
+    library version. The stream ends after EVENT_STREAM_SECONDS and the
+    client reconnects.
+    """
+    def stream():
+        sub = broker.subscribe()
+        try:
+            yield f"retry: 2000\n{format_event('sync', library_version()[0], {'reason': 'connected'})}"
+            deadline = time.monotonic() + config.EVENT_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                text = sub.get(config.EVENT_HEARTBEAT_SECONDS)
+                # Comments keep proxies from closing an idle stream and let
+                # the server notice clients that went away.
+                yield text if text is not None else ": keep-alive\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    resp = Response(stream(), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+@media.route("/media/search", methods=["GET"])
 def search_media():
+    # q: ranked word/prefix search over name and author; name: exact title match
+    query = request.args.get("q", "").strip()
     name = request.args.get("name")
-    if not name:
-        return jsonify({"error": "name query param required"}), 400
-    items = find_by_name_exact(name)
-    return jsonify(items), 200
+    limit = request.args.get("limit", 50, type=int)
+    if query and (limit is None or limit < 1):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    if not query and not name:
+        return jsonify({"error": "q or name query param required"}), 400
+    version, modified = library_version()
+    etag = f"v{version}"
+    cached = not_modified(etag, modified, version)
+    if cached:
+        return cached
+    if query:
+        items = search_items(query, min(limit, SEARCH_LIMIT_MAX))
+    else:
+        items = find_by_name_exact(name)
+    return with_validators(jsonify(items), etag, modified, version), 200
 
-@app.route("/media/<item_id>", methods=["GET"])
+@media.route("/media/stats", methods=["GET"])
+def media_stats():
+    """Item counts grouped by ``group_by``: category (default), year or author.
+
+    ``start`` and ``end`` (YYYY-MM-DD, inclusive) count only items published
+    in that range; ``limit`` keeps the largest groups. Years come oldest
+    first, other groups largest first. The counts are kept up to date by
+    every write, so a request costs O(groups), not O(items).
+    """
+    group = request.args.get("group_by") or "category"
+    if group not in STAT_GROUPS:
+        return jsonify({"error": f"group_by must be one of: {', '.join(STAT_GROUPS)}"}), 400
+    start = request.args.get("start") or None
+    end = request.args.get("end") or None
+    for name, value in (("start", start), ("end", end)):
+        if value is not None and not is_date(value):
+            return jsonify({"error": f"{name} must be a date in YYYY-MM-DD format"}), 400
+    limit = request.args.get("limit", type=int)
+    if "limit" in request.args and (limit is None or limit < 1):
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    version, modified = library_version()
+    etag = f"v{version}"
+    cached = not_modified(etag, modified, version)
+    if cached:
+        return cached
+    counts = get_stats(group, start, end)
+    if group == "year":
+        # Items without an ISO date come last.
+        groups = sorted(counts.items(), key=lambda kv: (kv[0] is None, kv[0] or 0))
+    else:
+        groups = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+    body = {"group_by": group, "total": sum(counts.values()),
+            "groups": [{"value": value, "count": n} for value, n in groups[:limit]]}
+    return with_validators(jsonify(body), etag, modified, version), 200
+
+@media.route("/media/<item_id>", methods=["GET"])
 def get_media(item_id):
-    item = get_by_id(item_id)
+    library, modified = library_version()
+    item, version = get_versioned(item_id)
     if not item:
         return jsonify({"error": "not found"}), 404
-    return jsonify(item), 200
+    # The item version names one state of this item, so it is a strong tag.
+    etag = f"i{version}"
+    cached = not_modified(etag, modified, library)
+    if cached:
+        return cached
+    return with_validators(jsonify(item), etag, modified, library), 200
 
-@app.route("/media", methods=["POST"])
+@media.route("/media", methods=["POST"])
 def create_media():
     try:
         data = request.get_json()
@@ -39,12 +352,47 @@ def create_media():
         # Call create_item which will validate
         item = create_item(data["name"], data["publication_date"], data["author"], data["category"])
         return jsonify(item), 201
+    except ValidationError as e:
+        return jsonify({"error": str(e), "fields": e.errors}), 400
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-@app.route("/media/<item_id>", methods=["DELETE"])
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+def read_batch_rows():
+    """Parse the batch body: NDJSON (one row per line, read as it streams in) or a JSON array."""
+    if request.mimetype in NDJSON_TYPES:
+        rows = []
+        for line_no, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                raise ValueError(f"Invalid JSON on line {line_no}")
+        return rows
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        raise ValueError("Body must be a JSON array or NDJSON rows")
+    return rows
+
+@media.route("/media/batch", methods=["POST"])
+def batch_media():
+    try:
+        rows = read_batch_rows()
+        atomic = request.args.get("atomic", "true").lower() not in ("0", "false", "no")
+        result = apply_batch(rows, atomic=atomic)
+        status = 400 if result["errors"] and not result["applied"] else 200
+        return jsonify(result), status
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
+@media.route("/media/<item_id>", methods=["DELETE"])
 def delete_media(item_id):
     try:
         if delete_item(item_id):
@@ -54,7 +402,7 @@ def delete_media(item_id):
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
-@app.route("/media/<item_id>", methods=["PUT"])
+@media.route("/media/<item_id>", methods=["PUT"])
 def update_media(item_id):
     try:
         data = request.get_json()
@@ -65,10 +413,57 @@ def update_media(item_id):
         # Call update_item which will validate
         item = update_item(item_id, data["name"], data["publication_date"], data["author"], data["category"])
         return jsonify(item), 200
+    except ValidationError as e:
+        return jsonify({"error": str(e), "fields": e.errors}), 400
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+@media.route("/metrics", methods=["GET"])
+def get_metrics():
+    if not config.METRICS:
+        return jsonify({"error": "metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def route_name():
+    # The URL rule, not the path, so every item id counts under one route.
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+def start_timer():
+    g.request_start = time.perf_counter()
+
+def record_request(resp):
+    metrics.observe_request(route_name(), request.method, resp.status_code,
+                            time.perf_counter() - g.request_start)
+    return resp
+
+def finish_profile(resp):
+    if profiling.active():
+        # Never measure a streamed body: that would run its generator here
+        # and send nothing until the stream had ended.
+        size = None if resp.is_streamed else resp.content_length
+        profiling.finish_request(route_name(), request.method, resp.status_code,
+                                 request.content_length or 0, size)
+    return resp
+
+def create_app():
+    """Build the Flask application. Servers use the module-level ``app``
+    (also ``wsgi.app``); call this only for a separate instance, e.g. in tests."""
+    app = Flask(__name__)
+    app.json = JsonProvider(app)
+    app.config["DEBUG"] = config.DEBUG
+    app.register_blueprint(media)
+    if config.METRICS:
+        app.before_request(start_timer)
+        app.after_request(record_request)
+    # Always installed: profiling can be switched on without a restart.
+    app.before_request(profiling.start_request)
+    app.after_request(finish_profile)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
+    # Werkzeug's development server; use serve.py to run for real.
+    app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
@@ -0,0 +1,83 @@
+"""Backend settings, overridable through LIBRARY_* environment variables."""
+import os
+from pathlib import Path
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+DATA_DIR = Path(os.environ.get("LIBRARY_DATA_DIR") or Path(__file__).resolve().parent.parent / "data")
+
+# Storage engine: "json" (library.json + mutation log) or "sqlite".
+STORAGE_BACKEND = os.environ.get("LIBRARY_STORAGE", "json").strip().lower()
+
+SQLITE_PATH = Path(os.environ.get("LIBRARY_SQLITE_PATH") or DATA_DIR / "library.db")
+
+# The mutation log is folded into library.json once it grows past this size.
+WAL_COMPACT_BYTES = int(os.environ.get("LIBRARY_WAL_COMPACT_BYTES", 8 * 1024 * 1024))
+
+# fsync every log append (survives power loss) instead of only flushing it.
+WAL_FSYNC = _env_bool("LIBRARY_WAL_FSYNC", False)
+
+# Also write each snapshot as a binary image (library.snap) that later loads
+# memory-map instead of parsing library.json.
+BINARY_SNAPSHOT = _env_bool("LIBRARY_BINARY_SNAPSHOT", True)
+
+# Keep a sorted publication_date index so date ranges are served by bisection.
+DATE_INDEX = _env_bool("LIBRARY_DATE_INDEX", True)
+
+# Item changes remembered for GET /media/changes; older clients must resync.
+CHANGE_JOURNAL_SIZE = int(os.environ.get("LIBRARY_CHANGE_JOURNAL_SIZE", 10000))
+
+# GET /media/events: events a client may fall behind before it is told to
+# resync, seconds between keep-alive comments, how often other processes'
+# writes are looked for, and how long one stream lasts before the client
+# reconnects (each open stream holds a server thread).
+EVENT_QUEUE_SIZE = int(os.environ.get("LIBRARY_EVENT_QUEUE_SIZE", 256))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("LIBRARY_EVENT_HEARTBEAT_SECONDS", 15))
+EVENT_POLL_SECONDS = float(os.environ.get("LIBRARY_EVENT_POLL_SECONDS", 1))
+EVENT_STREAM_SECONDS = float(os.environ.get("LIBRARY_EVENT_STREAM_SECONDS", 300))
+
+# JSON encoder for responses and library files: "auto" (orjson if
+# installed), "orjson" or "stdlib".
+JSON_LIBRARY = os.environ.get("LIBRARY_JSON", "auto").strip().lower()
+
+# Memory for the encoded JSON of items that list responses are assembled
+# from (JSON engine only); 0 turns the cache off.
+FRAGMENT_CACHE_MB = float(os.environ.get("LIBRARY_FRAGMENT_CACHE_MB", 128))
+
+# Count requests and time storage internals for GET /metrics. Off, the
+# hooks are not installed and /metrics answers 404.
+METRICS = _env_bool("LIBRARY_METRICS", True)
+
+# Profiling of slow requests (see profiling.py): "off", "sample" or
+# "cprofile", the latency above which a request is dumped, the sampling
+# interval, where dumps go and how many are kept. PROFILE_CONTROL overrides
+# mode, threshold_ms and sample_ms on a running server.
+PROFILE_MODE = os.environ.get("LIBRARY_PROFILE", "off").strip().lower()
+PROFILE_THRESHOLD_MS = float(os.environ.get("LIBRARY_PROFILE_THRESHOLD_MS", 500))
+PROFILE_SAMPLE_MS = float(os.environ.get("LIBRARY_PROFILE_SAMPLE_MS", 5))
+PROFILE_DIR = Path(os.environ.get("LIBRARY_PROFILE_DIR") or DATA_DIR / "profiles")
+PROFILE_CONTROL = Path(os.environ.get("LIBRARY_PROFILE_CONTROL") or DATA_DIR / "profiling.json")
+PROFILE_MAX_FILES = int(os.environ.get("LIBRARY_PROFILE_MAX_FILES", 200))
+
+# -- serving (serve.py / app.py) ----------------------------------------------
+
+HOST = os.environ.get("LIBRARY_HOST", "127.0.0.1")
+PORT = int(os.environ.get("LIBRARY_PORT", 5000))
+
+# Flask debug mode: the interactive debugger and reloader. Never enable it on
+# a server others can reach.
+DEBUG = _env_bool("LIBRARY_DEBUG", False)
+
+# WSGI server for serve.py: "auto" picks gunicorn, then waitress, then
+# Werkzeug's threaded server, whichever is installed and runs on this OS.
+SERVER = os.environ.get("LIBRARY_SERVER", "auto").strip().lower()
+
+# Worker processes (gunicorn only) and request threads per process.
+WORKERS = int(os.environ.get("LIBRARY_WORKERS", min(2 * (os.cpu_count() or 1) + 1, 8)))
+THREADS = int(os.environ.get("LIBRARY_THREADS", 8))
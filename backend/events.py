@@ -0,0 +1,120 @@
+"""Publish/subscribe of library changes for the GET /media/events stream."""
+import json
+import queue
+import threading
+
+import config
+
+
+def format_event(event, version, data):
+    """Encode one server-sent event; the id is the library version it reports."""
+    payload = json.dumps({"version": version, **data}, ensure_ascii=False)
+    return f"id: {version}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """Bounded queue of encoded events for one client.
+
+    Writers never wait on it: when the client falls ``maxsize`` events
+    behind, its backlog is dropped and replaced by a single ``sync`` event,
+    after which the client catches up through GET /media/changes.
+    """
+
+    def __init__(self, maxsize):
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self.overflows = 0
+
+    def offer(self, text, version):
+        with self._lock:
+            try:
+                self._queue.put_nowait(text)
+                return
+            except queue.Full:
+                pass
+            self.overflows += 1
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put_nowait(format_event("sync", version, {"reason": "overflow"}))
+
+    def get(self, timeout):
+        """Return the next encoded event, or None after ``timeout`` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Fans library changes out to the subscribed clients of this process.
+
+    ``storage`` publishes ``create``/``update``/``delete`` events as its
+    write functions succeed, and ``sync`` for batches. Writes made by other
+    processes (server workers, scripts) are noticed by a watcher thread that
+    runs while anyone is subscribed: it polls ``version_fn`` and publishes a
+    ``sync`` event when the library moved past the last version published
+    here. Clients answer ``sync`` by fetching GET /media/changes.
+    """
+
+    def __init__(self, version_fn, queue_size=None, poll_seconds=None):
+        self._version_fn = version_fn
+        self.queue_size = config.EVENT_QUEUE_SIZE if queue_size is None else queue_size
+        self.poll_seconds = config.EVENT_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._published = 0
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def subscribe(self):
+        sub = Subscription(self.queue_size)
+        with self._lock:
+            if not self._subscribers:
+                self._published = self._version_fn()
+            self._subscribers.append(sub)
+            self._stop.clear()
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="library-events", daemon=True)
+                self._watcher.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            if not self._subscribers:
+                self._stop.set()
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, **data):
+        """Send ``event`` to every subscriber without blocking; a no-op when nobody listens."""
+        if not self._subscribers:
+            return
+        version = self._version_fn()
+        with self._lock:
+            self._published = max(self._published, version)
+            subscribers = list(self._subscribers)
+        text = format_event(event, version, data)
+        for sub in subscribers:
+            sub.offer(text, version)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                version = self._version_fn()
+            except Exception:
+                continue  # storage briefly unavailable; try again next round
+            if version > self._published:
+                self.publish("sync")
+        with self._lock:
+            self._watcher = None
+            if self._subscribers:
+                # Someone subscribed while this thread was stopping.
+                self._stop.clear()
+                self._watcher = threading.Thread(target=self._watch, name="library-events", daemon=True)
+                self._watcher.start()
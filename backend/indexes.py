@@ -0,0 +1,251 @@
+"""Secondary indexes over the in-memory library."""
+from bisect import bisect_left, bisect_right, insort
+
+from records import date_key, id_key
+
+
+class SortedIndex:
+    """Record ids ordered by ``(key(record), id)``.
+
+    Keys and ids live in two parallel lists so a key range or a cursor
+    position is found by bisection. Ties are ordered by ``records.id_key``.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.keys = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rebuild(self, items):
+        rows = sorted((self.key(item), id_key(item.id), item.id) for item in items)
+        self.keys = [row[0] for row in rows]
+        self.ids = [row[2] for row in rows]
+
+    def add(self, item):
+        key = self.key(item)
+        pos = self._position(key, item.id)
+        self.keys.insert(pos, key)
+        self.ids.insert(pos, item.id)
+
+    def remove(self, item):
+        item_id = item.id
+        pos = self._position(self.key(item), item_id)
+        if pos < len(self.ids) and self.ids[pos] == item_id:
+            del self.keys[pos]
+            del self.ids[pos]
+
+    def bounds(self, start=None, end=None):
+        """``(lo, hi)``: the positions of the entries whose key lies in ``[start, end]``."""
+        lo = 0 if start is None else bisect_left(self.keys, start)
+        hi = len(self.keys) if end is None else bisect_right(self.keys, end, lo)
+        return lo, hi
+
+    def range(self, start=None, end=None):
+        """Return ids whose key lies in ``[start, end]``, in key order."""
+        lo, hi = self.bounds(start, end)
+        return self.ids[lo:hi]
+
+    def position_after(self, key, item_id):
+        """Index of the first entry ordered after ``(key, item_id)``."""
+        pos = self._position(key, item_id)
+        if pos < len(self.ids) and self.ids[pos] == item_id and self.keys[pos] == key:
+            pos += 1
+        return pos
+
+    def position_before(self, key, item_id):
+        """Index of the last entry ordered before ``(key, item_id)``; -1 if none."""
+        return self._position(key, item_id) - 1
+
+    def _position(self, key, item_id):
+        lo = bisect_left(self.keys, key)
+        hi = bisect_right(self.keys, key, lo)
+        target = id_key(item_id)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if id_key(self.ids[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _item_id(item):
+    return id_key(item.id)
+
+
+def _publication_date(item):
+    return item.date_key()
+
+
+def _folded(field):
+    def key(item):
+        return (getattr(item, field) or "").casefold()
+    return key
+
+
+# Orders ``LibraryStore.query`` offers (see ``store_base.SORT_FIELDS``); text
+# fields sort case-insensitively and ties are broken by id.
+SORT_KEYS = {
+    "id": _item_id,
+    "name": _folded("name"),
+    "date": _publication_date,
+    "author": _folded("author"),
+}
+
+
+def _year(key):
+    return key // 10000 if key >= 0 else None
+
+
+class ItemStats:
+    """Item counts by category, publication year and author.
+
+    ``counts[group]`` maps each value of a ``store_base.STAT_GROUPS`` group
+    to its number of items. Category and year counts over a date range are
+    summed from per-date category counts, so they cost O(dates in range).
+    Years are ints; items whose date is not an ISO date have year None and
+    are in no range.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = {"category": {}, "year": {}, "author": {}}
+        self._days = {}  # date key -> {category: count}
+        self._day_keys = []  # the keys of _days, sorted
+
+    def add(self, item):
+        category, key = item.category_name, item.date_key()
+        _bump(self.counts["category"], category, 1)
+        _bump(self.counts["year"], _year(key), 1)
+        _bump(self.counts["author"], item.author, 1)
+        day = self._days.get(key)
+        if day is None:
+            day = self._days[key] = {}
+            insort(self._day_keys, key)
+        _bump(day, category, 1)
+
+    def remove(self, item):
+        category, key = item.category_name, item.date_key()
+        _bump(self.counts["category"], category, -1)
+        _bump(self.counts["year"], _year(key), -1)
+        _bump(self.counts["author"], item.author, -1)
+        day = self._days.get(key)
+        if day is not None:
+            _bump(day, category, -1)
+            if not day:
+                del self._days[key]
+                del self._day_keys[bisect_left(self._day_keys, key)]
+
+    def by(self, group, start=None, end=None):
+        """``{value: count}`` for ``group``; with ``start``/``end`` (ISO dates,
+        inclusive) only items published in that range. Author counts are not
+        kept per date, so ``group`` must not be "author" with a range."""
+        if start is None and end is None:
+            return dict(self.counts[group])
+        keys = self._day_keys
+        lo = bisect_left(keys, 0 if start is None else date_key(start))
+        hi = len(keys) if end is None else bisect_right(keys, date_key(end))
+        counts = {}
+        for key in keys[lo:hi]:
+            if group == "year":
+                _bump(counts, _year(key), sum(self._days[key].values()))
+            else:
+                for category, n in self._days[key].items():
+                    _bump(counts, category, n)
+        return counts
+
+
+def _bump(counts, value, n):
+    total = counts.get(value, 0) + n
+    if total:
+        counts[value] = total
+    else:
+        del counts[value]
+
+
+class ItemIndexes:
+    """Hash indexes from category and name to item ids, a sorted index on id
+    and an optional sorted index on ``publication_date``, plus ``ItemStats``.
+
+    Hash buckets are dicts used as insertion-ordered sets so lookups return
+    items in a stable order. The id index gives the stable order that
+    cursor pagination walks. ``sorted`` maps each sort order in use to its
+    ``SortedIndex``; orders other than id and date are only built when first
+    asked for, since each costs a key per item.
+    """
+
+    def __init__(self, with_dates=True):
+        self.with_dates = with_dates
+        self.by_id = SortedIndex(_item_id)
+        self.by_date = SortedIndex(_publication_date)
+        self.sorted = {"id": self.by_id}
+        if with_dates:
+            self.sorted["date"] = self.by_date
+        self.stats = ItemStats()
+        self.clear()
+
+    def clear(self):
+        self.category = {}
+        self.name = {}
+        self.stats.clear()
+        for index in self.sorted.values():
+            index.rebuild(())
+
+    def rebuild(self, items):
+        self.clear()
+        for item in items:
+            self._add_hashes(item)
+        for index in self.sorted.values():
+            index.rebuild(items)
+
+    def add(self, item):
+        self._add_hashes(item)
+        for index in self.sorted.values():
+            index.add(item)
+
+    def remove(self, item):
+        item_id = item.id
+        _discard(self.category, item.category_name, item_id)
+        _discard(self.name, item.name, item_id)
+        self.stats.remove(item)
+        for index in self.sorted.values():
+            index.remove(item)
+
+    def ensure_sorted(self, sort, items):
+        """Build the sorted index for ``sort`` over ``items`` unless it exists."""
+        if sort in self.sorted:
+            return
+        if sort == "date":
+            index, self.with_dates = self.by_date, True
+        else:
+            index = SortedIndex(SORT_KEYS[sort])
+        index.rebuild(items)
+        self.sorted[sort] = index
+
+    def date_range(self, start=None, end=None):
+        """Return ids with ``start <= publication_date <= end`` (ISO strings), oldest first.
+
+        Items whose date is not an ISO date are in no range.
+        """
+        return self.by_date.range(0 if start is None else date_key(start),
+                                  None if end is None else date_key(end))
+
+    def _add_hashes(self, item):
+        item_id = item.id
+        self.category.setdefault(item.category_name, {})[item_id] = None
+        self.name.setdefault(item.name, {})[item_id] = None
+        self.stats.add(item)
+
+
+def _discard(index, key, item_id):
+    bucket = index.get(key)
+    if bucket is None:
+        return
+    bucket.pop(item_id, None)
+    if not bucket:
+        del index[key]
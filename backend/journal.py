@@ -0,0 +1,39 @@
+"""Bounded journal of recent item changes, for delta sync."""
+from collections import deque
+
+
+class ChangeJournal:
+    """The last ``size`` ``(version, item_id)`` changes, oldest first.
+
+    ``floor`` is the newest version whose changes may have been dropped:
+    every change made after it is still in the journal, so only clients
+    that have seen version ``floor`` or later can catch up from here.
+    """
+
+    def __init__(self, size, floor=0):
+        self._entries = deque(maxlen=max(1, size))
+        self.floor = floor
+
+    def __len__(self):
+        return len(self._entries)
+
+    def reset(self, floor):
+        self._entries.clear()
+        self.floor = floor
+
+    def record(self, version, item_id):
+        if len(self._entries) == self._entries.maxlen:
+            self.floor = max(self.floor, self._entries[0][0])
+        self._entries.append((version, item_id))
+
+    def since(self, version):
+        """Ids changed after ``version``, oldest change first, or None if
+        the journal no longer reaches back that far."""
+        if version < self.floor:
+            return None
+        ids = {}
+        for v, item_id in reversed(self._entries):
+            if v <= version:
+                break
+            ids.setdefault(item_id, None)
+        return list(reversed(ids))
@@ -0,0 +1,54 @@
+"""JSON encoding for responses and library files: orjson when available, else the stdlib.
+
+``config.JSON_LIBRARY`` picks the encoder: "auto" (orjson if it is
+installed), "orjson" or "stdlib". Both produce the same compact UTF-8
+text with keys in insertion order, so a body never depends on which one
+a worker happens to run.
+"""
+import json
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if config.JSON_LIBRARY == "stdlib" or orjson is None:
+    BACKEND = "stdlib"
+else:
+    BACKEND = "orjson"
+
+# Types orjson would encode differently from Flask are handed to ``default``.
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                   | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj, default=None):
+    """Encode ``obj`` as compact UTF-8 JSON bytes."""
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. ints beyond 64 bits: the stdlib copes
+    try:
+        if default is None:
+            return _encoder.encode(obj).encode("utf-8")
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except UnicodeEncodeError:
+        # A lone surrogate has no UTF-8 form; escaped, it is still valid JSON.
+        return json.dumps(obj, default=default, separators=(",", ":")).encode("ascii")
+
+
+def loads(data):
+    if BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def array(fragments):
+    """A JSON array from already encoded elements."""
+    return b"[" + b",".join(fragments) + b"]"
+
@@ -0,0 +1,852 @@
+"""Library storage engine backed by a JSON snapshot plus an append-only log."""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack, contextmanager
+from operator import itemgetter
+from pathlib import Path
+
+import config
+import json_codec
+import metrics
+from indexes import SORT_KEYS, ItemIndexes
+from journal import ChangeJournal
+from locks import FileLock, RWLock
+from query import plan
+from records import Record, date_key, id_key, pack_id, unpack_id
+from search import SearchIndex
+from snapshot import Snapshot, SnapshotItems, SnapshotWriter, encode_record, set_source
+from store_base import SORT_FIELDS, LibraryStore
+
+
+class JsonStore(LibraryStore):
+    """Process-resident copy of the library, persisted as snapshot plus log.
+
+    ``library.json`` holds a compacted snapshot and ``library.log`` an
+    append-only JSON-lines log of mutations made since. Writes append one
+    record, so their cost does not depend on the library size; loading
+    replays the log on top of the snapshot. Once the log grows past
+    ``compact_bytes`` it is rotated and a background thread folds it into a
+    new snapshot, written atomically through a temp file and rename.
+
+    Reads are served from memory. Each access compares the files on disk with
+    what was last seen, so changes made outside this process are picked up:
+    new log records are applied incrementally and anything else (a new
+    snapshot, a rotated log) triggers a full reload.
+
+    Items are held as compact ``records.Record``s keyed by their packed id
+    and turned back into dicts only when they leave the store.
+
+    With ``binary_snapshot`` every snapshot is also written as a binary
+    image, ``library.snap`` (see ``snapshot.py``). Loading maps that image
+    instead of parsing the JSON when it matches the current snapshot, so
+    startup no longer grows with the library: items are decoded as they
+    are read, and the indexes below are built by the first query that
+    needs one. Point reads, counts, the full listing and delta sync never
+    do.
+
+    The encoded JSON of items that list responses were built from is kept,
+    up to ``fragment_cache_bytes``, and dropped whenever the item changes.
+
+    Category and name lookups, date ranges and item counts are answered
+    from ``ItemIndexes`` and text queries from a ``SearchIndex``; once built,
+    both are kept in step with every write and replayed record. Filtered
+    listings (``query``) start from whichever index ``query.plan`` expects
+    to touch the fewest items.
+
+    Versions: every log record carries the library version it produced
+    (``v``) and a timestamp (``ts``); a batch is one version. Each new log
+    starts with a ``version`` record, so the version survives compaction.
+    Items loaded from the snapshot get that record's version as theirs, the
+    rest the version of the last record that wrote them, so an item version
+    always names one state of the item. The ids written by the most recent
+    records are kept in a ``ChangeJournal`` for delta sync.
+
+    Concurrency: within a process a readers/writer lock lets reads run side
+    by side while writes are exclusive. Across processes every write holds
+    ``library.lock`` while it catches up with the log and appends to it, so
+    several workers can share the files without losing each other's writes.
+    ``library.compact.lock`` makes sure only one process compacts at a time.
+    A ``library.log.compacting`` left by a compaction that died is merged
+    back into the log when the store opens.
+    """
+
+    def __init__(self, path, compact_bytes=None, fsync=None, date_index=None, journal_size=None,
+                 fragment_cache_bytes=None, binary_snapshot=None):
+        self.path = Path(path)
+        self.log_path = self.path.with_name(self.path.stem + ".log")
+        self.compacting_path = self.path.with_name(self.path.stem + ".log.compacting")
+        self.image_path = self.path.with_name(self.path.stem + ".snap")
+        self.compact_bytes = config.WAL_COMPACT_BYTES if compact_bytes is None else compact_bytes
+        self.fsync = config.WAL_FSYNC if fsync is None else fsync
+        self.binary_snapshot = config.BINARY_SNAPSHOT if binary_snapshot is None else binary_snapshot
+        self._db = SnapshotItems()
+        self._indexes = ItemIndexes(config.DATE_INDEX if date_index is None else date_index)
+        self._search = SearchIndex()
+        self._indexed = False
+        self._loaded = False
+        self._snap_stamp = None
+        self._log_id = None
+        self._log_offset = 0
+        self._version = 0
+        self._modified = 0.0
+        self._base_version = 0
+        self._item_versions = {}
+        self.journal_size = config.CHANGE_JOURNAL_SIZE if journal_size is None else journal_size
+        self._journal = ChangeJournal(self.journal_size)
+        if fragment_cache_bytes is None:
+            fragment_cache_bytes = int(config.FRAGMENT_CACHE_MB * 2 ** 20)
+        self.fragment_cache_bytes = fragment_cache_bytes
+        self._fragments = {}  # packed id -> encoded item
+        self._fragment_bytes = 0
+        self._fragment_lock = threading.Lock()
+        self._compactor = None
+        self._rw = RWLock()
+        self._write_lock = FileLock(self.path.with_name(self.path.stem + ".lock"))
+        self._compact_lock = FileLock(self.path.with_name(self.path.stem + ".compact.lock"))
+        self._recover_compaction()
+
+    # -- disk state -------------------------------------------------------
+
+    def _snapshot_stamp(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _log_stat(self):
+        try:
+            st = self.log_path.stat()
+        except FileNotFoundError:
+            return None, 0
+        return (st.st_dev, st.st_ino), st.st_size
+
+    def _read_snapshot(self, stamp):
+        """The snapshot's items, mapped from the image if it was made from
+        the snapshot with ``stamp``, else parsed from the JSON."""
+        if stamp is None:
+            return SnapshotItems()
+        if self.binary_snapshot:
+            items = self._open_image(stamp)
+            if items is not None:
+                return items
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return SnapshotItems()
+        metrics.storage_read("snapshot", len(data))
+        try:
+            # Build records while parsing so the item dicts never pile up.
+            snapshot = json.loads(data, object_hook=_record_hook)
+        except json.JSONDecodeError:
+            snapshot = None
+        items = SnapshotItems()
+        if isinstance(snapshot, dict):
+            for r in snapshot.values():
+                if isinstance(r, Record):
+                    items[r.id] = r
+        # Make the image the next load maps, unless another process is
+        # writing snapshots right now.
+        if self.binary_snapshot and self._compact_lock.acquire(blocking=False):
+            try:
+                if self._snapshot_stamp() == stamp and self._write_image(items, stamp):
+                    return self._open_image(stamp) or items
+            finally:
+                self._compact_lock.release()
+        return items
+
+    def _open_image(self, stamp):
+        """The items of ``library.snap`` if it was made from the snapshot with ``stamp``."""
+        try:
+            image = Snapshot(self.image_path)
+        except (OSError, ValueError):
+            return None
+        if image.source != stamp:
+            return None
+        return SnapshotItems(image)
+
+    def _write_image(self, items, stamp):
+        """Write ``items`` as the image of the snapshot with ``stamp``; False if it could not be."""
+        tmp = self.image_path.with_name(f"{self.image_path.name}.{os.getpid()}.tmp")
+        with metrics.storage_timer("image_write"), tmp.open("wb") as f:
+            image = SnapshotWriter(f)
+            for item_id, data in items.encoded(encode_record):
+                image.add(item_id, data)
+            size = image.finish(stamp)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.storage_written("image", size)
+        return self._publish_image(tmp)
+
+    def _publish_image(self, tmp):
+        try:
+            os.replace(tmp, self.image_path)
+        except OSError:
+            # Windows will not replace a file another process has mapped;
+            # the JSON snapshot is what counts, so loads parse that instead.
+            tmp.unlink(missing_ok=True)
+            return False
+        return True
+
+    @classmethod
+    def _apply(cls, db, versions, journal, record, version):
+        op = record.get("op")
+        if op == "put":
+            item = Record.from_dict(record["item"])
+            db[item.id] = item
+            versions[item.id] = version
+            journal.record(version, item.id)
+        elif op == "delete":
+            item_id = pack_id(record["id"])
+            db.pop(item_id, None)
+            versions.pop(item_id, None)
+            journal.record(version, item_id)
+        elif op == "batch":
+            for sub in record["records"]:
+                cls._apply(db, versions, journal, sub, version)
+
+    def _apply_indexed(self, record, version=None):
+        if version is None:
+            # Records written before versioning count one version each.
+            version = self._version = record.get("v", self._version + 1)
+            self._modified = record.get("ts", self._modified)
+        op = record.get("op")
+        if op == "put":
+            item = Record.from_dict(record["item"])
+            self._set(item, version)
+            self._journal.record(version, item.id)
+        elif op == "delete":
+            item_id = pack_id(record["id"])
+            self._remove(item_id)
+            self._journal.record(version, item_id)
+        elif op == "batch":
+            for sub in record["records"]:
+                self._apply_indexed(sub, version)
+
+    def _set(self, item, version):
+        if self._indexed:
+            old = self._db.get(item.id)
+            if old is not None:
+                self._indexes.remove(old)
+                self._search.remove(old)
+        self._drop_fragment(item.id)
+        self._db[item.id] = item
+        self._item_versions[item.id] = version
+        if self._indexed:
+            self._indexes.add(item)
+            self._search.add(item)
+
+    def _remove(self, item_id):
+        old = self._db.pop(item_id, None)
+        if old is None:
+            return False
+        self._item_versions.pop(item_id, None)
+        if self._indexed:
+            self._indexes.remove(old)
+            self._search.remove(old)
+        self._drop_fragment(item_id)
+        return True
+
+    def _build_indexes(self):
+        """Index every item unless that is done; call with the write lock held."""
+        if self._indexed:
+            return
+        with metrics.storage_timer("index_build"):
+            items = list(self._db.values())
+            self._indexes.rebuild(items)
+            self._search.rebuild(items)
+        self._indexed = True
+
+    # Every fragment costs about this much besides its bytes (object header
+    # and dict slot).
+    FRAGMENT_OVERHEAD = 100
+
+    def _fragment(self, item):
+        """The encoded JSON of record ``item``, cached while there is room.
+
+        Call with the read or write lock held, so no write can replace the
+        item between encoding it and caching the result. A full cache takes
+        no new entries rather than evicting, so one scan over a library that
+        does not fit cannot flush what was cached.
+        """
+        data = self._fragments.get(item.id)
+        if data is None:
+            data = json_codec.dumps(item.to_dict())
+            size = len(data) + self.FRAGMENT_OVERHEAD
+            with self._fragment_lock:
+                if self._fragment_bytes + size <= self.fragment_cache_bytes:
+                    if self._fragments.setdefault(item.id, data) is data:
+                        self._fragment_bytes += size
+        return data
+
+    def _drop_fragment(self, item_id):
+        with self._fragment_lock:
+            data = self._fragments.pop(item_id, None)
+            if data is not None:
+                self._fragment_bytes -= len(data) + self.FRAGMENT_OVERHEAD
+
+    def _clear_fragments(self):
+        with self._fragment_lock:
+            self._fragments = {}
+            self._fragment_bytes = 0
+
+    def _stamp(self, record):
+        """Give ``record`` the next library version and the current time."""
+        record["v"] = self._version + 1
+        record["ts"] = time.time()
+        return record
+
+    def _replay(self, path, apply, start=0):
+        """Pass the records in ``path`` from byte ``start`` on to ``apply``.
+
+        Returns the offset just past the last complete record; a torn final
+        line left by a crash is ignored and later overwritten.
+        """
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            return 0
+        offset = start
+        with f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    record = json_codec.loads(line)
+                except ValueError:
+                    continue
+                apply(record)
+        metrics.storage_read("log", offset - start)
+        return offset
+
+    def _reload(self):
+        with metrics.storage_timer("load"):
+            self._load()
+
+    def _load(self):
+        # Another writer may rotate the log or publish a snapshot while we
+        # read; start over if either changed underneath us.
+        while True:
+            snap_stamp = self._snapshot_stamp()
+            log_id, _ = self._log_stat()
+            db = self._read_snapshot(snap_stamp)
+            versions = {}
+            journal = ChangeJournal(self.journal_size)
+            # [version, modified, base version]; the oldest log's leading
+            # version record, if any, is the version of the snapshot's items.
+            clock = [0, snap_stamp[0] / 1e9 if snap_stamp else 0.0, None]
+
+            def apply(record):
+                version = clock[0] = record.get("v", clock[0] + 1)
+                clock[1] = record.get("ts", clock[1])
+                if clock[2] is None:
+                    clock[2] = version if record.get("op") == "version" else 0
+                self._apply(db, versions, journal, record, version)
+
+            self._replay(self.compacting_path, apply)
+            log_offset = self._replay(self.log_path, apply)
+            if self._snapshot_stamp() == snap_stamp and self._log_stat()[0] == log_id:
+                break
+        self._snap_stamp, self._log_id, self._log_offset = snap_stamp, log_id, log_offset
+        self._version, self._modified = clock[0], clock[1]
+        self._base_version, self._item_versions = clock[2] or 0, versions
+        # The logs hold every change after the snapshot's version.
+        journal.floor = max(journal.floor, self._base_version)
+        self._journal = journal
+        self._db = db
+        self._clear_fragments()
+        self._drop_indexes()
+        self._loaded = True
+
+    def _drop_indexes(self):
+        # Sort orders in use stay registered and are rebuilt with the rest.
+        self._indexed = False
+        self._indexes.clear()
+        self._search.clear()
+
+    def _disk_state(self):
+        """Return None if the in-memory copy is current, "tail" if other
+        processes only appended to the log, or "reload"."""
+        log_id, log_size = self._log_stat()
+        if (not self._loaded
+                or self._snapshot_stamp() != self._snap_stamp
+                or log_id != self._log_id
+                or log_size < self._log_offset):
+            return "reload"
+        if log_size > self._log_offset:
+            return "tail"
+        return None
+
+    def _refresh(self):
+        state = self._disk_state()
+        if state == "reload":
+            self._reload()
+        elif state == "tail":
+            with metrics.storage_timer("log_replay"):
+                self._log_offset = self._replay(self.log_path, self._apply_indexed, self._log_offset)
+
+    @contextmanager
+    def _reading(self, indexed=False):
+        """Hold the read lock over a current copy, with the indexes built if ``indexed``."""
+        while True:
+            if self._disk_state() is not None or (indexed and not self._indexed):
+                with self._rw.write():
+                    self._refresh()
+                    if indexed:
+                        self._build_indexes()
+            with self._rw.read():
+                # A reload in between drops the indexes again.
+                if not indexed or self._indexed:
+                    yield
+                    return
+
+    @contextmanager
+    def _writing(self):
+        with self._rw.write(), self._write_lock:
+            self._refresh()
+            yield
+
+    # -- public API -------------------------------------------------------
+
+    def get(self, item_id):
+        with self._reading():
+            item = self._db.get(pack_id(item_id))
+            return None if item is None else item.to_dict()
+
+    def all(self):
+        with self._reading():
+            return [item.to_dict() for item in self._db.values()]
+
+    def count(self):
+        with self._reading():
+            return len(self._db)
+
+    def version_info(self):
+        """Return ``(version, modified)``: the library version and when it was written."""
+        with self._reading():
+            return self._version, self._modified
+
+    def get_versioned(self, item_id):
+        """Return ``(item, version)``, or ``(None, None)`` if there is no such item."""
+        with self._reading():
+            key = pack_id(item_id)
+            item = self._db.get(key)
+            if item is None:
+                return None, None
+            return item.to_dict(), self._item_versions.get(key, self._base_version)
+
+    def changes(self, since):
+        """Return ``(version, upserted, deleted_ids)`` for the changes after
+        version ``since``, or None if the journal does not reach back to it."""
+        with self._reading():
+            ids = self._journal.since(since) if since <= self._version else None
+            if ids is None:
+                return None
+            upserted = [self._db[i].to_dict() for i in ids if i in self._db]
+            deleted = [unpack_id(i) for i in ids if i not in self._db]
+            return self._version, upserted, deleted
+
+    def invalidate(self):
+        """Drop the in-memory copy so the next access re-reads the files."""
+        with self._rw.write():
+            self._loaded = False
+
+    def close(self):
+        self.wait_for_compaction()
+
+    def put(self, item):
+        """Insert or replace ``item``; costs one log append."""
+        with self._writing():
+            record = self._stamp({"op": "put", "item": item})
+            self._append(record)
+            self._apply_indexed(record)
+            self._maybe_compact()
+        return item
+
+    def update(self, item):
+        """Replace an existing item. Returns False if its id is unknown."""
+        with self._writing():
+            if pack_id(item["id"]) not in self._db:
+                return False
+            record = self._stamp({"op": "put", "item": item})
+            self._append(record)
+            self._apply_indexed(record)
+            self._maybe_compact()
+            return True
+
+    def delete(self, item_id):
+        """Remove an item. Returns False if it did not exist."""
+        with self._writing():
+            if pack_id(item_id) not in self._db:
+                return False
+            record = self._stamp({"op": "delete", "id": item_id})
+            self._append(record)
+            self._apply_indexed(record)
+            self._maybe_compact()
+            return True
+
+    def apply(self, ops, atomic=True):
+        """Commit ``(row, op, payload)`` operations with a single fsynced log write.
+
+        ``op`` is create/update (payload: item) or delete (payload: id).
+        Updates and deletes of ids that do not exist, taking earlier
+        operations in the batch into account, are reported as
+        ``(row, error)`` pairs; with ``atomic`` any such error aborts the
+        whole batch.
+        """
+        with self._writing():
+            pending = {}
+            records = []
+            errors = []
+            for row, op, payload in ops:
+                item_id = payload if op == "delete" else payload["id"]
+                exists = pending[item_id] if item_id in pending else pack_id(item_id) in self._db
+                if op != "create" and not exists:
+                    errors.append((row, "Item not found"))
+                elif op == "delete":
+                    pending[item_id] = False
+                    records.append({"op": "delete", "id": item_id})
+                else:
+                    pending[item_id] = True
+                    records.append({"op": "put", "item": payload})
+            if (errors and atomic) or not records:
+                return errors
+            # One log line for the whole batch: a crash mid-write leaves a
+            # torn line that replay ignores, never half a batch.
+            batch = self._stamp({"op": "batch", "records": records})
+            self._append(batch, fsync=True)
+            self._apply_indexed(batch)
+            self._maybe_compact()
+            return errors
+
+    def replace_all(self, db):
+        """Make ``db`` the whole library, written as a fresh snapshot."""
+        # Hold the compaction lock so no compaction, here or in another
+        # process, can publish an older snapshot over this one.
+        with self._compact_lock, self._writing():
+            for p in (self.log_path, self.compacting_path):
+                if p.exists():
+                    p.unlink()
+            records = SnapshotItems()
+            for item in db.values():
+                record = Record.from_dict(item)
+                records[record.id] = record
+            self._write_snapshot(records)
+            self._snap_stamp = self._snapshot_stamp()
+            if self.binary_snapshot:
+                records = self._open_image(self._snap_stamp) or records
+            self._log_id, self._log_offset = None, 0
+            # The new log starts at a new version shared by every item.
+            header = self._stamp({"op": "version"})
+            self._append(header)
+            self._version, self._modified = header["v"], header["ts"]
+            self._base_version, self._item_versions = header["v"], {}
+            self._journal.reset(header["v"])
+            self._db = records
+            self._clear_fragments()
+            self._drop_indexes()
+            self._loaded = True
+
+    def by_category(self, category):
+        """Items in ``category``, found through the category index."""
+        with self._reading(indexed=True):
+            return [self._db[i].to_dict() for i in self._indexes.category.get(category, ())]
+
+    def by_name(self, name):
+        """Items whose name equals ``name``, found through the name index."""
+        with self._reading(indexed=True):
+            return [self._db[i].to_dict() for i in self._indexes.name.get(name, ())]
+
+    def by_date_range(self, start=None, end=None):
+        """Items published between ``start`` and ``end`` inclusive, oldest first.
+
+        Served by bisection over the date index; falls back to a scan when the
+        index is disabled.
+        """
+        with self._reading(indexed=self._indexes.with_dates):
+            return [r.to_dict() for r in self._date_range(start, end)]
+
+    def _date_range(self, start, end):
+        if self._indexes.with_dates:
+            return [self._db[i] for i in self._indexes.date_range(start, end)]
+        low = 0 if start is None else date_key(start)
+        high = None if end is None else date_key(end)
+        items = [i for i in self._db.values()
+                 if i.date_key() >= low and (high is None or i.date_key() <= high)]
+        items.sort(key=lambda i: (i.date_key(), id_key(i.id)))
+        return items
+
+    def stats(self, group, start=None, end=None):
+        """Item counts by ``group`` from ``ItemStats``; see ``LibraryStore.stats``."""
+        with self._reading(indexed=True):
+            if group != "author" or (start is None and end is None):
+                return self._indexes.stats.by(group, start, end)
+            counts = {}
+            for record in self._date_range(start, end):
+                counts[record.author] = counts.get(record.author, 0) + 1
+            return counts
+
+    def query(self, query, limit=None, after=None, after_value=None, offset=0):
+        """Return ``(items, total)`` for a ``query.Query``; see ``LibraryStore.query``.
+
+        ``query.plan`` decides whether to walk the sort index, testing items
+        until the page is full, or to start from the smallest set of
+        candidates an index lists for one of the filters. Either way a page
+        costs far less than the library size unless the filters match
+        little and no index narrows them. The sort index for an order, and
+        the author index an author filter uses, is built by the first query
+        that asks for it.
+        """
+        self._ensure_sorted(query)
+        with self._reading(indexed=True):
+            records, total = self._query(query, limit, after, after_value, offset)
+            return [r.to_dict() for r in records], total
+
+    def query_json(self, query, limit=None, after=None, after_value=None, offset=0):
+        """``query`` as ``(fragments, total, last item)``, fragments from the cache."""
+        self._ensure_sorted(query)
+        with self._reading(indexed=True):
+            records, total = self._query(query, limit, after, after_value, offset)
+            last = records[-1].to_dict() if records else None
+            return [self._fragment(r) for r in records], total, last
+
+    def all_json(self, category=None):
+        """``all`` or ``by_category`` as encoded items, from the cache or the
+        mapped snapshot where possible."""
+        if category is None:
+            with self._reading():
+                return list(self._db.json_values(self._fragment))
+        with self._reading(indexed=True):
+            return [self._fragment(self._db[i]) for i in self._indexes.category.get(category, ())]
+
+    def _ensure_sorted(self, query):
+        sorts = [query.sort] + (["author"] if query.authors else [])
+        missing = [sort for sort in sorts if sort not in self._indexes.sorted]
+        if missing:
+            with self._writing():
+                self._build_indexes()
+                items = list(self._db.values())
+                for sort in missing:
+                    self._indexes.ensure_sorted(sort, items)
+
+    def _query(self, query, limit, after, after_value, offset):
+        chosen = plan(query, self._indexes, len(self._db), limit, offset)
+        matches = query.matcher()
+        cursor = None
+        if after is not None:
+            probe = Record.from_dict({SORT_FIELDS[query.sort]: after_value or "", "id": after})
+            cursor = (SORT_KEYS[query.sort](probe), probe.id)
+        if chosen.source != "scan":
+            return self._lookup(query, matches, chosen, limit, cursor, offset)
+        records = self._walk(query, matches, limit, cursor, offset)
+        total = chosen.total
+        if total is None:
+            candidates = self._db.values() if chosen.ids is None else map(self._db.__getitem__, chosen.ids())
+            total = sum(1 for r in candidates if matches(r))
+        return records, total
+
+    def _walk(self, query, matches, limit, cursor, offset):
+        """Matching records in sort index order from ``cursor`` on."""
+        index = self._indexes.sorted[query.sort]
+        step = -1 if query.descending else 1
+        if cursor is None:
+            pos = len(index) - 1 if query.descending else 0
+        elif query.descending:
+            pos = index.position_before(*cursor)
+        else:
+            pos = index.position_after(*cursor)
+        skip = offset
+        if matches is None:
+            pos, skip = pos + step * offset, 0
+        ids = index.ids
+        records = []
+        while 0 <= pos < len(ids) and (limit is None or len(records) < limit):
+            record = self._db[ids[pos]]
+            pos += step
+            if matches is None or matches(record):
+                if skip:
+                    skip -= 1
+                else:
+                    records.append(record)
+        return records
+
+    def _lookup(self, query, matches, chosen, limit, cursor, offset):
+        """Matching records among the plan's candidates, sorted, from ``cursor`` on."""
+        records = [r for r in map(self._db.__getitem__, chosen.ids()) if matches(r)]
+        total = len(records)
+        keys = None
+        if not chosen.ordered or cursor is not None:
+            key = SORT_KEYS[query.sort]
+            rows = [((key(r), id_key(r.id)), r) for r in records]
+            if not chosen.ordered:
+                rows.sort(key=itemgetter(0))
+            keys = [row[0] for row in rows]
+            records = [row[1] for row in rows]
+        if cursor is not None:
+            cursor = (cursor[0], id_key(cursor[1]))
+        if query.descending:
+            end = (len(records) if cursor is None else bisect_left(keys, cursor)) - offset
+            start = 0 if limit is None else max(0, end - limit)
+            return records[start:max(end, 0)][::-1], total
+        start = (0 if cursor is None else bisect_right(keys, cursor)) + offset
+        return records[start:None if limit is None else start + limit], total
+
+    def search(self, query, limit=50):
+        """Items matching the words of ``query`` (prefixes allowed), best first."""
+        with self._reading(indexed=True):
+            name_of = lambda item_id: self._db[item_id].name or ""
+            return [self._db[i].to_dict() for i in self._search.search(query, limit, name_of)]
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    # -- writing ----------------------------------------------------------
+
+    def _append(self, record, fsync=None):
+        data = json_codec.dumps(record) + b"\n"
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with metrics.storage_timer("log_append"), self.log_path.open("ab") as f:
+            if f.tell() != self._log_offset:
+                # Drop a torn record left behind by a crash mid-append.
+                f.truncate(self._log_offset)
+            f.write(data)
+            f.flush()
+            if self.fsync if fsync is None else fsync:
+                os.fsync(f.fileno())
+        metrics.storage_written("log", len(data))
+        self._log_offset += len(data)
+        self._log_id, _ = self._log_stat()
+
+    def _write_snapshot(self, db):
+        """Atomically replace the snapshot file with the ``SnapshotItems`` ``db``,
+        and its image too with ``binary_snapshot``.
+
+        Items are encoded one per line, so the GIL is released between items
+        while a background compaction runs. Items still in the mapped image
+        are copied as they are, not decoded and encoded again.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        image_tmp = self.image_path.with_name(f"{self.image_path.name}.{os.getpid()}.tmp")
+        with metrics.storage_timer("snapshot_write"), ExitStack() as files:
+            f = files.enter_context(tmp.open("wb"))
+            image = SnapshotWriter(files.enter_context(image_tmp.open("wb"))) if self.binary_snapshot else None
+            f.write(b"{")
+            sep = b"\n  "
+            for item_id, data in db.encoded(encode_record):
+                f.write(sep + json_codec.dumps(unpack_id(item_id)) + b": " + data)
+                sep = b",\n  "
+                if image is not None:
+                    image.add(item_id, data)
+            f.write(b"\n}\n")
+            f.flush()
+            os.fsync(f.fileno())
+            if image is not None:
+                image_size = image.finish()
+        metrics.storage_written("snapshot", tmp.stat().st_size)
+        os.replace(tmp, self.path)
+        if image is not None:
+            # The image names the snapshot it belongs to, which only has its
+            # final stamp once it is in place.
+            set_source(image_tmp, self._snapshot_stamp())
+            with image_tmp.open("rb+") as f:
+                os.fsync(f.fileno())
+            metrics.storage_written("image", image_size)
+            self._publish_image(image_tmp)
+
+    def _maybe_compact(self):
+        """Rotate the log and start a background compaction once it is big enough.
+
+        Called with the write locks held, so the in-memory copy includes
+        every record in ``library.log`` and ``library.log.compacting``.
+        """
+        if self._log_offset < self.compact_bytes or self._compactor is not None:
+            return
+        if not self._compact_lock.acquire(blocking=False):
+            return  # another process is compacting
+        # A compaction that died half-way, in a process that has not
+        # reopened the store since, leaves its records to rotate with the rest.
+        self._merge_leftover_log()
+        os.replace(self.log_path, self.compacting_path)
+        self._log_id, self._log_offset = None, 0
+        # Carry the version over; it is also the version of every item
+        # the coming snapshot holds that the new log does not touch.
+        self._append({"op": "version", "v": self._version, "ts": self._modified})
+        snapshot = self._db.copy()
+        self._compactor = threading.Thread(target=self._compact, args=(snapshot,),
+                                           name="library-compactor", daemon=True)
+        self._compactor.start()
+
+    def _recover_compaction(self):
+        """Merge a ``library.log.compacting`` left by a dead compaction into the log."""
+        if not self.compacting_path.exists():
+            return
+        if not self._compact_lock.acquire(blocking=False):
+            return  # still being compacted
+        try:
+            with self._write_lock:
+                self._merge_leftover_log()
+        finally:
+            self._compact_lock.release()
+
+    def _merge_leftover_log(self):
+        """Put the records of ``library.log.compacting`` back in front of ``library.log``.
+
+        Called with both file locks held. The log keeps the leftover's
+        leading version record, so its items keep their versions, and drops
+        what it repeats of it: the version record written when it was
+        rotated, or everything if a merge died before removing the leftover.
+        """
+        if not self.compacting_path.exists():
+            return
+        tmp = self.log_path.with_name(f"{self.log_path.name}.{os.getpid()}.tmp")
+        last = None
+        with tmp.open("wb") as out:
+            for path in (self.compacting_path, self.log_path):
+                try:
+                    f = path.open("rb")
+                except FileNotFoundError:
+                    continue
+                with f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # torn by a crash
+                        try:
+                            version = json_codec.loads(line).get("v")
+                        except ValueError:
+                            continue
+                        if path == self.compacting_path:
+                            last = version if version is not None else last
+                        elif version is not None and last is not None and version <= last:
+                            continue
+                        out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+            metrics.storage_written("log", out.tell())
+        os.replace(tmp, self.log_path)
+        self.compacting_path.unlink()
+
+    def _compact(self, snapshot):
+        try:
+            self._write_snapshot(snapshot)
+            with self._rw.write():
+                self.compacting_path.unlink(missing_ok=True)
+                self._snap_stamp = self._snapshot_stamp()
+        finally:
+            self._compactor = None
+            self._compact_lock.release()
+
+
+def _record_hook(obj):
+    """``json.loads`` hook turning item objects into records as they are parsed."""
+    if isinstance(obj.get("id"), str) and "name" in obj:
+        return Record.from_dict(obj)
+    return obj
@@ -0,0 +1,105 @@
+"""Locking primitives for the storage engines."""
+import os
+import threading
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class RWLock:
+    """Many concurrent readers or one writer; waiting writers go first."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, shared by every process that uses it.
+
+    Uses ``flock`` on POSIX and ``msvcrt.locking`` on Windows. Each
+    ``acquire`` opens its own descriptor, so threads of one process also
+    exclude each other, and the lock may be released by a different thread
+    than the one that took it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """Take the lock; with ``blocking=False`` return False instead of waiting."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.name == "nt":
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                while True:
+                    try:
+                        msvcrt.locking(fd, mode, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ~10 s; keep waiting like flock does.
+                        if not blocking:
+                            raise
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            os.close(fd)
+            if blocking:
+                raise
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        try:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
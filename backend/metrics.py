@@ -0,0 +1,153 @@
+"""Request and storage metrics, served by GET /metrics in the Prometheus text format.
+
+Metrics live in the memory of the serving process. With several gunicorn
+workers each one counts its own requests, and a scrape of /metrics is
+answered by whichever worker takes it; scrape the workers separately or
+run one worker when exact totals matter.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import config
+
+ENABLED = config.METRICS
+
+# Latency buckets (seconds) from cache hits to full library loads.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Gauge:
+    """A value read when metrics are rendered, from ``fn()``."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name, self.help, self.fn = name, help, fn
+        REGISTRY.append(self)
+
+    def lines(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return  # storage unavailable; leave the sample out
+        yield f"{self.name} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._values = {}  # label values -> [bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def lines(self):
+        with self._lock:
+            values = [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = _labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format."""
+    out = []
+    for metric in REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
+
+
+REQUESTS = Counter("library_http_requests_total", "HTTP requests by route, method and status.",
+                   ("route", "method", "status"))
+REQUEST_SECONDS = Histogram("library_http_request_duration_seconds",
+                            "Time to build the response (for streams: until it starts).",
+                            ("route", "method"))
+STORAGE_SECONDS = Histogram("library_storage_duration_seconds",
+                            "Time spent loading, replaying and writing library files.", ("op",))
+STORAGE_READ_BYTES = Counter("library_storage_read_bytes_total", "Bytes read from library files.",
+                             ("file",))
+STORAGE_WRITTEN_BYTES = Counter("library_storage_written_bytes_total", "Bytes written to library files.",
+                                ("file",))
+
+
+def observe_request(route, method, status, seconds):
+    REQUESTS.inc(route, method, status)
+    REQUEST_SECONDS.observe(seconds, route, method)
+
+
+@contextmanager
+def storage_timer(op):
+    """Time the block as storage operation ``op``; free when metrics are off."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STORAGE_SECONDS.observe(time.perf_counter() - start, op)
+
+
+def storage_read(file, nbytes):
+    if ENABLED and nbytes:
+        STORAGE_READ_BYTES.inc(file, amount=nbytes)
+
+
+def storage_written(file, nbytes):
+    if ENABLED and nbytes:
+        STORAGE_WRITTEN_BYTES.inc(file, amount=nbytes)
@@ -0,0 +1,247 @@
+"""Opt-in profiling of slow requests.
+
+Profiling is controlled by ``config.PROFILE_*`` and, at run time, by the
+JSON file ``config.PROFILE_CONTROL`` (for example
+``{"mode": "sample", "threshold_ms": 200}``). Every worker process checks
+that file about once a second, so profiling can be switched on and off on a
+running server without a restart. Modes:
+
+``sample``
+    A background thread records the stack of each request thread every
+    ``sample_ms`` milliseconds. Cheap enough to leave on in production.
+``cprofile``
+    Requests also run under ``cProfile``: exact call counts, several
+    times slower.
+
+Requests slower than ``threshold_ms`` leave ``<name>.json`` (route, method,
+status, payload and response sizes, duration and the spans of storage
+calls), ``<name>.folded`` (collapsed stacks for flamegraph.pl or
+speedscope) and, in ``cprofile`` mode, ``<name>.prof`` (for ``pstats`` or
+snakeviz) in ``config.PROFILE_DIR``. Only the newest
+``config.PROFILE_MAX_FILES`` profiles are kept.
+"""
+import cProfile
+import functools
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+MODES = ("off", "sample", "cprofile")
+
+_local = threading.local()
+_active = {}  # thread id -> RequestProfile, for the sampler
+_active_lock = threading.Lock()
+_sequence = itertools.count(1)
+
+
+class Settings:
+    """Current profiling settings, re-read from the control file when it changes."""
+
+    CHECK_SECONDS = 1.0
+
+    def __init__(self):
+        self.mode = config.PROFILE_MODE
+        self.threshold = config.PROFILE_THRESHOLD_MS / 1000
+        self.interval = config.PROFILE_SAMPLE_MS / 1000
+        self._checked = 0.0
+        self._stamp = None
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self._checked < self.CHECK_SECONDS:
+            return
+        self._checked = now
+        try:
+            st = config.PROFILE_CONTROL.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        control = {}
+        if stamp is not None:
+            try:
+                control = json.loads(config.PROFILE_CONTROL.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                control = {}  # half-written or broken file: fall back to the defaults
+        if not isinstance(control, dict):
+            control = {}
+        mode = control.get("mode", config.PROFILE_MODE)
+        self.mode = mode if mode in MODES else "off"
+        try:
+            self.threshold = float(control.get("threshold_ms", config.PROFILE_THRESHOLD_MS)) / 1000
+            self.interval = max(float(control.get("sample_ms", config.PROFILE_SAMPLE_MS)), 1) / 1000
+        except (TypeError, ValueError):
+            self.threshold = config.PROFILE_THRESHOLD_MS / 1000
+            self.interval = config.PROFILE_SAMPLE_MS / 1000
+
+
+settings = Settings()
+
+
+class RequestProfile:
+    """What is recorded about one request while it runs."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.stacks = Counter()
+        self.spans = []
+        self._depth = 0
+        self.profiler = None
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                self.profiler = None  # another profiler owns this thread
+
+    def span(self, name, start, seconds):
+        self.spans.append({"name": name, "start_ms": round((start - self.start) * 1000, 3),
+                           "ms": round(seconds * 1000, 3), "depth": self._depth})
+
+
+def traced(fn):
+    """Record calls of ``fn`` as named spans of the request being profiled."""
+    name = f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_local, "profile", None)
+        if profile is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        profile._depth += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile._depth -= 1
+            profile.span(name, start, time.perf_counter() - start)
+    return wrapper
+
+
+def start_request():
+    """Begin profiling the current request if profiling is on."""
+    settings.refresh()
+    stale = getattr(_local, "profile", None)
+    if stale is not None and stale.profiler is not None:
+        stale.profiler.disable()  # a request on this thread died before finishing
+    _local.profile = None
+    if settings.mode == "off":
+        return
+    profile = _local.profile = RequestProfile(settings.mode)
+    with _active_lock:
+        _active[threading.get_ident()] = profile
+    _ensure_sampler()
+
+
+def active():
+    """Whether the current request is being profiled."""
+    return getattr(_local, "profile", None) is not None
+
+
+def finish_request(route, method, status, request_bytes, response_bytes):
+    """Stop profiling the current request; dump it if it was slow.
+
+    Returns the base path of the files written, or None.
+    """
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        return None
+    _local.profile = None
+    with _active_lock:
+        _active.pop(threading.get_ident(), None)
+    if profile.profiler is not None:
+        profile.profiler.disable()
+    seconds = time.perf_counter() - profile.start
+    if seconds < settings.threshold:
+        return None
+    meta = {
+        "route": route, "method": method, "status": status, "mode": profile.mode,
+        "duration_ms": round(seconds * 1000, 3), "request_bytes": request_bytes,
+        "response_bytes": response_bytes, "pid": os.getpid(), "time": time.time(),
+        "samples": sum(profile.stacks.values()), "spans": profile.spans,
+    }
+    try:
+        return _dump(profile, meta)
+    except OSError:
+        return None  # profiling must never fail the request
+
+
+def _dump(profile, meta):
+    out = config.PROFILE_DIR
+    out.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", meta["route"]).strip("_") or "root"
+    base = out / (f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['method']}-{slug}-"
+                  f"{round(meta['duration_ms'])}ms-{os.getpid()}-{next(_sequence)}")
+    base.with_suffix(".json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    with base.with_suffix(".folded").open("w", encoding="utf-8") as f:
+        for stack, count in profile.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    if profile.profiler is not None:
+        profile.profiler.dump_stats(str(base.with_suffix(".prof")))
+    _prune(out)
+    return base
+
+
+def _prune(out):
+    metas = sorted(out.glob("*.json"))
+    for meta in metas[:max(len(metas) - config.PROFILE_MAX_FILES, 0)]:
+        for suffix in (".json", ".folded", ".prof"):
+            meta.with_suffix(suffix).unlink(missing_ok=True)
+
+
+# -- sampler --------------------------------------------------------------------
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def _ensure_sampler():
+    global _sampler
+    if _sampler is not None:
+        return
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="request-sampler", daemon=True)
+            _sampler.start()
+
+
+def _sample_loop():
+    global _sampler
+    idle_since = time.monotonic()
+    while True:
+        time.sleep(settings.interval)
+        with _active_lock:
+            active = dict(_active)
+        if not active:
+            # Stop after a quiet minute; the next profiled request restarts it.
+            if time.monotonic() - idle_since > 60:
+                with _sampler_lock, _active_lock:
+                    if not _active:
+                        _sampler = None
+                        return
+            continue
+        idle_since = time.monotonic()
+        frames = sys._current_frames()
+        for ident, profile in active.items():
+            frame = frames.get(ident)
+            if frame is not None:
+                profile.stacks[_fold(frame)] += 1
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
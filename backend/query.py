@@ -0,0 +1,157 @@
+"""Filters and order of item listings, and how the JSON engine plans them.
+
+A ``Query`` says which items ``GET /media`` wants and in what order. The
+SQLite engine turns it into a WHERE clause and leaves the choice of index
+to SQLite; the JSON engine asks ``plan`` which of its indexes to start
+from.
+"""
+import math
+from itertools import chain
+
+from records import date_key
+
+# Cost of one comparison while sorting candidates, relative to fetching and
+# testing one item: the sort runs in C on tuples, the tests in Python.
+SORT_COST = 0.1
+
+
+class Query:
+    """Items to list and their order.
+
+    ``categories`` and ``authors`` hold the accepted values; an item must
+    match one of each that is given. ``published_after`` and
+    ``published_before`` are inclusive ISO dates or None; with either set,
+    items without an ISO date never match. ``sort`` is a key of
+    ``store_base.SORT_FIELDS``; ``descending`` reverses the whole order,
+    ties included.
+    """
+
+    def __init__(self, categories=(), authors=(), published_after=None, published_before=None,
+                 sort="id", descending=False):
+        self.categories = tuple(dict.fromkeys(categories))
+        self.authors = tuple(dict.fromkeys(authors))
+        self.published_after = published_after
+        self.published_before = published_before
+        self.sort = sort
+        self.descending = descending
+
+    @property
+    def dated(self):
+        return self.published_after is not None or self.published_before is not None
+
+    @property
+    def filtered(self):
+        return bool(self.categories or self.authors or self.dated)
+
+    def date_bounds(self):
+        """The date range as ``records.date_key`` values ``(low, high)``; high is None if open."""
+        return (0 if self.published_after is None else date_key(self.published_after),
+                None if self.published_before is None else date_key(self.published_before))
+
+    def matcher(self):
+        """A test for ``records.Record``s, or None if every item matches."""
+        if not self.filtered:
+            return None
+        categories = frozenset(self.categories) or None
+        authors = frozenset(self.authors) or None
+        dated = self.dated
+        low, high = self.date_bounds()
+
+        def matches(record):
+            if categories is not None and record.category_name not in categories:
+                return False
+            if authors is not None and record.author not in authors:
+                return False
+            if dated:
+                key = record.date_key()
+                if key < low or (high is not None and key > high):
+                    return False
+            return True
+        return matches
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v not in ((), None, False))
+        return f"Query({fields})"
+
+
+class Plan:
+    """How the JSON engine answers a query.
+
+    ``source`` is where candidates come from: "scan" walks the sort index
+    testing every item until the page is full; "category", "author" and
+    "date" take the items an index lists for the filter, test them and
+    sort the matches. ``ids()`` gives those candidates, ``size`` their
+    number, ``ordered`` whether they already come in the requested sort
+    order and ``total`` the number of matches when an index tells it
+    without testing items (None otherwise). ``cost`` is the estimate the
+    plan was picked by, in items touched.
+    """
+
+    def __init__(self, source, size, cost, total=None, ids=None, ordered=False):
+        self.source = source
+        self.size = size
+        self.cost = cost
+        self.total = total
+        self.ids = ids
+        self.ordered = ordered
+
+    def __repr__(self):
+        return f"Plan({self.source}, size={self.size}, cost={self.cost:.0f}, total={self.total})"
+
+
+def _sources(query, indexes):
+    """``(name, size, ids)`` for each filter an index can list candidates for."""
+    sources = []
+    if query.categories:
+        buckets = [indexes.category.get(c, {}) for c in query.categories]
+        sources.append(("category", sum(map(len, buckets)), lambda: chain.from_iterable(buckets)))
+    by_author = indexes.sorted.get("author")
+    if query.authors and by_author is not None:
+        # The author sort index orders case-folded names; the matcher then
+        # keeps exact matches only.
+        folded = dict.fromkeys(a.casefold() for a in query.authors)
+        ranges = [by_author.bounds(name, name) for name in folded]
+        sources.append(("author", sum(hi - lo for lo, hi in ranges),
+                        lambda: chain.from_iterable(by_author.ids[lo:hi] for lo, hi in ranges)))
+    if query.dated and indexes.with_dates:
+        low, high = query.date_bounds()
+        lo, hi = indexes.by_date.bounds(low, high)
+        sources.append(("date", hi - lo, lambda: indexes.by_date.ids[lo:hi]))
+    return sources
+
+
+def plan(query, indexes, count, limit=None, offset=0):
+    """Pick the cheaper way to answer ``query`` from ``ItemIndexes`` over ``count`` items.
+
+    Walking the sort index touches about ``(offset + limit) / selectivity``
+    items, plus one pass over the smallest candidate set to count the
+    matches when no index gives that number. Starting from the smallest
+    candidate set touches all of it and sorts the matches unless they come
+    in order already, each comparison weighted by ``SORT_COST``. Filters
+    are taken to be independent when estimating how many items match.
+    """
+    want = count if limit is None else min(count, offset + limit)
+    if not query.filtered:
+        return Plan("scan", count, want, count)
+    sources = _sources(query, indexes)
+    families = sum(map(bool, (query.categories, query.authors, query.dated)))
+    if not sources:
+        return Plan("scan", count, 2 * count)
+    name, size, ids = min(sources, key=lambda s: s[1])
+    # Filters no index lists candidates for (dates without the date index)
+    # leave the estimate alone.
+    matches = size
+    for other, other_size, _ in sources:
+        if other != name:
+            matches *= other_size / max(count, 1)
+    # A lone filter whose index lists exact matches gives the total; author
+    # ranges may hold other spellings of the name.
+    total = size if families == 1 and name != "author" else None
+    walk = count if matches < 1 else min(count, want * count / matches)
+    if total is None:
+        walk += size
+    ordered = name == "date" and query.sort == "date"
+    lookup = size + (0 if ordered else SORT_COST * matches * math.log2(max(matches, 2)))
+    if walk <= lookup:
+        return Plan("scan", size, walk, total, ids)
+    return Plan(name, size, lookup, total, ids, ordered)
@@ -0,0 +1,160 @@
+"""Compact in-memory form of library items, used by the JSON engine.
+
+A plain item dict costs roughly a kilobyte once its five strings are
+counted, a third of it for the 36-character id. A ``Record`` keeps the
+same item in a slotted object:
+
+* ``id``: the 16 bytes of a canonical UUID; other ids stay strings.
+* ``date``: ``YYYY-MM-DD`` as the int ``YYYYMMDD``, which sorts like the
+  string and converts back exactly; anything else stays a string.
+* ``category``: an index into ``CATEGORIES``; unknown categories stay
+  strings.
+* ``author``: interned, since most authors have many items.
+
+Equal dates share one int object and equal authors one string.
+``to_dict`` gives back the item exactly as the API and the files see it.
+"""
+import re
+import sys
+
+CATEGORIES = ("Book", "Film", "Magazine")
+_CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+FIELDS = ("id", "name", "publication_date", "author", "category")
+_FIELD_SET = frozenset(FIELDS)
+
+_BOUND_RE = re.compile(r"(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?")
+_dates = {}  # "YYYY-MM-DD" -> the shared int for it
+_date_texts = {}  # and back
+
+
+def pack_id(item_id):
+    """Bytes of a canonical (lower-case, hyphenated) UUID string, else the id itself."""
+    # Hyphens at 8, 13, 18 and 23, nowhere else, and lower-case hex digits.
+    if (type(item_id) is str and len(item_id) == 36 and item_id[8:24:5] == "----"
+            and item_id == item_id.lower()):
+        try:
+            packed = bytes.fromhex(item_id.replace("-", ""))
+        except ValueError:
+            return item_id
+        if len(packed) == 16:  # fromhex skips spaces
+            return packed
+    return item_id
+
+
+def unpack_id(packed):
+    if type(packed) is not bytes:
+        return packed
+    h = packed.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def id_key(packed):
+    """Sort key for packed ids; bytes and string ids do not compare directly."""
+    return packed if isinstance(packed, bytes) else packed.encode("utf-8")
+
+
+def pack_date(text):
+    value = _dates.get(text) if type(text) is str else None
+    if value is not None:
+        return value
+    if type(text) is str and len(text) == 10 and text[4] == text[7] == "-":
+        digits = text[:4] + text[5:7] + text[8:]
+        if digits.isascii() and digits.isdigit():
+            value = _dates[text] = int(digits)
+            _date_texts[value] = text
+            return value
+    return text
+
+
+def unpack_date(packed):
+    if type(packed) is not int:
+        return packed
+    text = _date_texts.get(packed)
+    if text is None:
+        text = f"{packed // 10000:04d}-{packed // 100 % 100:02d}-{packed % 100:02d}"
+    return text
+
+
+def date_key(text):
+    """Packed form of an ISO date or date prefix, for comparing with ``Record.date_key``.
+
+    ``"2020"`` and ``"2020-05"`` become ``20200000`` and ``20200500``, which
+    order against full dates exactly as the strings do. Anything else is -1.
+    """
+    m = _BOUND_RE.fullmatch(text) if isinstance(text, str) else None
+    if m is None:
+        return -1
+    return int(m[1] + (m[2] or "00") + (m[3] or "00"))
+
+
+class Record:
+    """One library item; build with ``from_dict``, convert back with ``to_dict``.
+
+    ``record.get(field)`` and ``record[field]`` return the values the API
+    shows (``record["id"]`` is the id string); the attributes hold the
+    packed values, and ``record.id`` is what the store keys items by.
+    Fields other than the five known ones are kept in ``extra``; a missing
+    known field comes back as None.
+    """
+
+    __slots__ = ("id", "name", "date", "author", "category", "extra")
+
+    @classmethod
+    def from_dict(cls, item):
+        record = cls.__new__(cls)
+        record.id = pack_id(item.get("id"))
+        record.name = item.get("name")
+        record.date = pack_date(item.get("publication_date"))
+        author = item.get("author")
+        record.author = sys.intern(author) if type(author) is str else author
+        category = item.get("category")
+        record.category = _CATEGORY_CODES.get(category, category) if type(category) is str else category
+        record.extra = None
+        if len(item) != len(FIELDS) or item.keys() != _FIELD_SET:
+            record.extra = {k: v for k, v in item.items() if k not in FIELDS} or None
+        return record
+
+    def to_dict(self):
+        category = self.category
+        item = {
+            "id": unpack_id(self.id),
+            "name": self.name,
+            "publication_date": unpack_date(self.date),
+            "author": self.author,
+            "category": CATEGORIES[category] if type(category) is int else category,
+        }
+        if self.extra is not None:
+            item.update(self.extra)
+        return item
+
+    @property
+    def category_name(self):
+        category = self.category
+        return CATEGORIES[category] if type(category) is int else category
+
+    def date_key(self):
+        """The date as an int for sorting and range queries; see ``date_key``."""
+        return self.date if type(self.date) is int else date_key(self.date)
+
+    def get(self, field, default=None):
+        if field == "name":
+            return self.name
+        if field == "author":
+            return self.author
+        if field == "category":
+            return self.category_name
+        if field == "publication_date":
+            return unpack_date(self.date)
+        if field == "id":
+            return unpack_id(self.id)
+        return self.extra.get(field, default) if self.extra else default
+
+    def __getitem__(self, field):
+        value = self.get(field, KeyError)
+        if value is KeyError:
+            raise KeyError(field)
+        return value
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
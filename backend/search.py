@@ -0,0 +1,238 @@
+"""Inverted index for ranked full-text and prefix search over name and author."""
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+from records import id_key
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Relative weight of a hit in each indexed field.
+FIELD_WEIGHTS = {"name": 2.0, "author": 1.0}
+
+# A query term that only matches as a prefix scores this fraction of an exact hit.
+PREFIX_FACTOR = 0.6
+
+# Query terms shorter than this only match whole words; expanding a single
+# letter would touch most of the index.
+MIN_PREFIX_LEN = 2
+
+# A prefix expands to at most this many indexed words, the most frequent ones.
+MAX_EXPANSIONS = 30
+
+
+def normalize(text):
+    """``text`` case-folded and without diacritics ("Pokémon" -> "pokemon").
+
+    Matches the FTS5 ``remove_diacritics 2`` tokenizer of the SQLite engine.
+    """
+    if text.isascii():
+        return text.casefold()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    """Split ``text`` into normalized word tokens."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def title_key(text):
+    """What a title is compared by for the exact-title rule: its tokens, space-separated."""
+    return " ".join(tokenize(text))
+
+
+class SearchIndex:
+    """Per-field postings (term -> set of record ids) plus a sorted term list.
+
+    Indexes ``records.Record``s, reading the fields as attributes.
+
+    The sorted term list turns a prefix into a contiguous range found by
+    bisection. Items are added and removed one at a time as the store
+    changes, so queries never rebuild anything; callers must ``remove`` the
+    old version of an item before ``add``-ing its replacement.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._postings = {field: {} for field in FIELD_WEIGHTS}
+        self._title_sizes = {}  # number of words in the title -> ids
+        self._terms = []
+        self._term_refs = {}
+        self._count = 0
+
+    def rebuild(self, items):
+        self.clear()
+        for item in items:
+            self._add(item, sort_terms=False)
+        self._terms = sorted(self._term_refs)
+
+    def add(self, item):
+        self._add(item, sort_terms=True)
+
+    def remove(self, item):
+        item_id = item.id
+        self._count -= 1
+        size = len(tokenize(item.name))
+        sized = self._title_sizes.get(size)
+        if sized is not None:
+            sized.discard(item_id)
+            if not sized:
+                del self._title_sizes[size]
+        for field, postings in self._postings.items():
+            for term in set(tokenize(getattr(item, field))):
+                bucket = postings.get(term)
+                if bucket is None:
+                    continue
+                bucket.discard(item_id)
+                if not bucket:
+                    del postings[term]
+                self._release(term)
+
+    def search(self, query, limit=50, name_of=None):
+        """Return up to ``limit`` ids matching every word of ``query``, best first.
+
+        Each query word matches indexed words equal to it or, from
+        ``MIN_PREFIX_LEN`` characters on, starting with it. Hits are weighted
+        by field, exact-vs-prefix and inverse document frequency. When
+        ``name_of(id)`` is given, items whose whole title equals the query
+        rank first and equal scores prefer shorter titles, then go by title
+        and id, as ``SqliteStore.search`` orders them; without it, by id.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or limit <= 0:
+            return []
+        plans = sorted((self._expand(word) for word in words), key=lambda p: p[0])
+        if plans[0][0] == 0:
+            return []
+
+        scores = self._collect(plans, limit)
+        if name_of is None:
+            return heapq.nsmallest(limit, scores, key=lambda i: (-scores[i], id_key(i)))
+        # The walk above stops once nothing left can outscore what it has,
+        # which ignores the title bonus: exact titles are scored on their own.
+        exact = self._exact_titles(words, tokenize(query), name_of)
+        for item_id in exact:
+            if item_id not in scores:
+                scores[item_id] = sum(self._best_hit(item_id, matches) for _, matches in plans)
+        def rank(item_id):
+            bonus = 10.0 if item_id in exact else 0.0
+            name = name_of(item_id)
+            return (-(scores[item_id] + bonus), len(name), name, id_key(item_id))
+        return heapq.nsmallest(limit, scores, key=rank)
+
+    def _exact_titles(self, words, tokens, name_of):
+        """Ids whose ``title_key`` is ``tokens``, space-separated.
+
+        Such a title has as many words as the query and holds every query
+        word, so only the ids in all of those postings are candidates. A
+        one-word title among them is an exact match; longer ones are
+        compared in full.
+        """
+        buckets = [self._postings["name"].get(word) for word in words]
+        buckets.append(self._title_sizes.get(len(tokens)))
+        if not all(buckets):
+            return set()
+        buckets.sort(key=len)
+        candidates = buckets[0].intersection(*buckets[1:])
+        if len(tokens) == 1:
+            return candidates
+        phrase = " ".join(tokens)
+        return {item_id for item_id in candidates if title_key(name_of(item_id)) == phrase}
+
+    def _collect(self, plans, limit):
+        """Score the ids that match every plan, enough to hold the ``limit`` best.
+
+        The most selective word drives the walk. Its buckets are ordered by
+        weight, so the first bucket an id shows up in gives its best score
+        for that word, and no id first met in a later bucket can score more
+        than that bucket's weight plus the best weight of every other word.
+        The walk stops before a bucket once ``limit`` ids score more than
+        that, instead of scoring every posting of a common word; whole
+        buckets are scored, so ties are all there for the tie-break. The
+        other words are checked by probing their buckets.
+        """
+        (_, driver), rest = plans[0], [matches for _, matches in plans[1:]]
+        rest_best = sum(matches[0][1] for matches in rest)
+        scores = {}
+        seen = set()
+        for bucket, weight in driver:
+            if len(scores) >= limit and heapq.nlargest(limit, scores.values())[-1] > weight + rest_best:
+                break
+            for item_id in bucket:
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                score = weight
+                for matches in rest:
+                    hit = self._best_hit(item_id, matches)
+                    if not hit:
+                        break
+                    score += hit
+                else:
+                    scores[item_id] = score
+        return scores
+
+    def _add(self, item, sort_terms):
+        item_id = item.id
+        self._count += 1
+        self._title_sizes.setdefault(len(tokenize(item.name)), set()).add(item_id)
+        for field, postings in self._postings.items():
+            for term in set(tokenize(getattr(item, field))):
+                bucket = postings.get(term)
+                if bucket is None:
+                    bucket = postings[term] = set()
+                bucket.add(item_id)
+                refs = self._term_refs.get(term, 0)
+                self._term_refs[term] = refs + 1
+                if refs == 0 and sort_terms:
+                    insort(self._terms, term)
+
+    def _release(self, term):
+        refs = self._term_refs[term] - 1
+        if refs:
+            self._term_refs[term] = refs
+            return
+        del self._term_refs[term]
+        pos = bisect_left(self._terms, term)
+        if pos < len(self._terms) and self._terms[pos] == term:
+            del self._terms[pos]
+
+    def _expand(self, word):
+        """Return (total posting size, [(postings set, weight), ...]) for one query word."""
+        if len(word) >= MIN_PREFIX_LEN:
+            lo = bisect_left(self._terms, word)
+            hi = bisect_left(self._terms, word + "\U0010ffff", lo)
+            terms = self._terms[lo:hi]
+            if len(terms) > MAX_EXPANSIONS:
+                terms = heapq.nlargest(MAX_EXPANSIONS, terms, key=self._term_refs.__getitem__)
+                if word in self._term_refs and word not in terms:
+                    terms.append(word)
+        else:
+            terms = [word] if word in self._term_refs else []
+        matches = []
+        size = 0
+        for term in terms:
+            factor = 1.0 if term == word else PREFIX_FACTOR
+            for field, postings in self._postings.items():
+                bucket = postings.get(term)
+                if bucket:
+                    idf = math.log(1.0 + self._count / len(bucket))
+                    matches.append((bucket, FIELD_WEIGHTS[field] * factor * idf))
+                    size += len(bucket)
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return size, matches
+
+    @staticmethod
+    def _best_hit(item_id, matches):
+        # ``matches`` is sorted by weight, so the first hit is the best one.
+        for bucket, weight in matches:
+            if item_id in bucket:
+                return weight
+        return 0.0
@@ -0,0 +1,82 @@
+"""Run the backend under a production WSGI server.
+
+    python backend/serve.py
+
+gunicorn runs ``config.WORKERS`` processes with ``config.THREADS`` threads
+each; the storage engines keep separate processes consistent through their
+file locks. gunicorn does not run on Windows, where waitress serves from one
+process with a thread pool instead. Without either, Werkzeug's server is used
+in threaded mode. Set LIBRARY_SERVER to force one.
+"""
+import importlib.util
+import os
+
+# Use a direct import so the module can be run as a script
+import config
+
+SERVERS = ("gunicorn", "waitress", "werkzeug")
+
+
+def available(name):
+    if name == "gunicorn" and os.name == "nt":
+        return False
+    return name == "werkzeug" or importlib.util.find_spec(name) is not None
+
+
+def pick_server(requested=None):
+    requested = requested or config.SERVER
+    if requested == "auto":
+        return next(name for name in SERVERS if available(name))
+    if requested not in SERVERS:
+        raise ValueError(f"LIBRARY_SERVER must be auto or one of: {', '.join(SERVERS)}")
+    if not available(requested):
+        raise ValueError(f"{requested} is not available on this system")
+    return requested
+
+
+def serve_gunicorn(host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            # Streaming exports can outlive the default 30 s worker timeout.
+            self.cfg.set("timeout", 120)
+            self.cfg.set("accesslog", "-" if config.DEBUG else None)
+
+        def load(self):
+            # Imported in each worker after the fork, so no worker inherits
+            # open files or threads of the store from the master.
+            from wsgi import app
+            return app
+
+    Server().run()
+
+
+def serve_waitress(host, port, threads):
+    from waitress import serve
+    from wsgi import app
+    serve(app, host=host, port=port, threads=threads)
+
+
+def serve_werkzeug(host, port):
+    from wsgi import app
+    app.run(host=host, port=port, threaded=True, debug=config.DEBUG, use_reloader=False)
+
+
+def main():
+    server = pick_server()
+    host, port = config.HOST, config.PORT
+    print(f"Serving on http://{host}:{port} with {server}", flush=True)
+    if server == "gunicorn":
+        serve_gunicorn(host, port, config.WORKERS, config.THREADS)
+    elif server == "waitress":
+        serve_waitress(host, port, config.THREADS)
+    else:
+        serve_werkzeug(host, port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Binary image of the library snapshot, memory-mapped and decoded lazily.
+
+``library.json`` stays the snapshot of record; the JSON engine writes
+``library.snap`` next to it whenever it writes the JSON, and opens the
+image instead of parsing the JSON when the image was made from the
+current file. Opening costs the same whatever the library size: the file
+is mapped read-only, so its pages come from the OS page cache and are
+shared by every worker process that maps it, and an item is only decoded
+when it is read.
+
+Layout, integers little-endian::
+
+    header    magic, format version, item count, (mtime_ns, size) of the
+              library.json it was made from, and the positions of the
+              three tables below
+    data      per item: its tagged id key, then its compact JSON
+    offsets   u64 x (count + 1): where each item's data starts; the last
+              one is the end of the data
+    id sizes  u32 x count: length of each item's id key
+    id table  u32 x slots: open-addressing hash table of item index + 1
+              by crc32 of the id key (0 marks an empty slot)
+
+Items are stored in library order. An item's JSON is exactly what
+``json_codec.dumps`` makes of it, so responses can use it as it is.
+
+Files are only ever replaced by rename, never rewritten in place, so a
+process keeps reading the image it mapped until it maps a newer one.
+"""
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+
+import json_codec
+from records import Record
+
+MAGIC = b"LIBSNAP\0"
+FORMAT_VERSION = 1
+
+# magic, format version, flags (unused), count, source mtime_ns, source
+# size, offsets position, id sizes position, id table position, slots
+_HEADER = struct.Struct("<8sIIQqqQQQQ")
+_SOURCE_AT = 24  # position of the source stamp within the header
+
+_UUID_TAG = b"\0"
+_TEXT_TAG = b"\1"
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot image this version can read."""
+
+
+def _key(item_id):
+    """The id as stored: a tag byte, then the UUID bytes or the UTF-8 text.
+
+    The tag keeps a 16-character text id from matching a UUID's bytes.
+    """
+    if type(item_id) is bytes:
+        return _UUID_TAG + item_id
+    return _TEXT_TAG + item_id.encode("utf-8")
+
+
+def _little_endian(values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class SnapshotWriter:
+    """Writes an image to the binary file ``f``, one item at a time.
+
+    ``add`` every item, then ``finish``; the header is written last, so a
+    file that was not finished is never taken for an image.
+    """
+
+    def __init__(self, f):
+        self._file = f
+        self._file.write(bytes(_HEADER.size))
+        self._offsets = array("Q", [_HEADER.size])
+        self._id_sizes = array("I")
+        self._hashes = array("I")
+
+    def add(self, item_id, data):
+        """Append the item with packed id ``item_id`` and encoded JSON ``data``."""
+        key = _key(item_id)
+        self._file.write(key)
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(key) + len(data))
+        self._id_sizes.append(len(key))
+        self._hashes.append(zlib.crc32(key))
+
+    def finish(self, source=(0, 0)):
+        """Write the tables and the header; ``source`` is the library.json stamp."""
+        count = len(self._id_sizes)
+        slots = 8
+        while slots < 2 * count:
+            slots *= 2
+        mask = slots - 1
+        table = array("I", bytes(4 * slots))
+        for index, h in enumerate(self._hashes):
+            slot = h & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = index + 1
+
+        f = self._file
+        f.write(bytes(-f.tell() % 8))
+        offsets_at = f.tell()
+        f.write(_little_endian(self._offsets))
+        id_sizes_at = f.tell()
+        f.write(_little_endian(self._id_sizes))
+        f.write(bytes(-f.tell() % 8))
+        table_at = f.tell()
+        f.write(_little_endian(table))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, count, source[0], source[1],
+                             offsets_at, id_sizes_at, table_at, slots))
+        f.seek(0, 2)
+        return f.tell()
+
+
+def set_source(path, source):
+    """Record in the image at ``path`` which library.json (stamp ``source``) it holds."""
+    with open(path, "r+b") as f:
+        f.seek(_SOURCE_AT)
+        f.write(struct.pack("<qq", *source))
+
+
+class Snapshot:
+    """A read-only, memory-mapped image. Items are addressed by their index.
+
+    Raises ``SnapshotError`` if ``path`` is not a complete image and
+    ``OSError`` if it cannot be opened.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise SnapshotError(f"{path} is empty") from None
+        size = len(self._map)
+        if size < _HEADER.size or sys.byteorder != "little":
+            raise SnapshotError(f"{path} is not a snapshot image")
+        (magic, version, _, count, mtime_ns, source_size,
+         offsets_at, id_sizes_at, table_at, slots) = _HEADER.unpack_from(self._map)
+        if (magic != MAGIC or version != FORMAT_VERSION
+                or offsets_at + 8 * (count + 1) > id_sizes_at
+                or id_sizes_at + 4 * count > table_at
+                or table_at + 4 * slots != size or slots & (slots - 1) or slots <= count):
+            raise SnapshotError(f"{path} is not a snapshot image")
+        self.source = (mtime_ns, source_size)
+        self.size = size
+        view = memoryview(self._map)
+        self._offsets = view[offsets_at:offsets_at + 8 * (count + 1)].cast("Q")
+        self._id_sizes = view[id_sizes_at:id_sizes_at + 4 * count].cast("I")
+        self._table = view[table_at:size].cast("I")
+        self._mask = slots - 1
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def find(self, item_id):
+        """Index of the item with packed id ``item_id``, or -1."""
+        key = _key(item_id)
+        table, offsets, id_sizes, data = self._table, self._offsets, self._id_sizes, self._map
+        slot = zlib.crc32(key) & self._mask
+        while True:
+            entry = table[slot]
+            if not entry:
+                return -1
+            start = offsets[entry - 1]
+            if data[start:start + id_sizes[entry - 1]] == key:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def key(self, index):
+        """The packed id of item ``index``."""
+        start = self._offsets[index]
+        key = self._map[start:start + self._id_sizes[index]]
+        return key[1:] if key[:1] == _UUID_TAG else key[1:].decode("utf-8")
+
+    def json(self, index):
+        """The encoded JSON of item ``index``."""
+        return self._map[self._offsets[index] + self._id_sizes[index]:self._offsets[index + 1]]
+
+    def record(self, index):
+        return Record.from_dict(json_codec.loads(self.json(index)))
+
+
+_MAPPED = object()
+
+
+class SnapshotItems:
+    """The store's items: an optional mapped ``Snapshot`` plus the changes since.
+
+    Behaves like a dict from packed id to ``Record``. Mapped items are
+    decoded on first access and kept; items written since the snapshot
+    live in ``_replaced`` (by snapshot index, None once deleted) or, if
+    the snapshot does not have them, ``_added``. Iteration follows the
+    snapshot's order, then the order items were added in.
+    """
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self._count = len(snapshot) if snapshot is not None else 0
+        self._decoded = [None] * self._count
+        self._replaced = {}
+        self._added = {}
+        self._len = self._count
+
+    def copy(self):
+        """A copy sharing the mapped snapshot and its decoded items."""
+        other = SnapshotItems.__new__(SnapshotItems)
+        other.snapshot, other._count, other._decoded = self.snapshot, self._count, self._decoded
+        other._replaced, other._added = dict(self._replaced), dict(self._added)
+        other._len = self._len
+        return other
+
+    def __len__(self):
+        return self._len
+
+    def _find(self, item_id):
+        return self.snapshot.find(item_id) if self._count else -1
+
+    def _mapped(self, index):
+        record = self._decoded[index]
+        if record is None:
+            record = self._decoded[index] = self.snapshot.record(index)
+        return record
+
+    def get(self, item_id, default=None):
+        record = self._added.get(item_id)
+        if record is not None:
+            return record
+        index = self._find(item_id)
+        if index < 0:
+            return default
+        record = self._replaced.get(index, _MAPPED)
+        if record is _MAPPED:
+            return self._mapped(index)
+        return default if record is None else record
+
+    def __getitem__(self, item_id):
+        record = self.get(item_id)
+        if record is None:
+            raise KeyError(item_id)
+        return record
+
+    def __contains__(self, item_id):
+        return self.get(item_id) is not None
+
+    def __setitem__(self, item_id, record):
+        index = self._find(item_id)
+        if index < 0:
+            if item_id not in self._added:
+                self._len += 1
+            self._added[item_id] = record
+            return
+        if self._replaced.get(index, _MAPPED) is None:
+            self._len += 1
+        self._replaced[index] = record
+        self._decoded[index] = None
+
+    def pop(self, item_id, default=None):
+        if item_id in self._added:
+            self._len -= 1
+            return self._added.pop(item_id)
+        index = self._find(item_id)
+        if index < 0:
+            return default
+        record = self._replaced.get(index, _MAPPED)
+        if record is None:
+            return default
+        if record is _MAPPED:
+            record = self._mapped(index)
+        self._replaced[index] = None
+        self._decoded[index] = None
+        self._len -= 1
+        return record
+
+    def _walk(self):
+        """``(index, record)`` for every item; record is None for untouched mapped items."""
+        replaced = self._replaced
+        if not replaced:
+            for index in range(self._count):
+                yield index, None
+        else:
+            for index in range(self._count):
+                record = replaced.get(index, _MAPPED)
+                if record is _MAPPED:
+                    yield index, None
+                elif record is not None:
+                    yield index, record
+        for record in self._added.values():
+            yield -1, record
+
+    def values(self):
+        for index, record in self._walk():
+            yield record if record is not None else self._mapped(index)
+
+    def json_values(self, encode):
+        """The encoded items: mapped ones as stored, the rest through ``encode(record)``."""
+        json = self.snapshot.json if self._count else None
+        for index, record in self._walk():
+            yield encode(record) if record is not None else json(index)
+
+    def encoded(self, encode):
+        """``(packed id, encoded item)`` pairs, like ``json_values``."""
+        snapshot = self.snapshot
+        for index, record in self._walk():
+            if record is None:
+                yield snapshot.key(index), snapshot.json(index)
+            else:
+                yield record.id, encode(record)
+
+
+def encode_record(record):
+    return json_codec.dumps(record.to_dict())
@@ -0,0 +1,472 @@
+"""Library storage engine backed by SQLite."""
+import sqlite3
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import config
+import metrics
+from search import MIN_PREFIX_LEN, title_key, tokenize
+from store_base import SORT_FIELDS, LibraryStore
+
+COLUMNS = ("id", "name", "publication_date", "author", "category")
+_SELECT = "SELECT id, name, publication_date, author, category FROM items"
+_SELECT_VERSIONED = "SELECT id, name, publication_date, author, category, version FROM items"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    pk INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    publication_date TEXT NOT NULL,
+    author TEXT NOT NULL,
+    category TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS library_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL,
+    modified REAL NOT NULL,
+    journal_floor INTEGER NOT NULL DEFAULT 0,
+    stats_ready INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO library_state (id, version, modified) VALUES (0, 0, 0);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_version ON changes (version);
+CREATE INDEX IF NOT EXISTS items_category ON items (category, id);
+CREATE INDEX IF NOT EXISTS items_name ON items (name);
+CREATE INDEX IF NOT EXISTS items_publication_date ON items (publication_date, id);
+-- Name and author order: case-folded like the JSON engine's sort keys.
+-- The NOCASE indexes of older databases folded ASCII only.
+DROP INDEX IF EXISTS items_name_sort;
+DROP INDEX IF EXISTS items_author_sort;
+CREATE INDEX IF NOT EXISTS items_name_fold ON items (name COLLATE CASEFOLD, id);
+CREATE INDEX IF NOT EXISTS items_author_fold ON items (author COLLATE CASEFOLD, id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5 (
+    name, author,
+    content='items', content_rowid='pk',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, name, author) VALUES (new.pk, new.name, new.author);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, author) VALUES ('delete', old.pk, old.name, old.author);
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, name, author) VALUES ('delete', old.pk, old.name, old.author);
+    INSERT INTO items_fts (rowid, name, author) VALUES (new.pk, new.name, new.author);
+END;
+
+CREATE TABLE IF NOT EXISTS stats_days (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats_authors (
+    author TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS items_stats_insert AFTER INSERT ON items BEGIN
+    INSERT INTO stats_days VALUES (new.publication_date, new.category, 1)
+        ON CONFLICT (day, category) DO UPDATE SET count = count + 1;
+    INSERT INTO stats_authors VALUES (new.author, 1) ON CONFLICT (author) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS items_stats_delete AFTER DELETE ON items BEGIN
+    UPDATE stats_days SET count = count - 1 WHERE day = old.publication_date AND category = old.category;
+    DELETE FROM stats_days WHERE day = old.publication_date AND category = old.category AND count = 0;
+    UPDATE stats_authors SET count = count - 1 WHERE author = old.author;
+    DELETE FROM stats_authors WHERE author = old.author AND count = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS items_stats_update AFTER UPDATE OF publication_date, author, category ON items
+BEGIN
+    UPDATE stats_days SET count = count - 1 WHERE day = old.publication_date AND category = old.category;
+    DELETE FROM stats_days WHERE day = old.publication_date AND category = old.category AND count = 0;
+    UPDATE stats_authors SET count = count - 1 WHERE author = old.author;
+    DELETE FROM stats_authors WHERE author = old.author AND count = 0;
+    INSERT INTO stats_days VALUES (new.publication_date, new.category, 1)
+        ON CONFLICT (day, category) DO UPDATE SET count = count + 1;
+    INSERT INTO stats_authors VALUES (new.author, 1) ON CONFLICT (author) DO UPDATE SET count = count + 1;
+END;
+"""
+
+# Fills the stats tables from the items of a database made before they
+# existed; the triggers above keep them current from then on.
+_STATS_BACKFILL = (
+    "DELETE FROM stats_days",
+    "DELETE FROM stats_authors",
+    "INSERT INTO stats_days SELECT publication_date, category, count(*) FROM items "
+    "GROUP BY publication_date, category",
+    "INSERT INTO stats_authors SELECT author, count(*) FROM items GROUP BY author",
+    "UPDATE library_state SET stats_ready = 1 WHERE id = 0",
+)
+
+# The year of a stats_days row; NULL unless the day starts with four digits.
+_YEAR = "CASE WHEN day GLOB '[0-9][0-9][0-9][0-9]*' THEN CAST(substr(day, 1, 4) AS INTEGER) END"
+
+_UPSERT = (
+    "INSERT INTO items (id, name, publication_date, author, category, version) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, publication_date = excluded.publication_date, "
+    "author = excluded.author, category = excluded.category, version = excluded.version"
+)
+_UPDATE = "UPDATE items SET name = ?, publication_date = ?, author = ?, category = ?, version = ? WHERE id = ?"
+_DELETE = "DELETE FROM items WHERE id = ?"
+_STATE = "SELECT version, modified FROM library_state WHERE id = 0"
+_CHANGES = (
+    "SELECT c.id, i.name, i.publication_date, i.author, i.category, i.id IS NULL "
+    "FROM (SELECT id, max(seq) AS seq FROM changes WHERE version > ? GROUP BY id) c "
+    "LEFT JOIN items i ON i.id = c.id ORDER BY c.seq"
+)
+
+# Columns added after the first release, created on databases that lack them.
+_ADDED_COLUMNS = (
+    ("items", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("library_state", "journal_floor", "INTEGER NOT NULL DEFAULT 0"),
+    ("library_state", "stats_ready", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+
+def _casefold(a, b):
+    """The CASEFOLD collation: ``str.casefold`` order, as ``indexes.SORT_KEYS`` sorts."""
+    a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+class _Held:
+    """A thread's connection, kept in thread-local storage.
+
+    Thread locals are dropped when their thread exits; a finalizer on this
+    holder then closes the connection.
+    """
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _row(item, version):
+    return (item["id"], item["name"], item["publication_date"], item["author"], item["category"], version)
+
+
+class SqliteStore(LibraryStore):
+    """Items in one SQLite table with B-tree indexes on category, name and
+    publication_date and an FTS5 index over name and author for search.
+
+    The database runs in WAL mode, so readers never block the writer and
+    several processes can share the file. Each thread gets its own
+    connection, closed when the thread exits; statements are
+    parameterised constants, so sqlite3's statement cache keeps them
+    prepared. Every connection registers the CASEFOLD collation the name
+    and author indexes are built with, so only this class can write them.
+
+    ``library_state`` holds the library version, bumped once by every write
+    transaction, and each row records the version that last wrote it. The
+    ``changes`` table journals the ids each version wrote, trimmed to the
+    last ``journal_size`` entries; ``journal_floor`` is the newest version
+    whose entries were trimmed.
+
+    Triggers keep item counts per (publication date, category) and per
+    author in ``stats_days`` and ``stats_authors`` for ``stats``.
+    """
+
+    def __init__(self, path, fsync=None, journal_size=None):
+        self.path = Path(path)
+        self.fsync = config.WAL_FSYNC if fsync is None else fsync
+        self.journal_size = config.CHANGE_JOURNAL_SIZE if journal_size is None else journal_size
+        self._local = threading.local()
+        self._connections = set()
+        self._lock = threading.RLock()
+        self._schema_ready = False
+
+    def _conn(self):
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            return held.conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+        conn.create_collation("CASEFOLD", _casefold)
+        # search() ranks exact titles by the rule SearchIndex uses.
+        conn.create_function("title_key", 1, title_key, deterministic=True)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {'FULL' if self.fsync else 'NORMAL'}")
+        with self._lock:
+            if not self._schema_ready:
+                for table, column, decl in _ADDED_COLUMNS:
+                    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+                    if columns and column not in columns:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+                conn.executescript(SCHEMA)
+                self._backfill_stats(conn)
+                self._analyze(conn, once=True)
+                self._schema_ready = True
+            self._connections.add(conn)
+        held = self._local.held = _Held(conn)
+        weakref.finalize(held, self._release, conn)
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    @staticmethod
+    def _backfill_stats(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Checked inside the write transaction: another process may have
+            # filled the tables meanwhile.
+            if not conn.execute("SELECT stats_ready FROM library_state WHERE id = 0").fetchone()[0]:
+                for statement in _STATS_BACKFILL:
+                    conn.execute(statement)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _analyze(conn, once=False):
+        """Gather the statistics the query planner weighs indexes by.
+
+        Without them SQLite serves a filtered listing from the first index
+        with an equality match, even where a date range or the sort order
+        would read a hundredth of the rows. With ``once``, only if the
+        items table or one of its indexes has none yet.
+        """
+        if once and conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            # Indexes added since the last ANALYZE have no statistics yet.
+            if not conn.execute("SELECT 1 FROM pragma_index_list('items') WHERE name NOT IN "
+                                "(SELECT idx FROM sqlite_stat1 WHERE tbl = 'items')").fetchone():
+                return
+        conn.execute("ANALYZE items")
+
+    def _items(self, sql, params=()):
+        return [dict(zip(COLUMNS, row)) for row in self._conn().execute(sql, params)]
+
+    def _begin(self):
+        """Start a write transaction and return ``(conn, next_version)``."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn, conn.execute(_STATE).fetchone()[0] + 1
+
+    def _commit(self, conn, version, changed_ids):
+        """Journal ``changed_ids`` under ``version``, publish the version and commit."""
+        conn.executemany("INSERT INTO changes (version, id) VALUES (?, ?)",
+                         ((version, item_id) for item_id in changed_ids))
+        last = conn.execute("SELECT max(seq) FROM changes").fetchone()[0] or 0
+        cutoff = last - self.journal_size
+        trimmed = conn.execute("SELECT max(version) FROM changes WHERE seq <= ?", (cutoff,)).fetchone()[0]
+        if trimmed is not None:
+            conn.execute("DELETE FROM changes WHERE seq <= ?", (cutoff,))
+            conn.execute("UPDATE library_state SET journal_floor = max(journal_floor, ?) WHERE id = 0",
+                         (trimmed,))
+        conn.execute("UPDATE library_state SET version = ?, modified = ? WHERE id = 0",
+                     (version, time.time()))
+        with metrics.storage_timer("commit"):
+            conn.execute("COMMIT")
+
+    # -- reads --------------------------------------------------------------
+
+    def get(self, item_id):
+        row = self._conn().execute(_SELECT + " WHERE id = ?", (item_id,)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def all(self):
+        return self._items(_SELECT + " ORDER BY pk")
+
+    def count(self):
+        return self._conn().execute("SELECT count(*) FROM items").fetchone()[0]
+
+    def version_info(self):
+        version, modified = self._conn().execute(_STATE).fetchone()
+        return version, modified
+
+    def changes(self, since):
+        conn = self._conn()
+        # One read transaction, so the version and the rows agree.
+        conn.execute("BEGIN")
+        try:
+            version, floor = conn.execute(
+                "SELECT version, journal_floor FROM library_state WHERE id = 0").fetchone()
+            if since < floor or since > version:
+                return None
+            rows = conn.execute(_CHANGES, (since,)).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        upserted = [dict(zip(COLUMNS, row[:5])) for row in rows if not row[5]]
+        deleted = [row[0] for row in rows if row[5]]
+        return version, upserted, deleted
+
+    def get_versioned(self, item_id):
+        row = self._conn().execute(_SELECT_VERSIONED + " WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            return None, None
+        return dict(zip(COLUMNS, row)), row[-1]
+
+    def query(self, query, limit=None, after=None, after_value=None, offset=0):
+        sort = query.sort
+        field = SORT_FIELDS[sort]
+        collate = "" if sort in ("id", "date") else " COLLATE CASEFOLD"
+        where, params = [], []
+        if query.categories:
+            where.append(f"category IN ({', '.join('?' * len(query.categories))})")
+            params.extend(query.categories)
+        if query.authors:
+            # The case-insensitive test lets SQLite use items_author_fold; the
+            # second keeps exact matches only.
+            marks = ", ".join("?" * len(query.authors))
+            where.append(f"author COLLATE CASEFOLD IN ({marks}) AND author IN ({marks})")
+            params.extend(query.authors * 2)
+        if query.published_after is not None:
+            where.append("publication_date >= ?")
+            params.append(query.published_after)
+        if query.published_before is not None:
+            where.append("publication_date <= ?")
+            params.append(query.published_before)
+        filters, filter_params = list(where), list(params)
+        if after is not None:
+            op = "<" if query.descending else ">"
+            if sort == "id":
+                where.append(f"id {op} ?")
+                params.append(after)
+            else:
+                # The collation goes on the parameter: SQLite only turns the
+                # row-value comparison into an index seek in this form.
+                where.append(f"({field}, id) {op} (?{collate}, ?)")
+                params.extend((after_value or "", after))
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        direction = " DESC" if query.descending else ""
+        order = f"id{direction}" if sort == "id" else f"{field}{collate}{direction}, id{direction}"
+        items = self._items(f"{_SELECT}{clause} ORDER BY {order} LIMIT ? OFFSET ?",
+                            (*params, -1 if limit is None else limit, offset))
+        if not filters:
+            total = self.count()
+        else:
+            total = self._conn().execute(f"SELECT count(*) FROM items WHERE {' AND '.join(filters)}",
+                                         filter_params).fetchone()[0]
+        return items, total
+
+    def by_category(self, category):
+        return self._items(_SELECT + " WHERE category = ? ORDER BY pk", (category,))
+
+    def by_name(self, name):
+        return self._items(_SELECT + " WHERE name = ? ORDER BY pk", (name,))
+
+    def by_date_range(self, start=None, end=None):
+        where, params = [], []
+        if start is not None:
+            where.append("publication_date >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("publication_date <= ?")
+            params.append(end)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        return self._items(f"{_SELECT}{clause} ORDER BY publication_date, id", params)
+
+    def stats(self, group, start=None, end=None):
+        where, params = [], []
+        column = "publication_date" if group == "author" and (start or end) else "day"
+        if start is not None:
+            where.append(f"{column} >= ?")
+            params.append(start)
+        if end is not None:
+            where.append(f"{column} <= ?")
+            params.append(end)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        if group == "author":
+            if where:
+                # Not kept per date: counted from the items, through the date index.
+                sql = f"SELECT author, count(*) FROM items{clause} GROUP BY author"
+            else:
+                sql = "SELECT author, count FROM stats_authors"
+        else:
+            value = "category" if group == "category" else _YEAR
+            sql = f"SELECT {value} AS value, sum(count) FROM stats_days{clause} GROUP BY value"
+        return dict(self._conn().execute(sql, params).fetchall())
+
+    def search(self, query, limit=50):
+        """FTS5 search with the same word/prefix rules as ``search.SearchIndex``.
+
+        Ranked by BM25 with name hits weighted over author hits; an exact
+        title match comes first and ties prefer shorter titles, then go by
+        title and id, like ``SearchIndex.search``.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or limit <= 0:
+            return []
+        match = " ".join(f'"{w}"*' if len(w) >= MIN_PREFIX_LEN else f'"{w}"' for w in words)
+        sql = ("SELECT i.id, i.name, i.publication_date, i.author, i.category "
+               "FROM items_fts JOIN items i ON i.pk = items_fts.rowid "
+               "WHERE items_fts MATCH ? "
+               "ORDER BY title_key(i.name) = ? DESC, bm25(items_fts, 2.0, 1.0), length(i.name), i.name, i.id "
+               "LIMIT ?")
+        return self._items(sql, (match, title_key(query), limit))
+
+    # -- writes -------------------------------------------------------------
+
+    def put(self, item):
+        self.apply([(0, "create", item)])
+        return item
+
+    def update(self, item):
+        return not self.apply([(0, "update", item)])
+
+    def delete(self, item_id):
+        return not self.apply([(0, "delete", item_id)])
+
+    def apply(self, ops, atomic=True):
+        conn, version = self._begin()
+        errors = []
+        changed = []
+        try:
+            for row, op, payload in ops:
+                if op == "create":
+                    conn.execute(_UPSERT, _row(payload, version))
+                    found = True
+                elif op == "update":
+                    found = conn.execute(_UPDATE, (*_row(payload, version)[1:], payload["id"])).rowcount > 0
+                else:
+                    found = conn.execute(_DELETE, (payload,)).rowcount > 0
+                if found:
+                    changed.append(payload if op == "delete" else payload["id"])
+                else:
+                    errors.append((row, "Item not found"))
+                    if atomic:
+                        break
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if (errors and atomic) or not changed:
+            conn.execute("ROLLBACK")
+        else:
+            self._commit(conn, version, changed)
+        return errors
+
+    def replace_all(self, db):
+        conn, version = self._begin()
+        try:
+            conn.execute("DELETE FROM items")
+            conn.executemany(_UPSERT, (_row(item, version) for item in db.values()))
+            # Nobody can catch up across a wholesale replacement.
+            conn.execute("DELETE FROM changes")
+            conn.execute("UPDATE library_state SET journal_floor = ? WHERE id = 0", (version,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._commit(conn, version, ())
+        self._analyze(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
@@ -1,111 +1,237 @@
-"""Database storage module for library items using JSON."""
-import json
+"""Database storage module for library items.
+
+Input is validated here, by the rules in ``validation``; persistence is
+delegated to a ``LibraryStore`` engine chosen by ``config.STORAGE_BACKEND``:
+``json`` (``json_store``) or ``sqlite`` (``sqlite_store``).
+"""
 import uuid
-import re
 from pathlib import Path
 
-DB_PATH = Path(__file__).resolve().parent.parent / "data" / "library.json"
+import config
+import metrics
+from events import EventBroker
+from profiling import traced
+from json_store import JsonStore
+from sqlite_store import SqliteStore
+from validation import FIELDS, validate_item, validate_many
+
+STORES = {"json": JsonStore, "sqlite": SqliteStore}
+DEFAULT_PATHS = {"json": config.DATA_DIR / "library.json", "sqlite": config.SQLITE_PATH}
+
+DB_PATH = DEFAULT_PATHS["json"]
+
+
+def open_store(backend=None, path=None):
+    """Create the storage engine named ``backend`` (default: configured one)."""
+    backend = backend or config.STORAGE_BACKEND
+    if backend not in STORES:
+        raise ValueError(f"Unknown storage backend {backend!r}; expected one of: {', '.join(STORES)}")
+    return STORES[backend](path or DEFAULT_PATHS[backend])
+
+
+_store = open_store()
+
+# Live change notifications for GET /media/events.
+broker = EventBroker(lambda: _store.version_info()[0])
+
+metrics.Gauge("library_items", "Items in the library.", lambda: _store.count())
+metrics.Gauge("library_version", "Current library version.", lambda: _store.version_info()[0])
+metrics.Gauge("library_event_subscribers", "Open GET /media/events streams in this process.",
+              broker.subscriber_count)
+
 
+def use_store(store):
+    """Route all storage calls to ``store`` (used by scripts and benchmarks)."""
+    global _store
+    old, _store = _store, store
+    old.close()
+
+
+def set_db_path(path):
+    """Point the module at another JSON library file (used by scripts and benchmarks)."""
+    global DB_PATH
+    DB_PATH = Path(path)
+    use_store(JsonStore(DB_PATH))
+
+
+def invalidate_cache():
+    """Force the next call to re-read the library from persistent storage."""
+    _store.invalidate()
+
+
+@traced
 def load_db():
-    if not DB_PATH.exists():
-        return {}
-    with DB_PATH.open("r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
+    """Return the whole library as a dict keyed by id."""
+    return {item["id"]: item for item in _store.all()}
 
+@traced
 def save_db(db):
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with DB_PATH.open("w", encoding="utf-8") as f:
-        json.dump(db, f, indent=2, ensure_ascii=False)
+    """Replace the whole library with ``db``. Item writes go through the engine instead."""
+    _store.replace_all(db)
+
+@traced
+def count_items():
+    return _store.count()
+
+def build_item(item_id, name, pub_date, author, category):
+    """Validate the fields of an item and return it in its stored shape.
 
+    Raises ``validation.ValidationError``, a ValueError naming every bad field.
+    """
+    fields = validate_item({"name": name, "publication_date": pub_date, "author": author, "category": category})
+    return {"id": item_id, **fields}
+
+@traced
 def create_item(name, pub_date, author, category):
     """Create and store a new item with validation."""
-    # Validate all inputs
-    if not name or not isinstance(name, str) or not name.strip():
-        raise ValueError("Name is required and must be a non-empty string")
-    if not pub_date or not isinstance(pub_date, str) or not pub_date.strip():
-        raise ValueError("Publication date is required")
-    if not author or not isinstance(author, str) or not author.strip():
-        raise ValueError("Author is required and must be a non-empty string")
-    if not category or not isinstance(category, str) or not category.strip():
-        raise ValueError("Category is required")
-    
-    # Validate date format (YYYY-MM-DD)
-    if not re.match(r'^\d{4}-\d{2}-\d{2}$', pub_date.strip()):
-        raise ValueError("Publication date must be in YYYY-MM-DD format")
-    
-    # Validate category
-    valid_categories = ["Book", "Film", "Magazine"]
-    if category.strip() not in valid_categories:
-        raise ValueError(f"Category must be one of: {', '.join(valid_categories)}")
-    
-    db = load_db()
-    item_id = str(uuid.uuid4())
-    item = {
-        "id": item_id,
-        "name": name.strip(),
-        "publication_date": pub_date.strip(),
-        "author": author.strip(),
-        "category": category.strip()
-    }
-    db[item_id] = item
-    save_db(db)
+    item = build_item(str(uuid.uuid4()), name, pub_date, author, category)
+    _store.put(item)
+    broker.publish("create", item=item)
     return item
 
+@traced
 def get_all():
-    return list(load_db().values())
+    return _store.all()
+
+@traced
+def get_page(limit, after=None, category=None, sort="id", after_value=None, offset=0):
+    """Return ``(items, total)``: up to ``limit`` items after id ``after`` in ``sort`` order.
+
+    See ``LibraryStore.page`` for ``after_value`` and ``offset``.
+    """
+    return _store.page(limit, after, category, sort, after_value, offset)
+
+@traced
+def get_all_json(category=None):
+    """Return every item (in ``category``) as encoded JSON; see ``LibraryStore.all_json``."""
+    return _store.all_json(category)
+
+@traced
+def query_items(query, limit=None, after=None, after_value=None, offset=0):
+    """Return ``(items, total)`` for a ``query.Query``; see ``LibraryStore.query``."""
+    return _store.query(query, limit, after, after_value, offset)
 
+@traced
+def query_items_json(query, limit=None, after=None, after_value=None, offset=0):
+    """``query_items`` as ``(fragments, total, last item)``; see ``LibraryStore.query_json``."""
+    return _store.query_json(query, limit, after, after_value, offset)
+
+@traced
 def get_by_id(item_id):
-    return load_db().get(item_id)
+    return _store.get(item_id)
+
+@traced
+def get_versioned(item_id):
+    """Return ``(item, version)``; ``(None, None)`` if the item does not exist."""
+    return _store.get_versioned(item_id)
+
+@traced
+def library_version():
+    """Return ``(version, modified)``: the library version and the Unix time it was written."""
+    return _store.version_info()
 
+@traced
+def get_changes(since):
+    """Return ``(version, upserted, deleted_ids)`` since version ``since``, or None if a full reload is needed."""
+    return _store.changes(since)
+
+@traced
 def delete_item(item_id):
-    db = load_db()
-    if item_id in db:
-        del db[item_id]
-        save_db(db)
-        return True
-    return False
+    if not _store.delete(item_id):
+        return False
+    broker.publish("delete", id=item_id)
+    return True
 
+@traced
 def find_by_name_exact(name):
-    return [i for i in load_db().values() if i.get("name") == name]
+    return _store.by_name(name)
 
+@traced
 def filter_by_category(category):
-    return [i for i in load_db().values() if i.get("category") == category]
+    return _store.by_category(category)
+
+@traced
+def search_items(query, limit=50):
+    """Ranked full-text search over name and author; see ``search.SearchIndex``."""
+    return _store.search(query, limit)
 
+@traced
+def filter_by_date_range(start=None, end=None):
+    """Return items published between ``start`` and ``end`` (YYYY-MM-DD, inclusive)."""
+    return _store.by_date_range(start, end)
+
+@traced
+def get_stats(group, start=None, end=None):
+    """Return ``{value: count}`` of items by ``group``; see ``LibraryStore.stats``."""
+    return _store.stats(group, start, end)
+
+@traced
 def update_item(item_id, name, pub_date, author, category):
     """Update an existing item with validation."""
-    # Validate all inputs
-    if not name or not isinstance(name, str) or not name.strip():
-        raise ValueError("Name is required and must be a non-empty string")
-    if not pub_date or not isinstance(pub_date, str) or not pub_date.strip():
-        raise ValueError("Publication date is required")
-    if not author or not isinstance(author, str) or not author.strip():
-        raise ValueError("Author is required and must be a non-empty string")
-    if not category or not isinstance(category, str) or not category.strip():
-        raise ValueError("Category is required")
-    
-    # Validate date format (YYYY-MM-DD)
-    if not re.match(r'^\d{4}-\d{2}-\d{2}$', pub_date.strip()):
-        raise ValueError("Publication date must be in YYYY-MM-DD format")
-    
-    # Validate category
-    valid_categories = ["Book", "Film", "Magazine"]
-    if category.strip() not in valid_categories:
-        raise ValueError(f"Category must be one of: {', '.join(valid_categories)}")
-    
-    db = load_db()
-    if item_id not in db:
+    item = build_item(item_id, name, pub_date, author, category)
+    if not _store.update(item):
         raise ValueError("Item not found")
-    
-    item = {
-        "id": item_id,
-        "name": name.strip(),
-        "publication_date": pub_date.strip(),
-        "author": author.strip(),
-        "category": category.strip()
-    }
-    db[item_id] = item
-    save_db(db)
+    broker.publish("update", item=item)
     return item
+
+BATCH_OPS = {"create": "created", "update": "updated", "delete": "deleted"}
+
+@traced
+def apply_batch(rows, atomic=True):
+    """Validate and apply a list of create/update/delete rows in one log write.
+
+    Each row is a dict with an ``op`` (default ``create``); creates and
+    updates carry the item fields, updates and deletes an ``id``. Rows are
+    validated with the same rules as ``create_item``/``update_item``. With
+    ``atomic`` nothing is written if any row fails; otherwise the valid rows
+    are committed. Returns a summary with per-row ``errors`` and the ``ids``
+    each row touched (None for rows that failed).
+    """
+    ops = []
+    errors = []
+    to_check = []  # (row, op, id, fields) of creates and updates
+    for row_no, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Row must be a JSON object")
+            op = row.get("op", "create")
+            if op not in BATCH_OPS:
+                raise ValueError(f"op must be one of: {', '.join(BATCH_OPS)}")
+            if op != "create" and not isinstance(row.get("id"), str):
+                raise ValueError("id is required for update and delete")
+            if op == "delete":
+                ops.append((row_no, op, row["id"]))
+                continue
+            missing = [k for k in FIELDS if k not in row]
+            if missing:
+                raise ValueError(f"Missing required fields: {', '.join(missing)}")
+            to_check.append((row_no, op, str(uuid.uuid4()) if op == "create" else row["id"], row))
+        except ValueError as e:
+            errors.append({"row": row_no, "error": str(e)})
+
+    # The field checks of every create and update in one pass.
+    checked, invalid = validate_many([row for *_, row in to_check])
+    for index, (row_no, op, item_id, _) in enumerate(to_check):
+        field_errors = invalid.get(index)
+        if field_errors:
+            errors.append({"row": row_no, "error": next(iter(field_errors.values())), "fields": field_errors})
+        else:
+            ops.append((row_no, op, {"id": item_id, **checked[index]}))
+    ops.sort(key=lambda op: op[0])
+    errors.sort(key=lambda e: e["row"])
+
+    if not (errors and atomic):
+        errors.extend({"row": row_no, "error": error} for row_no, error in _store.apply(ops, atomic))
+        errors.sort(key=lambda e: e["row"])
+        # A batch can touch many items; subscribers fetch the delta instead.
+        broker.publish("sync")
+
+    ids = [None] * len(rows)
+    counts = dict.fromkeys(BATCH_OPS.values(), 0)
+    if not (errors and atomic):
+        failed = {e["row"] for e in errors}
+        for row_no, op, payload in ops:
+            if row_no not in failed:
+                ids[row_no] = payload if op == "delete" else payload["id"]
+                counts[BATCH_OPS[op]] += 1
+    return {"applied": sum(counts.values()), **counts, "errors": errors, "ids": ids}
@@ -0,0 +1,155 @@
+"""Interface shared by the storage engines behind ``storage.py``."""
+import json_codec
+from query import Query
+
+# Sort orders of ``LibraryStore.query`` and the item field each one orders by.
+SORT_FIELDS = {"id": "id", "name": "name", "date": "publication_date", "author": "author"}
+
+# Groupings of ``LibraryStore.stats``.
+STAT_GROUPS = ("category", "year", "author")
+
+
+class LibraryStore:
+    """A persistent collection of library items keyed by ``id``.
+
+    Items are plain dicts in the API's JSON shape. ``storage.py`` validates
+    input and delegates every read and write to one instance of a subclass;
+    which one is chosen by ``config.STORAGE_BACKEND``.
+    """
+
+    # -- reads --------------------------------------------------------------
+
+    def get(self, item_id):
+        """Return the item with ``item_id`` or None."""
+        raise NotImplementedError
+
+    def all(self):
+        """Return every item as a list."""
+        raise NotImplementedError
+
+    def count(self):
+        """Return the number of items."""
+        raise NotImplementedError
+
+    def version_info(self):
+        """Return ``(version, modified)``.
+
+        ``version`` grows with every committed write (a batch counts once)
+        and ``modified`` is the Unix time of that write.
+        """
+        raise NotImplementedError
+
+    def get_versioned(self, item_id):
+        """Return ``(item, version)`` where ``version`` is the library version
+        that last wrote the item, or ``(None, None)``."""
+        raise NotImplementedError
+
+    def changes(self, since):
+        """Return ``(version, upserted, deleted_ids)`` describing every change
+        after library version ``since``: the current state of items written
+        since then and the ids of those deleted. Returns None when the change
+        journal no longer reaches back to ``since`` (or ``since`` is newer
+        than the library), meaning the caller must reload everything.
+        """
+        raise NotImplementedError
+
+    def query(self, query, limit=None, after=None, after_value=None, offset=0):
+        """Return ``(items, total)``: up to ``limit`` (None: all) of the items
+        matching the ``query.Query`` ``query``, in its order.
+
+        ``query.sort`` is a key of ``SORT_FIELDS``; name and author order
+        ignores case and ties are broken by id. ``after`` is the id of the
+        last item of the previous page and, for sorts other than id,
+        ``after_value`` that item's sort field. ``offset`` skips that many
+        further items. ``total`` is the number of matching items.
+        """
+        raise NotImplementedError
+
+    def page(self, limit, after=None, category=None, sort="id", after_value=None, offset=0):
+        """``query`` for at most one ``category`` in ascending ``sort`` order."""
+        query = Query(categories=() if category is None else (category,), sort=sort)
+        return self.query(query, limit, after, after_value, offset)
+
+    def by_category(self, category):
+        """Return the items in ``category``."""
+        raise NotImplementedError
+
+    def all_json(self, category=None):
+        """Return the encoded JSON of every item (in ``category``) as a list of bytes.
+
+        Engines that keep items in memory cache these fragments; this
+        default encodes them on every call.
+        """
+        items = self.all() if category is None else self.by_category(category)
+        return [json_codec.dumps(item) for item in items]
+
+    def query_json(self, query, limit=None, after=None, after_value=None, offset=0):
+        """Like ``query`` but return ``(fragments, total, last)``: the encoded
+        items, ``total``, and the last item (for the next cursor) or None."""
+        items, total = self.query(query, limit, after, after_value, offset)
+        return [json_codec.dumps(item) for item in items], total, items[-1] if items else None
+
+    def page_json(self, limit, after=None, category=None, sort="id", after_value=None, offset=0):
+        """``page`` as ``query_json`` returns it."""
+        query = Query(categories=() if category is None else (category,), sort=sort)
+        return self.query_json(query, limit, after, after_value, offset)
+
+    def by_name(self, name):
+        """Return the items whose name equals ``name``."""
+        raise NotImplementedError
+
+    def by_date_range(self, start=None, end=None):
+        """Return items published in ``[start, end]`` (ISO dates), oldest first."""
+        raise NotImplementedError
+
+    def search(self, query, limit=50):
+        """Return up to ``limit`` items matching the words of ``query``, best first."""
+        raise NotImplementedError
+
+    def stats(self, group, start=None, end=None):
+        """Return ``{value: count}``: the number of items per value of
+        ``group`` (one of ``STAT_GROUPS``), counting only items published in
+        ``[start, end]`` (ISO dates) if given.
+
+        Years are ints, None for items without an ISO date. Engines keep
+        these counts up to date on every write, so the cost follows the
+        number of groups rather than items, except for authors within a
+        date range, which are counted from the items in the range.
+        """
+        raise NotImplementedError
+
+    # -- writes -------------------------------------------------------------
+
+    def put(self, item):
+        """Insert or replace ``item`` and return it."""
+        raise NotImplementedError
+
+    def update(self, item):
+        """Replace an existing item. Returns False if its id is unknown."""
+        raise NotImplementedError
+
+    def delete(self, item_id):
+        """Remove an item. Returns False if it did not exist."""
+        raise NotImplementedError
+
+    def apply(self, ops, atomic=True):
+        """Commit ``(row, op, payload)`` operations in one durable write.
+
+        ``op`` is create/update (payload: item) or delete (payload: id).
+        Returns ``(row, error)`` pairs for updates and deletes of unknown ids,
+        taking earlier operations of the batch into account; with ``atomic``
+        any error means nothing is written.
+        """
+        raise NotImplementedError
+
+    def replace_all(self, db):
+        """Make the ``{id: item}`` mapping ``db`` the whole library."""
+        raise NotImplementedError
+
+    # -- housekeeping ---------------------------------------------------------
+
+    def invalidate(self):
+        """Drop any cached state so the next access re-reads persistent storage."""
+
+    def close(self):
+        """Release files, connections and background work."""
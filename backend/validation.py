@@ -0,0 +1,116 @@
+"""Validation of library item fields, shared by the API, batch writes and the GUI.
+
+Everything a check needs (the date pattern, the category set, the
+messages) is built once at import. ``check_fields`` reports every invalid
+field of one item; ``validate_many`` runs it over a list of rows. The
+module has no dependencies beyond the standard library so that the GUI
+can import it too.
+"""
+import re
+from datetime import date
+
+CATEGORIES = ("Book", "Film", "Magazine")
+FIELDS = ("name", "publication_date", "author", "category")
+
+_CATEGORY_SET = frozenset(CATEGORIES)
+_DATE_RE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+# Dates already found valid; libraries repeat the same few thousand dates.
+_valid_dates = set()
+_VALID_DATES_MAX = 100000
+
+NAME_REQUIRED = "Name is required and must be a non-empty string"
+DATE_REQUIRED = "Publication date is required"
+DATE_FORMAT = "Publication date must be in YYYY-MM-DD format"
+DATE_INVALID = "Publication date is not a real calendar date"
+AUTHOR_REQUIRED = "Author is required and must be a non-empty string"
+CATEGORY_REQUIRED = "Category is required"
+CATEGORY_INVALID = f"Category must be one of: {', '.join(CATEGORIES)}"
+
+
+class ValidationError(ValueError):
+    """Invalid item fields. ``errors`` maps each bad field to its message;
+    the exception's text is the first of them."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(next(iter(errors.values())))
+
+
+def check_fields(data):
+    """Return ``(fields, errors)`` for the item fields in the mapping ``data``.
+
+    ``fields`` holds the four fields with surrounding whitespace removed;
+    ``errors`` maps each invalid field to a message and is empty when all
+    are valid. Dates must be real calendar dates.
+    """
+    errors = {}
+    return _clean(data, errors), errors
+
+
+def _clean(data, errors):
+    """The cleaned fields of ``data``; messages for invalid ones go into ``errors``."""
+    name = data.get("name")
+    if not isinstance(name, str) or not (name := name.strip()):
+        errors["name"] = NAME_REQUIRED
+    pub = data.get("publication_date")
+    if not isinstance(pub, str) or not (pub := pub.strip()):
+        errors["publication_date"] = DATE_REQUIRED
+    elif pub not in _valid_dates:
+        # Only YYYY-MM-DD has this shape among the forms fromisoformat takes,
+        # so the pattern is needed just to word the error.
+        try:
+            if len(pub) != 10 or pub[4] != "-" or pub[7] != "-" or not pub.isascii():
+                raise ValueError
+            date.fromisoformat(pub)
+        except ValueError:
+            errors["publication_date"] = DATE_INVALID if _DATE_RE.fullmatch(pub) else DATE_FORMAT
+        else:
+            if len(_valid_dates) < _VALID_DATES_MAX:
+                _valid_dates.add(pub)
+    author = data.get("author")
+    if not isinstance(author, str) or not (author := author.strip()):
+        errors["author"] = AUTHOR_REQUIRED
+    category = data.get("category")
+    if not isinstance(category, str) or not (category := category.strip()):
+        errors["category"] = CATEGORY_REQUIRED
+    elif category not in _CATEGORY_SET:
+        errors["category"] = CATEGORY_INVALID
+    return {"name": name, "publication_date": pub, "author": author, "category": category}
+
+
+def is_date(text):
+    """True if ``text`` is a real calendar date in YYYY-MM-DD form."""
+    if not isinstance(text, str) or not _DATE_RE.fullmatch(text):
+        return False
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        return False
+    return True
+
+
+def validate_item(data):
+    """Return the cleaned fields of ``data`` or raise ``ValidationError``."""
+    fields, errors = check_fields(data)
+    if errors:
+        raise ValidationError(errors)
+    return fields
+
+
+def validate_many(rows):
+    """Check a list of mappings in one pass.
+
+    Returns ``(items, errors)``: the cleaned fields of each row, None where
+    the row is invalid, and ``{row index: {field: message}}`` for the
+    invalid rows. Valid rows allocate nothing but their fields.
+    """
+    items, errors = [], {}
+    append, clean = items.append, _clean
+    scratch = {}
+    for index, row in enumerate(rows):
+        fields = clean(row, scratch)
+        if scratch:
+            errors[index], scratch = scratch, {}
+            fields = None
+        append(fields)
+    return items, errors
@@ -0,0 +1,12 @@
+"""WSGI entry point for external servers, e.g. from the backend directory:
+
+    gunicorn --workers 4 --threads 8 --bind 127.0.0.1:5000 wsgi:app
+    waitress-serve --threads 8 --listen 127.0.0.1:5000 wsgi:app
+
+``python serve.py`` does the same with the settings from ``config``.
+"""
+# Use a direct import so the module can be loaded from the backend directory
+# The one app app.py builds on import; a second would only duplicate it.
+from app import app
+
+application = app
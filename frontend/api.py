@@ -0,0 +1,173 @@
+"""HTTP client for the Library API, shared by the GUI's worker threads."""
+import json
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Response headers kept with cached bodies.
+KEPT_HEADERS = ("X-Total-Count", "X-Next-Cursor", "X-Library-Version")
+
+
+class ApiError(Exception):
+    """The backend answered with an error status; the message is its error text."""
+
+
+class ResponseCache:
+    """LRU cache of GET bodies keyed by path and query params, bounded by body size.
+
+    Each entry holds the ETag to revalidate with and the library version the
+    body was current for (the X-Library-Version header, if sent).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (etag, version, headers, data, size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path, params):
+        return path, tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, version, headers, data, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[4]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (etag, version, headers, data, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted[4]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self, path):
+        """Write the entries to ``path`` so a restarted client can revalidate them."""
+        with self._lock:
+            entries = [[key[0], key[1], *entry] for key, entry in self._entries.items()]
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    def load(self, path):
+        """Read entries written by ``save``; a missing or damaged file is ignored."""
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+            for url_path, params, etag, version, headers, data, size in entries:
+                self.put((url_path, tuple(map(tuple, params))), etag, version, headers, data, size)
+        except (OSError, ValueError, TypeError):
+            pass
+
+
+class LibraryClient:
+    """Keep-alive session to the backend plus a revalidating response cache.
+
+    GETs made through ``get_json`` are cached. A cached body is sent back
+    with If-None-Match and reused on 304. While ``watch_events`` is
+    following the event stream and nothing has changed since the body's
+    library version, it is returned without asking the backend at all.
+    Every event, a write made through this client, or losing the stream
+    makes cached bodies stale again.
+    """
+
+    def __init__(self, base, timeout=10, pool_size=8, cache_bytes=32 * 2 ** 20):
+        self.base = base
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = ResponseCache(cache_bytes)
+        self.hits = self.revalidated = self.misses = 0
+        # Library version the cache is known to be current for (None: unknown),
+        # and a counter bumped by every change so that a response that was
+        # in flight meanwhile cannot claim to be current.
+        self._current = None
+        self._epoch = 0
+        self._watching = False
+        self._lock = threading.Lock()
+
+    def request(self, method, path, allow=(), **kwargs):
+        """Send one request; raises ApiError for 4xx/5xx answers other than ``allow``."""
+        kwargs.setdefault("timeout", self.timeout)
+        r = self.session.request(method, f"{self.base}{path}", **kwargs)
+        if method != "GET":
+            self.library_changed()
+        if r.status_code >= 400 and r.status_code not in allow:
+            try:
+                detail = r.json().get("error") or f"Status {r.status_code}"
+            except ValueError:
+                detail = f"Status {r.status_code}"
+            raise ApiError(detail)
+        return r
+
+    def get_json(self, path, params=None):
+        """GET ``path`` and return ``(data, headers)``, from the cache when possible."""
+        key = self.cache.key(path, params)
+        entry = self.cache.get(key)
+        with self._lock:
+            epoch, current = self._epoch, self._current
+        if entry is not None and entry[1] is not None and entry[1] == current:
+            self.hits += 1
+            return entry[3], entry[2]
+        headers = {"If-None-Match": entry[0]} if entry is not None and entry[0] else {}
+        r = self.request("GET", path, params=params, headers=headers)
+        version = r.headers.get("X-Library-Version")
+        version = int(version) if version else None
+        if r.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            etag, _, kept, data, size = entry
+        else:
+            self.misses += 1
+            etag, data, size = r.headers.get("ETag"), r.json(), len(r.content)
+            kept = {h: r.headers[h] for h in KEPT_HEADERS if h in r.headers}
+        if etag:
+            self.cache.put(key, etag, version, kept, data, size)
+        if version is not None:
+            with self._lock:
+                if self._epoch == epoch and self._watching:
+                    self._current = version
+        return data, kept
+
+    def library_changed(self):
+        """Make every cached body need revalidation before its next use."""
+        with self._lock:
+            self._epoch += 1
+            self._current = None
+
+    def watch_events(self):
+        """Yield the event names of GET /media/events until the stream ends.
+
+        While it runs, cached bodies stay trusted between events.
+        """
+        try:
+            # A separate session: the stream holds its connection for minutes.
+            with requests.get(f"{self.base}/media/events", stream=True, timeout=(5, 60)) as r:
+                r.raise_for_status()
+                self.library_changed()
+                with self._lock:
+                    self._watching = True
+                for line in r.iter_lines(decode_unicode=True):
+                    if line and line.startswith("event:"):
+                        self.library_changed()
+                        yield line[len("event:"):].strip()
+        finally:
+            with self._lock:
+                self._watching = False
+            self.library_changed()
+
+    def close(self):
+        self.session.close()
@@ -3,15 +3,47 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import requests
-import re
 import os
 import sys
 import time
+import threading
 import subprocess
 from pathlib import Path
 
+# Use a direct import so the module can be run as a script
+from api import LibraryClient
+from tasks import TaskRunner, check_cancelled
+from virtual_list import ListSource, PagedSource, VirtualList
+
+# Item fields are checked with the backend's own rules before they are sent.
+sys.path.append(str(Path(__file__).resolve().parent.parent / "backend"))
+from validation import CATEGORIES, check_fields
+
 BASE = "http://127.0.0.1:5000"
 
+# One keep-alive session and response cache for every backend call; the
+# cache is kept across runs in CACHE_PATH and revalidated on use.
+client = LibraryClient(BASE)
+CACHE_PATH = Path(__file__).resolve().with_name("response_cache.json")
+
+# The columns the list shows and sorts by.
+LIST_FIELDS = "id,name,publication_date,author,category"
+PAGE_SIZE = 500
+
+# Libraries up to this size are mirrored and sorted locally; larger ones are
+# shown a page at a time, sorted by the backend, as the user scrolls.
+MIRROR_LIMIT = 50000
+SORTS = {"Name": "name", "Date": "date", "Author": "author"}
+# Same order as the backend's sort=: text ignores case, ties go by id.
+SORT_KEYS = {
+    "name": lambda it: ((it.get("name") or "").casefold(), it["id"]),
+    "date": lambda it: (it.get("publication_date") or "", it["id"]),
+    "author": lambda it: ((it.get("author") or "").casefold(), it["id"]),
+}
+
+# How often the Tk loop checks whether the event stream reported changes.
+EVENT_CHECK_MS = 250
+
 # Color scheme
 COLORS = {
     "primary": "#2C3E50",      # Dark blue-gray
@@ -24,6 +56,63 @@ COLORS = {
     "dark": "#34495E",
 }
 
+def api(method, path, **kwargs):
+    """Send one request to the backend; raises ``api.ApiError`` for 4xx/5xx answers."""
+    return client.request(method, path, **kwargs)
+
+def error_text(exc):
+    """User-facing text for a failed backend call."""
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return f"Cannot connect to backend server.\nMake sure the backend is running on {BASE}"
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "Backend server is not responding."
+    return str(exc)
+
+def fetch_item(item_id):
+    return client.get_json(f"/media/{item_id}")[0]
+
+def fetch_rows(offset, limit, sort, category):
+    """One page of the list in ``sort`` order: ``(items, total)``."""
+    params = {"fields": LIST_FIELDS, "sort": sort, "offset": offset, "limit": limit}
+    if category:
+        params["category"] = category
+    items, headers = client.get_json("/media", params)
+    return items, int(headers.get("X-Total-Count", 0))
+
+def fetch_mirror(since):
+    """Fetch what the list mirror needs (runs on a worker thread).
+
+    Returns ``("delta", since, changes)`` with the changes after version
+    ``since``, or ``("full", version, items_by_id)`` when there is no
+    mirror yet or the backend can no longer provide the changes.
+    Libraries over MIRROR_LIMIT items are not mirrored: the answer is then
+    ``("paged", version, None)`` after the first page.
+    """
+    if since is not None:
+        r = api("GET", "/media/changes", params={"since": since, "fields": LIST_FIELDS}, allow=(410,))
+        if r.status_code != 410:
+            return "delta", since, r.json()
+
+    params = {"fields": LIST_FIELDS, "limit": PAGE_SIZE}
+    mirror = {}
+    version = None
+    while True:
+        check_cancelled()
+        items, headers = client.get_json("/media", params)
+        if "cursor" not in params and headers.get("X-Library-Version"):
+            # Pages fetched later may already be newer; replaying the
+            # changes since the first page's version is harmless.
+            version = int(headers["X-Library-Version"])
+            if int(headers.get("X-Total-Count", 0)) > MIRROR_LIMIT:
+                return "paged", version, None
+        for it in items:
+            mirror[it["id"]] = it
+        cursor = headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params["cursor"] = cursor
+    return "full", version, mirror
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -43,8 +132,47 @@ class App(tk.Tk):
         # Main panes
         self.create_main_content()
 
-        self.items = []  # holds current items loaded from backend
+        # Backend calls run on worker threads; results come back through after().
+        self.tasks = TaskRunner(self, on_busy=self.set_busy)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.rows = ListSource([])  # what the list currently shows
+        # Local copy of the whole list (LIST_FIELDS only), kept current with
+        # /media/changes deltas; None version means it must be fully loaded.
+        # Empty while the library is too big to mirror (``paged``).
+        self.mirror = {}
+        self.mirror_version = None
+        self.paged = False
+        self.showing_search = False
+
+        # Live updates: a background thread follows GET /media/events and
+        # sets this flag; the Tk loop picks it up and applies the delta.
+        self.remote_changed = threading.Event()
+        # Responses from the last run are revalidated instead of downloaded again.
+        client.cache.load(CACHE_PATH)
         self.load_list()
+        threading.Thread(target=self.listen_events, name="library-events", daemon=True).start()
+        self.after(EVENT_CHECK_MS, self.check_remote_changes)
+
+    def close(self):
+        self.tasks.shutdown()
+        try:
+            client.cache.save(CACHE_PATH)
+        except OSError:
+            pass
+        client.close()
+        self.destroy()
+
+    def set_busy(self, busy):
+        """Show the loading indicator while any backend call is in flight."""
+        if busy:
+            self.loading_label.pack(side="right", padx=(0, 20))
+            self.loading_bar.pack(side="right", padx=(0, 8))
+            self.loading_bar.start(15)
+        else:
+            self.loading_bar.stop()
+            self.loading_bar.pack_forget()
+            self.loading_label.pack_forget()
 
     def setup_styles(self):
         """Configure ttk styles for the application."""
@@ -104,6 +232,13 @@ class App(tk.Tk):
                            font=('Segoe UI', 10))
         subtitle.pack(side="left", padx=20)
 
+        # Loading indicator, packed by set_busy() while requests are running.
+        self.loading_label = tk.Label(header, text="Loading…",
+                                      bg=COLORS["primary"],
+                                      fg="#BDC3C7",
+                                      font=('Segoe UI', 10))
+        self.loading_bar = ttk.Progressbar(header, mode="indeterminate", length=120)
+
     def create_top_controls(self):
         """Create the top control panel."""
         top = ttk.Frame(self)
@@ -116,13 +251,20 @@ class App(tk.Tk):
         ttk.Label(left_frame, text="Filter by Category:", style='Title.TLabel').pack(side="left", padx=(0, 8))
         self.cat_var = tk.StringVar()
         cat_combo = ttk.Combobox(left_frame, textvariable=self.cat_var, 
-                                 values=["", "Book", "Film", "Magazine"], 
+                                 values=["", *CATEGORIES], 
                                  width=12, state="readonly")
         cat_combo.pack(side="left", padx=4)
         
         filter_btn = ttk.Button(left_frame, text="🔍 Filter", command=self.load_list)
         filter_btn.pack(side="left", padx=4)
 
+        ttk.Label(left_frame, text="Sort:", style='Title.TLabel').pack(side="left", padx=(12, 8))
+        self.sort_var = tk.StringVar(value="Name")
+        sort_combo = ttk.Combobox(left_frame, textvariable=self.sort_var,
+                                  values=list(SORTS), width=8, state="readonly")
+        sort_combo.pack(side="left", padx=4)
+        sort_combo.bind("<<ComboboxSelected>>", lambda e: self.load_list())
+
         # Middle section - Search
         middle_frame = ttk.Frame(top)
         middle_frame.pack(side="left", fill="x", expand=True, padx=(20, 0))
@@ -160,22 +302,18 @@ class App(tk.Tk):
         list_title = ttk.Label(left, text="📖 Items", style='Title.TLabel')
         list_title.pack(anchor="nw", pady=(0, 8))
         
-        self.listbox = tk.Listbox(left, 
-                                 bg=COLORS["white"],
-                                 fg=COLORS["fg"],
-                                 font=('Segoe UI', 10),
-                                 highlightcolor=COLORS["secondary"],
-                                 selectmode=tk.SINGLE,
-                                 relief="solid",
-                                 borderwidth=1,
-                                 activestyle="none")
+        # Only the visible rows are drawn, so the list stays fast at any size.
+        self.listbox = VirtualList(left,
+                                   format_row=lambda it: f"{it.get('name')} ({it.get('category')})",
+                                   font=('Segoe UI', 10),
+                                   bg=COLORS["white"],
+                                   fg=COLORS["fg"],
+                                   select_bg=COLORS["secondary"],
+                                   select_fg=COLORS["white"],
+                                   relief="solid",
+                                   borderwidth=1)
         self.listbox.pack(fill="both", expand=True)
         self.listbox.bind("<<ListboxSelect>>", self.show_details)
-        
-        # Scrollbar for listbox
-        scrollbar = ttk.Scrollbar(left, orient="vertical", command=self.listbox.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.listbox.config(yscrollcommand=scrollbar.set)
 
         # Right: details
         right = ttk.Frame(main, width=320)
@@ -203,52 +341,117 @@ class App(tk.Tk):
         self.details_text.pack(fill="y", expand=True)
 
     def load_list(self):
-        """Load items from backend with better error handling."""
-        cat = self.cat_var.get().strip()
-        params = {}
-        if cat:
-            params["category"] = cat
-        try:
-            r = requests.get(f"{BASE}/media", params=params, timeout=10)
-            r.raise_for_status()
-            self.items = r.json()
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Connection Error", "Cannot connect to backend server.\nMake sure the backend is running on http://127.0.0.1:5000")
-            self.items = []
-        except requests.exceptions.Timeout:
-            messagebox.showerror("Timeout", "Backend server is not responding.")
-            self.items = []
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not load items:\n{str(e)}")
-            self.items = []
-        self.refresh_listbox()
+        """Show the mirrored list filtered by category and refresh it in the background."""
+        self.showing_search = False
+        self.tasks.cancel("search")
+        self.show_mirror(keep_view=False)
+        self.start_sync(on_error=lambda e: messagebox.showerror("Error", f"Could not load items:\n{error_text(e)}"))
+
+    def start_sync(self, on_error=None):
+        """Bring the mirror up to date; a newer refresh cancels one still in flight."""
+        self.tasks.submit(fetch_mirror, self.mirror_version, key="sync",
+                          on_done=self.apply_sync, on_error=on_error or (lambda e: None))
+
+    def apply_sync(self, result):
+        kind, version, data = result
+        if kind == "delta":
+            if version != self.mirror_version:
+                # The mirror was reloaded while this delta was in flight.
+                self.remote_changed.set()
+                return
+            for it in data["upserted"]:
+                self.mirror[it["id"]] = it
+            for item_id in data["deleted"]:
+                self.mirror.pop(item_id, None)
+            self.mirror_version = data["version"]
+        elif kind == "paged":
+            self.mirror, self.mirror_version, self.paged = {}, None, True
+        else:
+            self.mirror, self.mirror_version, self.paged = data, version, False
+        if not self.showing_search:
+            self.show_mirror()
+
+    def listen_events(self):
+        """Follow the backend's event stream (runs on a daemon thread).
+
+        Every event means the library moved, so it only raises
+        ``remote_changed``; the delta itself comes from /media/changes.
+        Reconnects after errors and when the server ends the stream.
+        """
+        while True:
+            try:
+                for _ in client.watch_events():
+                    self.remote_changed.set()
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(2)
+
+    def check_remote_changes(self):
+        """Fetch the changes reported by the event stream unless a refresh is already running."""
+        if self.remote_changed.is_set() and not self.tasks.running("sync"):
+            self.remote_changed.clear()
+            if self.paged:
+                # Nothing to patch locally: reload the pages in view.
+                if not self.showing_search:
+                    self.show_mirror()
+            else:
+                self.start_sync()
+        self.after(EVENT_CHECK_MS, self.check_remote_changes)
 
-    def refresh_listbox(self):
-        # Guard UI updates in case widgets are not yet available or were destroyed.
+    def show_mirror(self, keep_view=True):
+        """Redisplay the library list in the chosen order without losing the selected item."""
+        cat = self.cat_var.get().strip()
+        sort = SORTS.get(self.sort_var.get(), "name")
+        if self.paged:
+            query = (sort, cat)
+            if keep_view and isinstance(self.rows, PagedSource) and self.rows.query == query:
+                self.rows.invalidate()
+                self.listbox.redraw()
+                return
+            rows = PagedSource(lambda offset, limit: fetch_rows(offset, limit, sort, cat), self.tasks,
+                               on_loaded=self.listbox.schedule_redraw)
+            rows.query = query
+            self.show_list(rows, keep_view=keep_view)
+            return
+        selected = self.selected_item()
+        items = [it for it in self.mirror.values() if not cat or it.get("category") == cat]
+        items.sort(key=SORT_KEYS[sort])
+        self.show_list(ListSource(items), selected["id"] if selected else None, keep_view)
+
+    def show_list(self, rows, selected_id=None, keep_view=False):
+        """Show ``rows`` in the list, reselecting the item ``selected_id`` if present."""
+        self.rows = rows
         try:
-            self.listbox.delete(0, tk.END)
+            self.listbox.set_source(rows, keep_view=keep_view)
         except (AttributeError, tk.TclError):
             return
+        if selected_id is not None and isinstance(rows, ListSource):
+            pos = next((i for i, it in enumerate(rows.items) if it["id"] == selected_id), None)
+            if pos is not None:
+                self.listbox.selection_set(pos)
+                self.listbox.see(pos)
+
+    def selected_item(self):
+        """The selected list row, or None (also while its page is still loading)."""
+        sel = self.listbox.curselection()
+        return self.rows.item(sel[0]) if sel else None
 
-        for it in self.items:
-            display = f"{it.get('name')} ({it.get('category')})"
-            try:
-                self.listbox.insert(tk.END, display)
-            except tk.TclError:
-                # If insertion fails, stop updating the listbox.
-                break
-
-        try:
-            self.details_text.delete("1.0", tk.END)
-        except (AttributeError, tk.TclError):
-            pass
+    def with_full_item(self, item, then, error_title):
+        """Call ``then(item)`` with every field of the listed item, fetching it
+        in the background if the list only holds a projection."""
+        if all(k in item for k in ("publication_date", "author")):
+            then(item)
+            return
+        self.tasks.submit(fetch_item, item["id"], key="item", on_done=then,
+                          on_error=lambda e: messagebox.showerror("Error", f"{error_title}:\n{error_text(e)}"))
 
     def show_details(self, event=None):
-        sel = self.listbox.curselection()
-        if not sel:
+        item = self.selected_item()
+        if item is None:
             return
-        idx = sel[0]
-        item = self.items[idx]
+        self.with_full_item(item, self.show_item, "Could not load item details")
+
+    def show_item(self, item):
         # Hide internal `id` field from the details view for a cleaner UI.
         lines = []
         for k, v in item.items():
@@ -262,33 +465,41 @@ class App(tk.Tk):
         self.details_text.insert(tk.END, txt)
 
     def search(self):
-        """Search for items by exact name."""
+        """Search titles and authors; words may be partial (e.g. "iro ma")."""
         name = self.search_var.get().strip()
         if not name:
-            messagebox.showinfo("Search", "Enter a name to search (exact match).")
+            messagebox.showinfo("Search", "Enter words from a title or author to search.")
             return
+        # A new search replaces one still in flight.
+        self.tasks.submit(lambda: client.get_json("/media/search", {"q": name})[0], key="search",
+                          on_done=lambda items: self.show_search_results(name, items),
+                          on_error=lambda e: messagebox.showerror("Search Error", f"Search failed:\n{error_text(e)}"))
+
+    def show_search_results(self, name, items):
+        self.showing_search = True
+        self.show_list(ListSource(items))
         try:
-            r = requests.get(f"{BASE}/media/search", params={"name": name}, timeout=10)
-            r.raise_for_status()
-            self.items = r.json()
-            self.refresh_listbox()
-            if not self.items:
-                messagebox.showinfo("Search Result", f"No items found matching '{name}'.")
-            else:
-                messagebox.showinfo("Search Result", f"Found {len(self.items)} item(s) matching '{name}'.")
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Connection Error", "Cannot connect to backend server.")
-        except Exception as e:
-            messagebox.showerror("Search Error", f"Search failed:\n{str(e)}")
+            self.details_text.delete("1.0", tk.END)
+        except (AttributeError, tk.TclError):
+            pass
+        if not items:
+            messagebox.showinfo("Search Result", f"No items found matching '{name}'.")
+        else:
+            messagebox.showinfo("Search Result", f"Found {len(items)} item(s) matching '{name}'.")
+
+    def saved(self, message):
+        messagebox.showinfo("Success", message)
+        self.load_list()
 
     def edit_selected(self):
         """Open a modal dialog to edit the selected item with validation."""
-        sel = self.listbox.curselection()
-        if not sel:
+        item = self.selected_item()
+        if item is None:
             messagebox.showwarning("No Selection", "Please select an item to edit.")
             return
-        idx = sel[0]
-        item = self.items[idx]
+        self.with_full_item(item, self.edit_item, "Could not load item")
+
+    def edit_item(self, item):
         item_id = item.get("id")
 
         dlg = tk.Toplevel(self)
@@ -346,7 +557,7 @@ class App(tk.Tk):
         # Category
         ttk.Label(frm, text="Category:", style='Dialog.TLabel').grid(row=5, column=0, sticky="w", pady=8)
         cat_combo = ttk.Combobox(frm, textvariable=category_var, 
-                                values=["Book", "Film", "Magazine"], 
+                                values=list(CATEGORIES), 
                                 width=38, state="readonly", font=('Segoe UI', 10))
         cat_combo.grid(row=5, column=1, pady=8, padx=(10, 0))
 
@@ -354,36 +565,12 @@ class App(tk.Tk):
         btn_frame.grid(row=6, column=0, columnspan=2, pady=(20, 0))
 
         def on_ok():
-            name = name_var.get().strip()
-            pub = pub_var.get().strip()
-            author = author_var.get().strip()
-            category = category_var.get().strip()
-            
-            # Validation
-            if not name:
-                messagebox.showwarning("Validation Error", "Name is required.", parent=dlg)
-                return
-            if not pub:
-                messagebox.showwarning("Validation Error", "Publication date is required.", parent=dlg)
-                return
-            if not author:
-                messagebox.showwarning("Validation Error", "Author is required.", parent=dlg)
-                return
-            if not category:
-                messagebox.showwarning("Validation Error", "Category is required.", parent=dlg)
+            fields, errors = check_fields({"name": name_var.get(), "publication_date": pub_var.get(),
+                                           "author": author_var.get(), "category": category_var.get()})
+            if errors:
+                messagebox.showwarning("Validation Error", "\n".join(errors.values()), parent=dlg)
                 return
-            
-            # Validate date format
-            if not re.match(r'^\d{4}-\d{2}-\d{2}$', pub):
-                messagebox.showwarning("Validation Error", "Date must be in YYYY-MM-DD format.", parent=dlg)
-                return
-            
-            dlg.result = {
-                "name": name,
-                "publication_date": pub,
-                "author": author,
-                "category": category
-            }
+            dlg.result = fields
             dlg.destroy()
 
         def on_cancel():
@@ -411,20 +598,9 @@ class App(tk.Tk):
 
         payload = dlg.result
 
-        try:
-            r = requests.put(f"{BASE}/media/{item_id}", json=payload, timeout=10)
-            r.raise_for_status()
-            messagebox.showinfo("Success", f"✅ Item '{payload['name']}' updated successfully!")
-            self.load_list()
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Error", "Cannot connect to backend server.")
-        except Exception as e:
-            # Try to parse error from server
-            try:
-                error_detail = r.json().get('error', str(e))
-            except:
-                error_detail = str(e)
-            messagebox.showerror("Update Failed", f"{error_detail}")
+        self.tasks.submit(lambda: api("PUT", f"/media/{item_id}", json=payload),
+                          on_done=lambda r: self.saved(f"✅ Item '{payload['name']}' updated successfully!"),
+                          on_error=lambda e: messagebox.showerror("Update Failed", error_text(e)))
 
     def create_item(self):
         """Open a modal dialog to create a new item with validation."""
@@ -483,7 +659,7 @@ class App(tk.Tk):
         # Category
         ttk.Label(frm, text="Category:", style='Dialog.TLabel').grid(row=5, column=0, sticky="w", pady=8)
         cat_combo = ttk.Combobox(frm, textvariable=category_var, 
-                                values=["Book", "Film", "Magazine"], 
+                                values=list(CATEGORIES), 
                                 width=38, state="readonly", font=('Segoe UI', 10))
         cat_combo.grid(row=5, column=1, pady=8, padx=(10, 0))
 
@@ -491,36 +667,12 @@ class App(tk.Tk):
         btn_frame.grid(row=6, column=0, columnspan=2, pady=(20, 0))
 
         def on_ok():
-            name = name_var.get().strip()
-            pub = pub_var.get().strip()
-            author = author_var.get().strip()
-            category = category_var.get().strip()
-            
-            # Validation
-            if not name:
-                messagebox.showwarning("Validation Error", "Name is required.", parent=dlg)
-                return
-            if not pub:
-                messagebox.showwarning("Validation Error", "Publication date is required.", parent=dlg)
-                return
-            if not author:
-                messagebox.showwarning("Validation Error", "Author is required.", parent=dlg)
-                return
-            if not category:
-                messagebox.showwarning("Validation Error", "Category is required.", parent=dlg)
-                return
-            
-            # Validate date format
-            if not re.match(r'^\d{4}-\d{2}-\d{2}$', pub):
-                messagebox.showwarning("Validation Error", "Date must be in YYYY-MM-DD format.", parent=dlg)
+            fields, errors = check_fields({"name": name_var.get(), "publication_date": pub_var.get(),
+                                           "author": author_var.get(), "category": category_var.get()})
+            if errors:
+                messagebox.showwarning("Validation Error", "\n".join(errors.values()), parent=dlg)
                 return
-            
-            dlg.result = {
-                "name": name,
-                "publication_date": pub,
-                "author": author,
-                "category": category
-            }
+            dlg.result = fields
             dlg.destroy()
 
         def on_cancel():
@@ -548,29 +700,16 @@ class App(tk.Tk):
 
         payload = dlg.result
 
-        try:
-            r = requests.post(f"{BASE}/media", json=payload, timeout=10)
-            r.raise_for_status()
-            messagebox.showinfo("Success", f"✅ Item '{payload['name']}' created successfully!")
-            self.load_list()
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Error", "Cannot connect to backend server.")
-        except Exception as e:
-            # Try to parse error from server
-            try:
-                error_detail = r.json().get('error', str(e))
-            except:
-                error_detail = str(e)
-            messagebox.showerror("Creation Failed", f"{error_detail}")
+        self.tasks.submit(lambda: api("POST", "/media", json=payload),
+                          on_done=lambda r: self.saved(f"✅ Item '{payload['name']}' created successfully!"),
+                          on_error=lambda e: messagebox.showerror("Creation Failed", error_text(e)))
 
     def delete_selected(self):
         """Delete the selected item with confirmation."""
-        sel = self.listbox.curselection()
-        if not sel:
+        item = self.selected_item()
+        if item is None:
             messagebox.showwarning("No Selection", "Please select an item to delete.")
             return
-        idx = sel[0]
-        item = self.items[idx]
         item_id = item.get("id")
         item_name = item.get("name", "Unknown")
 
@@ -578,21 +717,9 @@ class App(tk.Tk):
         if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{item_name}'?\nThis action cannot be undone."):
             return
 
-        try:
-            r = requests.delete(f"{BASE}/media/{item_id}", timeout=10)
-            if r.status_code == 200:
-                messagebox.showinfo("Success", f"✅ Item '{item_name}' deleted successfully.")
-                self.load_list()
-            else:
-                try:
-                    error_detail = r.json().get('error', f"Status {r.status_code}")
-                except:
-                    error_detail = f"Status {r.status_code}"
-                messagebox.showerror("Delete Failed", error_detail)
-        except requests.exceptions.ConnectionError:
-            messagebox.showerror("Error", "Cannot connect to backend server.")
-        except Exception as e:
-            messagebox.showerror("Delete Error", f"Failed to delete item:\n{str(e)}")
+        self.tasks.submit(lambda: api("DELETE", f"/media/{item_id}"),
+                          on_done=lambda r: self.saved(f"✅ Item '{item_name}' deleted successfully."),
+                          on_error=lambda e: messagebox.showerror("Delete Failed", error_text(e)))
 
 if __name__ == "__main__":
     import traceback
@@ -610,7 +737,7 @@ if __name__ == "__main__":
 
         # Try to start the backend using the same Python interpreter.
         backend_dir = Path(__file__).resolve().parents[1] / "backend"
-        backend_script = backend_dir / "app.py"
+        backend_script = backend_dir / "serve.py"
         if not backend_script.exists():
             print("Backend script not found:", backend_script)
             return False
@@ -0,0 +1,138 @@
+"""Run blocking calls off the Tk main thread and hand results back through ``after()``."""
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    """Raised by ``check_cancelled`` inside a task that was cancelled."""
+
+
+def check_cancelled():
+    """Stop the calling task early if it has been cancelled.
+
+    Long-running task functions (e.g. paging through the whole list) call
+    this between requests; elsewhere it does nothing.
+    """
+    task = getattr(_local, "task", None)
+    if task is not None and task.cancelled:
+        raise Cancelled()
+
+
+class Task:
+    """Handle for one submitted call."""
+
+    def __init__(self, key, on_done=None, on_error=None):
+        self.key = key
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        """Drop the result; a call that has not started yet never runs.
+
+        A request already on the wire cannot be interrupted, but its result
+        is discarded and ``check_cancelled`` stops the task at its next step.
+        """
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class TaskRunner:
+    """Thread pool whose results are delivered on the Tk thread.
+
+    Workers never touch widgets: finished futures are queued and a Tk
+    ``after`` loop calls ``on_done(result)`` or ``on_error(exc)`` from the
+    main thread. Tasks submitted with the same ``key`` replace each other:
+    submitting cancels the one still in flight. ``on_busy(bool)`` is called
+    when the runner goes from idle to busy and back, to drive a loading
+    indicator.
+    """
+
+    def __init__(self, root, workers=4, poll_ms=25, on_busy=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = on_busy
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="gui-io")
+        self._done = queue.SimpleQueue()
+        self._latest = {}
+        self._pending = 0
+        self._closed = False
+        root.after(poll_ms, self._poll)
+
+    def submit(self, fn, *args, key=None, on_done=None, on_error=None):
+        """Run ``fn(*args)`` on a worker thread and return its ``Task``."""
+        if key is not None and key in self._latest:
+            self._latest[key].cancel()
+        task = Task(key, on_done, on_error)
+        if key is not None:
+            self._latest[key] = task
+        self._set_pending(self._pending + 1)
+        task.future = self._pool.submit(self._run, task, fn, args)
+        task.future.add_done_callback(lambda _, task=task: self._done.put(task))
+        return task
+
+    def running(self, key):
+        """True while a task submitted under ``key`` has not been delivered."""
+        return key in self._latest
+
+    def cancel(self, key):
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self):
+        self._closed = True
+        for task in list(self._latest.values()):
+            task.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _run(task, fn, args):
+        _local.task = task
+        try:
+            return fn(*args)
+        finally:
+            _local.task = None
+
+    def _set_pending(self, pending):
+        was_busy, self._pending = self._pending > 0, pending
+        if self.on_busy is not None and was_busy != (pending > 0):
+            self.on_busy(pending > 0)
+
+    def _poll(self):
+        # Reschedule first: a callback may open a modal dialog, whose nested
+        # event loop must keep delivering results.
+        if self._closed:
+            return
+        self.root.after(self.poll_ms, self._poll)
+        while True:
+            try:
+                task = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._set_pending(self._pending - 1)
+            if self._latest.get(task.key) is task:
+                del self._latest[task.key]
+            if task.cancelled or task.future.cancelled():
+                continue
+            exc = task.future.exception()
+            try:
+                if exc is None:
+                    if task.on_done is not None:
+                        task.on_done(task.future.result())
+                elif isinstance(exc, Cancelled):
+                    pass
+                elif task.on_error is not None:
+                    task.on_error(exc)
+                else:
+                    raise exc
+            except Exception:
+                # Same treatment as an exception in any other Tk callback.
+                self.root.report_callback_exception(*sys.exc_info())
+
@@ -0,0 +1,262 @@
+"""A list widget that only draws the rows in view, for libraries of any size."""
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import font as tkfont
+from tkinter import ttk
+
+
+class ListSource:
+    """Rows already in memory (the mirrored library, search results)."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def item(self, index):
+        return self.items[index]
+
+    def want(self, first, last):
+        pass
+
+
+class PagedSource:
+    """Rows fetched from the backend a page at a time as they scroll into view.
+
+    ``fetch_page(offset, limit)`` runs on a ``TaskRunner`` worker and returns
+    ``(items, total)``. At most ``max_pages`` pages are kept, least recently
+    shown first out; ``on_loaded()`` is called on the Tk thread whenever a
+    page arrives. The length is 0 until the first page has answered.
+    """
+
+    def __init__(self, fetch_page, runner, page_size=200, max_pages=50, on_loaded=None):
+        self.fetch_page = fetch_page
+        self.runner = runner
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.on_loaded = on_loaded
+        self.total = None
+        self._pages = OrderedDict()  # page number -> (generation, items)
+        self._loading = {}  # page number -> Task
+        self._generation = 0
+
+    def __len__(self):
+        return self.total or 0
+
+    def item(self, index):
+        entry = self._pages.get(index // self.page_size)
+        if entry is None:
+            return None
+        items = entry[1]
+        offset = index % self.page_size
+        return items[offset] if offset < len(items) else None
+
+    def want(self, first, last):
+        """Load the pages covering rows ``[first, last)`` that are missing or stale.
+
+        Loads for pages that scrolled out of view meanwhile are cancelled,
+        so dragging the scrollbar across the library only fetches where it
+        stops.
+        """
+        if self.total is None:
+            first, last = 0, 1
+        wanted = range(first // self.page_size, max(first, last - 1) // self.page_size + 1)
+        for number in list(self._loading):
+            if number not in wanted:
+                self._loading.pop(number).cancel()
+        for number in wanted:
+            entry = self._pages.get(number)
+            if entry is not None:
+                self._pages.move_to_end(number)
+                if entry[0] == self._generation:
+                    continue
+            if number not in self._loading:
+                self._load(number)
+
+    def invalidate(self):
+        """Mark every page stale; shown rows keep their text until reloaded."""
+        self._generation += 1
+        for task in self._loading.values():
+            task.cancel()
+        self._loading.clear()
+
+    def _load(self, number):
+        generation = self._generation
+        self._loading[number] = self.runner.submit(
+            self.fetch_page, number * self.page_size, self.page_size,
+            on_done=lambda result: self._loaded(generation, number, result),
+            on_error=lambda e: self._loading.pop(number, None))
+
+    def _loaded(self, generation, number, result):
+        if generation != self._generation:
+            return
+        self._loading.pop(number, None)
+        items, self.total = result
+        self._pages[number] = (generation, items)
+        self._pages.move_to_end(number)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        if self.on_loaded is not None:
+            self.on_loaded()
+
+
+class VirtualList(ttk.Frame):
+    """Scrollable single-selection list drawn on a canvas.
+
+    Only the rows that fit in the window exist as canvas items; scrolling
+    redraws them from the source, so showing a million rows costs the same
+    as showing fifty. Rows come from a source (``ListSource`` or
+    ``PagedSource``) and are turned into text by ``format_row``; rows a
+    ``PagedSource`` has not loaded yet read "Loading…". Selection follows
+    ``tk.Listbox``: ``curselection``, ``selection_set``, ``see`` and a
+    ``<<ListboxSelect>>`` event when the user picks a row.
+    """
+
+    def __init__(self, master, format_row=str, font=None, bg="white", fg="black",
+                 select_bg="#3498DB", select_fg="white", **kwargs):
+        super().__init__(master, **kwargs)
+        self.format_row = format_row
+        self.colors = {"bg": bg, "fg": fg, "select_bg": select_bg, "select_fg": select_fg}
+        self.font = tkfont.Font(font=font) if font else tkfont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 6
+        self.source = ListSource([])
+        self.top = 0
+        self.selected = None
+        self._slots = []  # (background rectangle, text) canvas items, one per visible row
+        self._redraw_pending = False
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, takefocus=1)
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+        for key, step in (("<Up>", -1), ("<Down>", 1)):
+            self.canvas.bind(key, lambda e, step=step: self._move(step))
+        self.canvas.bind("<Prior>", lambda e: self._move(-self.visible_rows()))
+        self.canvas.bind("<Next>", lambda e: self._move(self.visible_rows()))
+        self.canvas.bind("<Home>", lambda e: self._pick(0))
+        self.canvas.bind("<End>", lambda e: self._pick(len(self.source) - 1))
+
+    # -- Listbox-like API ---------------------------------------------------
+
+    def set_source(self, source, keep_view=False):
+        """Show ``source``; the selection is cleared and, unless ``keep_view``,
+        the list scrolls back to the top."""
+        self.source = source
+        self.selected = None
+        if not keep_view:
+            self.top = 0
+        self.redraw()
+
+    def curselection(self):
+        if self.selected is not None and self.selected < len(self.source):
+            return (self.selected,)
+        return ()
+
+    def selection_set(self, index):
+        self.selected = index
+        self.schedule_redraw()
+
+    def selection_clear(self):
+        self.selected = None
+        self.schedule_redraw()
+
+    def see(self, index):
+        rows = self.visible_rows()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + rows:
+            self.top = index - rows + 1
+        self.schedule_redraw()
+
+    def yview(self, *args):
+        """Scrollbar protocol: no arguments return the visible fraction,
+        ``("moveto", f)`` and ``("scroll", n, "units"|"pages")`` scroll."""
+        total = len(self.source)
+        if not args:
+            return self._fraction(total)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.visible_rows() if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.redraw()
+
+    # -- drawing --------------------------------------------------------------
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def schedule_redraw(self):
+        """Redraw once the current batch of events has been handled."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def redraw(self):
+        self._redraw_pending = False
+        total = len(self.source)
+        rows = self.visible_rows()
+        self.top = max(0, min(self.top, total - rows))
+        # One extra row covers the partly visible one at the bottom.
+        last = min(total, self.top + rows + 1)
+        self.source.want(self.top, last)
+        while len(self._slots) < rows + 1:
+            self._slots.append((
+                self.canvas.create_rectangle(0, 0, 0, 0, outline=""),
+                self.canvas.create_text(0, 0, anchor="w", font=self.font),
+            ))
+        width = self.canvas.winfo_width()
+        for slot, (rect, text) in enumerate(self._slots):
+            index = self.top + slot
+            if index >= last:
+                self.canvas.itemconfigure(rect, state="hidden")
+                self.canvas.itemconfigure(text, state="hidden")
+                continue
+            item = self.source.item(index)
+            label = "Loading…" if item is None else self.format_row(item)
+            chosen = index == self.selected
+            y = slot * self.row_height
+            self.canvas.coords(rect, 0, y, width, y + self.row_height)
+            self.canvas.itemconfigure(rect, state="normal",
+                                      fill=self.colors["select_bg" if chosen else "bg"])
+            self.canvas.coords(text, 6, y + self.row_height // 2)
+            self.canvas.itemconfigure(text, state="normal", text=label,
+                                      fill=self.colors["select_fg" if chosen else "fg"])
+        self.scrollbar.set(*self._fraction(total))
+
+    def _fraction(self, total):
+        if not total:
+            return 0.0, 1.0
+        return self.top / total, min(1.0, (self.top + self.visible_rows()) / total)
+
+    # -- input ------------------------------------------------------------------
+
+    def _on_click(self, event):
+        self.canvas.focus_set()
+        index = self.top + event.y // self.row_height
+        if index < len(self.source):
+            self._pick(index)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas.
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        self.yview("scroll", -3 * notches, "units")
+
+    def _move(self, step):
+        current = self.selected if self.selected is not None else self.top - (step > 0)
+        self._pick(current + step)
+
+    def _pick(self, index):
+        total = len(self.source)
+        if not total:
+            return
+        self.selected = max(0, min(index, total - 1))
+        self.see(self.selected)
+        self.event_generate("<<ListboxSelect>>")
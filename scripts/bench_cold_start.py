@@ -0,0 +1,87 @@
+"""Time a JSON-engine cold start: parsing library.json vs mapping library.snap.
+
+For each library size the snapshot and its binary image are written once;
+then fresh processes open the store each way and time, from the start of
+the process's first store call:
+
+    open    JsonStore created and the library loaded (the first count())
+    get     one item by id
+    list    the whole library as JSON fragments (GET /media without paging)
+    indexed the first page by name, which builds the indexes the mapped
+            image puts off
+
+    python scripts/bench_cold_start.py --sizes 10000,100000,1000000
+
+The files are just written, so they come from the page cache; a cold disk
+adds the time to read library.json (whole) or the image pages touched.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_common import make_library
+
+MODES = ('json', 'image')
+
+
+def measure(mode, path, item_id):
+    """Run in the child process; returns one result dict."""
+    from json_store import JsonStore
+    timings = {}
+    t0 = time.perf_counter()
+    store = JsonStore(path, binary_snapshot=mode == 'image')
+    n = store.count()
+    timings['open'] = time.perf_counter() - t0
+    t = time.perf_counter()
+    assert store.get(item_id) is not None
+    timings['get'] = time.perf_counter() - t
+    t = time.perf_counter()
+    store.all_json()
+    timings['list'] = time.perf_counter() - t
+    t = time.perf_counter()
+    store.page(50, sort='name')
+    timings['indexed'] = time.perf_counter() - t
+    return {'mode': mode, 'items': n, **{k: round(v, 4) for k, v in timings.items()}}
+
+
+def write_files(path, n):
+    """Write library.json and library.snap for ``n`` items; returns one item id."""
+    from json_store import JsonStore
+    db = make_library(n)
+    store = JsonStore(path)
+    store.replace_all(db)
+    store.close()
+    return random.Random(n).choice(list(db))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated item counts')
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'PATH', 'ID'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    print(f"{'mode':<6} {'items':>9} {'open':>9} {'get':>9} {'list':>9} {'indexed':>9}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'library.json')
+            item_id = write_files(path, n)
+            for mode in MODES:
+                out = subprocess.run([sys.executable, __file__, '--child', mode, path, item_id],
+                                     capture_output=True, text=True)
+                if out.returncode != 0:
+                    sys.exit(f'{mode}, {n} items: failed\n{out.stderr}')
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{mode:<6} {n:>9}" + ''.join(f" {r[k] * 1000:>7.1f}ms" for k in ('open', 'get', 'list', 'indexed')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Shared helpers for the benchmark scripts: synthetic libraries and latency stats."""
+import json
+import random
+import sys
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+CATEGORIES = ['Book', 'Film', 'Magazine']
+SYLLABLES = ('ka ri to mo na el an or is ur ve la din mar sol tem gor fen '
+             'hal wyn bra cor dus ith quel ro sa ti').split()
+
+
+def _vocabulary(size, seed):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+# Title words and author names; picked with a log-uniform skew so a few are
+# very common and most are rare, as in a real catalogue.
+WORDS = _vocabulary(20000, 1)
+FIRST_NAMES = _vocabulary(400, 2)
+LAST_NAMES = _vocabulary(3000, 3)
+
+
+def _skewed(rng, pool):
+    return pool[int(len(pool) ** rng.random()) - 1]
+
+
+def make_item(rng):
+    """Build one random item in the API's JSON shape."""
+    item_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    # Recent years are denser than older ones.
+    day = date(2025, 12, 31) - timedelta(days=int(365 * 75 * rng.random() ** 2))
+    return {
+        'id': item_id,
+        'name': ' '.join(_skewed(rng, WORDS).title() for _ in range(rng.randint(1, 4))),
+        'publication_date': day.isoformat(),
+        'author': f'{_skewed(rng, FIRST_NAMES).title()} {_skewed(rng, LAST_NAMES).title()}',
+        # Books dominate, magazines are rare.
+        'category': rng.choices(CATEGORIES, weights=(6, 3, 1))[0],
+    }
+
+
+def make_library(n, seed=0):
+    """Return a dict of ``n`` synthetic items keyed by id."""
+    rng = random.Random(seed)
+    db = {}
+    for _ in range(n):
+        item = make_item(rng)
+        db[item['id']] = item
+    return db
+
+
+def write_library(path, n, seed=0):
+    """Write a synthetic library to ``path`` in the on-disk format and return it."""
+    db = make_library(n, seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('w', encoding='utf-8') as f:
+        json.dump(db, f, indent=2, ensure_ascii=False)
+    return db
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    k = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[k]
+
+
+def summarize(samples):
+    """Return p50/p95/p99/mean of a list of latencies in seconds, as milliseconds."""
+    s = sorted(samples)
+    return {
+        'n': len(s),
+        'p50_ms': round(percentile(s, 50) * 1000, 3),
+        'p95_ms': round(percentile(s, 95) * 1000, 3),
+        'p99_ms': round(percentile(s, 99) * 1000, 3),
+        'mean_ms': round(sum(s) / len(s) * 1000, 3) if s else 0.0,
+    }
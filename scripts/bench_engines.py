@@ -0,0 +1,79 @@
+"""Compare the json and sqlite storage engines on read, write and filter workloads.
+
+Each engine is loaded with the same synthetic library and driven through the
+storage module, i.e. the code path the Flask routes use.
+
+    python scripts/bench_engines.py --sizes 1000 100000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import make_library, summarize
+
+import storage
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+def run_engine(backend, path, db, ops, rng):
+    store = storage.open_store(backend, path)
+    t0 = time.perf_counter()
+    store.replace_all(db)
+    load_s = time.perf_counter() - t0
+    storage.use_store(store)
+    storage.count_items()
+
+    ids = list(db)
+    years = [str(y) for y in range(1955, 2025)]
+    words = [item['name'].split()[0] for item in rng.sample(list(db.values()), min(len(db), 200))]
+    results = {'bulk_load_s': round(load_s, 2)}
+    results['read_by_id'] = timed(storage.get_by_id, [(rng.choice(ids),) for _ in range(ops)])
+    results['page_category'] = timed(lambda c: storage.get_page(100, None, c),
+                                     [(rng.choice(['Book', 'Film', 'Magazine']),) for _ in range(ops // 10)])
+    results['date_range_month'] = timed(lambda y: storage.filter_by_date_range(f'{y}-03-01', f'{y}-03-31'),
+                                        [(rng.choice(years),) for _ in range(ops // 10)])
+    results['search'] = timed(storage.search_items, [(rng.choice(words),) for _ in range(ops // 10)])
+    results['create'] = timed(storage.create_item,
+                              [(f'Bench {i}', '2020-01-01', 'Bench Author', 'Book') for i in range(ops)])
+    results['update'] = timed(storage.update_item,
+                              [(i, 'Bench updated', '2021-01-01', 'Bench Author', 'Film')
+                               for i in rng.sample(ids, min(ops, len(ids)))])
+    storage.use_store(storage.open_store('json', Path(path).with_suffix('.unused.json')))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000])
+    ap.add_argument('--ops', type=int, default=1000, help='operations per read/write workload')
+    args = ap.parse_args()
+
+    report = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            db = make_library(n)
+            row = {'items': n}
+            for backend, name in (('json', 'library.json'), ('sqlite', 'library.db')):
+                path = Path(tmp) / str(n) / name
+                row[backend] = run_engine(backend, path, db, args.ops, random.Random(5))
+            report.append(row)
+            for workload in ('read_by_id', 'page_category', 'date_range_month', 'search', 'create', 'update'):
+                print(f"{n:>9} {workload:<17} json p50={row['json'][workload]['p50_ms']}ms "
+                      f"p99={row['json'][workload]['p99_ms']}ms | sqlite p50={row['sqlite'][workload]['p50_ms']}ms "
+                      f"p99={row['sqlite'][workload]['p99_ms']}ms")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
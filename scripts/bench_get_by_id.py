@@ -0,0 +1,59 @@
+"""Benchmark GET /media/<id> with the resident store against per-request file reloads.
+
+"before" invalidates the store ahead of every request, which reproduces the old
+behaviour of parsing library.json on each call; "after" serves from memory.
+
+    python scripts/bench_get_by_id.py --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import summarize, write_library
+
+import storage
+from app import app
+
+
+def run(client, ids, requests, reload_each):
+    rng = random.Random(1)
+    samples = []
+    for _ in range(requests):
+        item_id = rng.choice(ids)
+        if reload_each:
+            storage.invalidate_cache()
+        t0 = time.perf_counter()
+        r = client.get(f'/media/{item_id}')
+        samples.append(time.perf_counter() - t0)
+        assert r.status_code == 200, r.status_code
+    return summarize(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    ap.add_argument('--requests', type=int, default=2000, help='requests per size for the resident store')
+    ap.add_argument('--cold-requests', type=int, default=20, help='requests per size for the reload baseline')
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = Path(tmp) / f'library_{n}.json'
+            ids = list(write_library(path, n))
+            storage.set_db_path(path)
+            client = app.test_client()
+            client.get(f'/media/{ids[0]}')  # warm the resident copy
+            before = run(client, ids, args.cold_requests, reload_each=True)
+            after = run(client, ids, args.requests, reload_each=False)
+            results.append({'items': n, 'before': before, 'after': after})
+            print(f"{n:>9} items  before p50={before['p50_ms']}ms p99={before['p99_ms']}ms"
+                  f"  after p50={after['p50_ms']}ms p99={after['p99_ms']}ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Compare render time and memory of the GUI list: tk.Listbox vs VirtualList.
+
+For each library size a fresh process builds the items, then either fills a
+tk.Listbox one insert at a time (the old refresh_listbox) or hands them to
+the canvas-based VirtualList, and reports the time until the window has
+been drawn, the time to jump to the middle of the list and the resident
+memory the widget added:
+
+    python scripts/bench_gui_list.py --sizes 10000,100000,1000000
+
+Needs a display (on a headless Linux box run it under xvfb-run). RSS is read
+from /proc where available, otherwise the peak RSS is reported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench_common import make_library
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / 'frontend'
+WIDGETS = ('listbox', 'virtual')
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def fmt(item):
+    return f"{item.get('name')} ({item.get('category')})"
+
+
+def measure(widget, n):
+    """Run in the child process; returns one result dict."""
+    import tkinter as tk
+    sys.path.insert(0, str(FRONTEND_DIR))
+    from virtual_list import ListSource, VirtualList
+
+    root = tk.Tk()
+    root.geometry('600x800')
+    root.update()
+    items = list(make_library(n).values())
+    base = rss_mb()
+
+    t0 = time.perf_counter()
+    if widget == 'listbox':
+        view = tk.Listbox(root)
+        view.pack(fill='both', expand=True)
+        for item in items:
+            view.insert(tk.END, fmt(item))
+    else:
+        view = VirtualList(root, format_row=fmt)
+        view.pack(fill='both', expand=True)
+        view.set_source(ListSource(items))
+    root.update()
+    render = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    view.yview('moveto', 0.5)
+    root.update()
+    scroll = time.perf_counter() - t0
+    result = {'widget': widget, 'items': n, 'render_s': round(render, 3),
+              'scroll_ms': round(scroll * 1000, 2), 'widget_rss_mb': round(rss_mb() - base, 1)}
+    root.destroy()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated item counts')
+    parser.add_argument('--widgets', default=','.join(WIDGETS), help='listbox, virtual or both')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds allowed per run')
+    parser.add_argument('--child', nargs=2, metavar=('WIDGET', 'N'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], int(args.child[1]))))
+        return
+
+    print(f"{'widget':<9} {'items':>9} {'render':>10} {'scroll':>10} {'widget RSS':>11}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        for widget in args.widgets.split(','):
+            try:
+                out = subprocess.run([sys.executable, __file__, '--child', widget, str(n)],
+                                     capture_output=True, text=True, timeout=args.timeout, check=True)
+            except subprocess.TimeoutExpired:
+                print(f'{widget:<9} {n:>9} timed out after {args.timeout:g} s')
+                continue
+            except subprocess.CalledProcessError as e:
+                print(f'{widget:<9} {n:>9} failed: {e.stderr.strip().splitlines()[-1]}')
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{widget:<9} {n:>9} {r['render_s']:>9.3f}s {r['scroll_ms']:>8.2f}ms {r['widget_rss_mb']:>9.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
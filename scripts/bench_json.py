@@ -0,0 +1,90 @@
+"""Time GET /media for a large library: jsonify of dicts vs joined item fragments.
+
+Rows, each through the Flask test client against a temporary JSON store:
+
+    flask default   jsonify(get_all()) with Flask's stock provider (the old path)
+    <codec> dicts   the same with JsonProvider
+    <codec> cold    items encoded once more, then cached as fragments
+    <codec> warm    the response joined from cached fragments
+
+where <codec> is stdlib and, if installed, orjson:
+
+    python scripts/bench_json.py --items 100000
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_common import make_library
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect()  # not the previous sample's garbage
+        t0 = time.perf_counter()
+        size = fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['LIBRARY_DATA_DIR'] = tmp  # before storage is imported
+    import json_codec
+    import storage
+    from app import create_app
+    from flask.json.provider import DefaultJSONProvider
+    from json_store import JsonStore
+
+    store = JsonStore(os.path.join(tmp, 'library.json'))
+    store.replace_all(make_library(args.items))
+    storage.use_store(store)
+    app = create_app()
+    client = app.test_client()
+
+    def full_list():
+        r = client.get('/media')
+        assert r.status_code == 200
+        return len(r.data)
+
+    def encode_dicts():
+        with app.test_request_context('/media'):
+            return len(app.json.response(storage.get_all()).data)
+
+    def cold():
+        store._clear_fragments()
+        return full_list()
+
+    rows = []
+    stock = app.json
+    app.json = DefaultJSONProvider(app)
+    rows.append(('flask default', *timed(encode_dicts, args.repeat)))
+    app.json = stock
+    codecs = ['stdlib'] + (['orjson'] if json_codec.orjson is not None else [])
+    for codec in codecs:
+        json_codec.BACKEND = codec
+        rows.append((f'{codec} dicts', *timed(encode_dicts, args.repeat)))
+        rows.append((f'{codec} cold', *timed(cold, args.repeat)))
+        full_list()
+        rows.append((f'{codec} warm', *timed(full_list, args.repeat)))
+
+    base = rows[0][1]
+    print(f'GET /media, {args.items} items, median of {args.repeat}')
+    print(f"{'path':<15} {'time':>10} {'body':>9} {'speed-up':>9}")
+    for name, seconds, size in rows:
+        print(f'{name:<15} {seconds * 1000:>8.1f}ms {size / 2 ** 20:>7.1f}MB {base / seconds:>8.2f}x')
+    store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Measure the memory the JSON engine needs per item: plain dicts vs compact records.
+
+For each library size a snapshot file is written once, then fresh processes
+load it three ways and report the resident memory that loading added:
+
+    dicts    json.loads of the snapshot, the old in-memory form
+    records  the same parse turned into records.Record objects
+    store    a full JsonStore load from the JSON (no binary image): records
+             plus sorted, hash and search indexes
+
+    python scripts/bench_memory.py --sizes 100000,1000000
+
+Run ``--variants store`` on an older commit to compare whole-store figures.
+RSS is read from /proc where available, otherwise the peak RSS is reported.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import make_library
+
+VARIANTS = ('dicts', 'records', 'store')
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def measure(variant, path):
+    """Run in the child process; returns one result dict."""
+    import json_store
+    gc.collect()
+    base = rss_mb()
+    t0 = time.perf_counter()
+    if variant == 'dicts':
+        data = json.loads(Path(path).read_bytes())
+    elif variant == 'records':
+        data = {r.id: r for r in json.loads(Path(path).read_bytes(), object_hook=json_store._record_hook).values()}
+    else:
+        data = json_store.JsonStore(path, binary_snapshot=False)
+        data.page(1)  # builds the indexes
+    load = time.perf_counter() - t0
+    gc.collect()
+    added = rss_mb() - base
+    n = data.count() if variant == 'store' else len(data)
+    return {'variant': variant, 'items': n, 'load_s': round(load, 3),
+            'rss_mb': round(added, 1), 'bytes_per_item': round(added * 2 ** 20 / max(n, 1))}
+
+
+def write_snapshot(path, n):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(make_library(n), f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100000,1000000', help='comma-separated item counts')
+    parser.add_argument('--variants', default=','.join(VARIANTS), help='comma-separated: ' + ', '.join(VARIANTS))
+    parser.add_argument('--child', nargs=2, metavar=('VARIANT', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    print(f"{'variant':<8} {'items':>9} {'load':>9} {'RSS added':>10} {'per item':>9}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'library.json')
+            write_snapshot(path, n)
+            for variant in args.variants.split(','):
+                out = subprocess.run([sys.executable, __file__, '--child', variant, path],
+                                     capture_output=True, text=True)
+                if out.returncode != 0:
+                    sys.exit(f'{variant}, {n} items: failed\n{out.stderr}')
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{variant:<8} {n:>9} {r['load_s']:>8.2f}s {r['rss_mb']:>8.1f}MB {r['bytes_per_item']:>7} B")
+
+
+if __name__ == '__main__':
+    main()
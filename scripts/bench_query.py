@@ -0,0 +1,122 @@
+"""Time filtered, sorted GET /media pages and check them against a brute-force filter.
+
+For each engine a library is loaded into a temporary store. Every query
+below is first run in both orders and paged through with cursors for a
+few pages, and the items and totals compared with filtering and sorting
+the whole library in Python; then the first page of 50 is timed. For the
+JSON engine the plan ``query.plan`` picked is printed too.
+
+    python scripts/bench_query.py --items 1000000
+
+The comparison keeps the timings honest at sizes tests/test_query.py
+does not reach; the script exits non-zero on any mismatch.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from bench_common import make_library
+
+PAGE = 50
+CHECK_PAGES = 3
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def cases(db):
+    """``(label, Query arguments)`` pairs covering each filter and their mixes."""
+    authors = Counter(item['author'] for item in db.values()).most_common()
+    common, rare = authors[0][0], authors[len(authors) // 2][0]
+    return [
+        ('category', dict(categories=['Magazine'], sort='name')),
+        ('two categories', dict(categories=['Film', 'Magazine'], sort='date')),
+        ('common author', dict(authors=[common], sort='date')),
+        ('rare author', dict(authors=[rare], sort='name')),
+        ('one year', dict(published_after='2020-01-01', published_before='2020-12-31', sort='name')),
+        ('since 2024', dict(published_after='2024-01-01', sort='id')),
+        ('category+month', dict(categories=['Magazine'], published_after='2021-03-01',
+                                published_before='2021-03-31', sort='date')),
+        ('author+category', dict(authors=[common, rare], categories=['Book'], sort='author')),
+        ('before 1960', dict(published_before='1959-12-31', sort='author')),
+    ]
+
+
+def expected(db, args, descending):
+    """The query's items in order, by brute force."""
+    categories, authors = set(args.get('categories', ())), set(args.get('authors', ()))
+    low, high = args.get('published_after'), args.get('published_before')
+    items = [i for i in db.values()
+             if (not categories or i['category'] in categories)
+             and (not authors or i['author'] in authors)
+             and (low is None or i['publication_date'] >= low)
+             and (high is None or i['publication_date'] <= high)]
+    field = {'id': 'id', 'name': 'name', 'date': 'publication_date', 'author': 'author'}[args['sort']]
+    items.sort(key=lambda i: (i[field].casefold(), i['id']), reverse=descending)
+    return items
+
+
+def check(store, db, label, args):
+    from query import Query
+    from store_base import SORT_FIELDS
+    field = SORT_FIELDS[args['sort']]
+    for descending in (False, True):
+        query = Query(descending=descending, **args)
+        want = expected(db, args, descending)
+        got, after, after_value = [], None, None
+        for _ in range(CHECK_PAGES):
+            items, total = store.query(query, PAGE, after, after_value)
+            if total != len(want):
+                sys.exit(f'{label}: total {total}, expected {len(want)}')
+            got.extend(items)
+            if len(items) < PAGE:
+                break
+            after, after_value = items[-1]['id'], items[-1][field]
+        if [i['id'] for i in got] != [i['id'] for i in want[:len(got)]] or len(got) < min(len(want), PAGE):
+            sys.exit(f"{label} ({'desc' if descending else 'asc'}): wrong items")
+        offset = min(len(want), 7)
+        items, _ = store.query(query, PAGE, offset=offset)
+        if [i['id'] for i in items] != [i['id'] for i in want[offset:offset + PAGE]]:
+            sys.exit(f"{label} ({'desc' if descending else 'asc'}): wrong items at offset {offset}")
+    return len(want)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--engines', default='json,sqlite')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['LIBRARY_DATA_DIR'] = tmp  # before storage is imported
+    import storage
+    from query import Query, plan
+
+    db = make_library(args.items)
+    print(f'{args.items} items, first page of {PAGE}, median of {args.repeat}')
+    print(f"{'engine':<7} {'query':<16} {'matches':>8} {'page':>9}  plan")
+    for engine in args.engines.split(','):
+        store = storage.open_store(engine)
+        store.replace_all(db)
+        for label, query_args in cases(db):
+            matches = check(store, db, label, query_args)
+            query = Query(**query_args)
+            page_s = timed(lambda: store.query_json(query, PAGE), args.repeat)
+            chosen = plan(query, store._indexes, store.count(), PAGE) if engine == 'json' else ''
+            print(f'{engine:<7} {label:<16} {matches:>8} {page_s * 1000:>7.2f}ms  {chosen}')
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Benchmark ranked search (GET /media/search?q=) against catalogue size.
+
+Builds a synthetic library, loads it into the store (which builds the
+inverted index once) and times single-word, prefix and multi-word queries
+through the Flask test client.
+
+    python scripts/bench_search.py --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from bench_common import summarize, write_library
+
+import storage
+from app import app
+
+
+def sample_queries(items, count, seed=2):
+    """Derive realistic queries from the titles and authors in the library."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        item = rng.choice(items)
+        name_words = item['name'].split()
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(rng.choice(name_words))
+        elif kind == 1:
+            word = rng.choice(name_words)
+            queries.append(word[:max(2, len(word) // 2)])
+        elif kind == 2:
+            queries.append(' '.join(name_words[:2]))
+        else:
+            queries.append(f"{name_words[0][:3]} {item['author'].split()[-1]}")
+    return queries
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    ap.add_argument('--queries', type=int, default=1000)
+    ap.add_argument('--limit', type=int, default=50)
+    args = ap.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = Path(tmp) / f'library_{n}.json'
+            items = list(write_library(path, n).values())
+            storage.set_db_path(path)
+            t0 = time.perf_counter()
+            storage.load_db()
+            load_s = time.perf_counter() - t0
+            client = app.test_client()
+            samples = []
+            store_samples = []
+            for q in sample_queries(items, args.queries):
+                t0 = time.perf_counter()
+                storage.search_items(q, args.limit)
+                store_samples.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                r = client.get('/media/search', query_string={'q': q, 'limit': args.limit})
+                samples.append(time.perf_counter() - t0)
+                assert r.status_code == 200, r.status_code
+            row = {'items': n, 'load_and_index_s': round(load_s, 2),
+                   'store': summarize(store_samples), 'http': summarize(samples)}
+            results.append(row)
+            print(f"{n:>9} items  store p50={row['store']['p50_ms']}ms p99={row['store']['p99_ms']}ms"
+                  f"  http p50={row['http']['p50_ms']}ms p99={row['http']['p99_ms']}ms")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
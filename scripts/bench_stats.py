@@ -0,0 +1,77 @@
+"""Time GET /media/stats against counting a downloaded GET /media on the client.
+
+For each engine a library is loaded into a temporary store and each
+grouping is requested through the Flask test client, with and without a
+one-year date range, next to the old way: fetch every item and count.
+
+    python scripts/bench_stats.py --items 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from bench_common import make_library
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['LIBRARY_DATA_DIR'] = tmp  # before storage is imported
+    import storage
+    from app import create_app
+
+    db = make_library(args.items)
+    print(f'{args.items} items, median of {args.repeat}')
+    print(f"{'engine':<7} {'group_by':<9} {'range':<6} {'client':>10} {'stats':>9} {'groups':>7}")
+    for engine in ('json', 'sqlite'):
+        store = storage.open_store(engine)
+        store.replace_all(db)
+        storage.use_store(store)
+        client = create_app().test_client()
+        client.get('/media/stats')  # the JSON engine builds its indexes on first use
+
+        for group in ('category', 'year', 'author'):
+            for ranged in (False, True):
+                query = {'group_by': group}
+                if ranged:
+                    query.update(start='2020-01-01', end='2020-12-31')
+
+                def download():
+                    items = client.get('/media').get_json()
+                    if ranged:
+                        items = [i for i in items if query['start'] <= i['publication_date'] <= query['end']]
+                    if group == 'year':
+                        return Counter(int(i['publication_date'][:4]) for i in items)
+                    return Counter(i[group] for i in items)
+
+                def stats():
+                    # A fresh request each time, not a 304.
+                    return client.get('/media/stats', query_string=query).get_json()
+
+                groups = len(stats()['groups'])
+                assert groups == len(download())
+                client_s, stats_s = timed(download, args.repeat), timed(stats, args.repeat)
+                print(f"{engine:<7} {group:<9} {'year' if ranged else 'all':<6} "
+                      f'{client_s * 1000:>8.1f}ms {stats_s * 1000:>7.2f}ms {groups:>7}')
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Benchmark suite for the storage layer and the API, with JSON reports to compare commits.
+
+Synthetic libraries (see bench_common: skewed categories, recent dates
+denser) are driven by read-heavy, mixed and write-heavy workloads, once
+through the storage functions the routes call and once through the Flask
+test client. Every size/engine pair runs in its own process so its peak
+RSS can be reported; operation sequences are seeded, so two runs of the
+same commit do the same work.
+
+    python scripts/bench_suite.py --sizes 1000,100000 --output before.json
+    python scripts/bench_suite.py --sizes 1000,100000 --output after.json --compare before.json
+
+With --compare the exit status is 1 if throughput or a latency percentile
+got worse than --threshold percent on any workload.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from bench_common import BACKEND_DIR, CATEGORIES, make_library, summarize
+
+# Share of reads in each workload.
+WORKLOADS = {'read_heavy': 0.9, 'mixed': 0.5, 'write_heavy': 0.2}
+READS = {'get': 50, 'page': 20, 'category': 10, 'search': 10, 'date': 10}
+WRITES = {'create': 50, 'update': 40, 'delete': 10}
+LAYERS = ('storage', 'api')
+# Compared by --compare: (key, True if higher is better).
+COMPARED = (('throughput_ops_s', True), ('p50_ms', False), ('p95_ms', False), ('p99_ms', False))
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, 1)
+
+
+def plan(workload, ops, seed):
+    """The seeded sequence of operation names for one workload run."""
+    rng = random.Random(seed)
+    reads, writes = list(READS), list(WRITES)
+    names = []
+    for _ in range(ops):
+        if rng.random() < WORKLOADS[workload]:
+            names.append(rng.choices(reads, weights=READS.values())[0])
+        else:
+            names.append(rng.choices(writes, weights=WRITES.values())[0])
+    return names
+
+
+class Driver:
+    """Turns operation names into calls, against storage or the API."""
+
+    def __init__(self, layer, db, seed):
+        self.layer = layer
+        self.rng = random.Random(seed)
+        self.ids = list(db)
+        self.words = [item['name'].split()[0] for item in self.rng.sample(list(db.values()), min(len(db), 500))]
+        self.serial = 0
+        # Imported here: importing storage opens the configured data directory.
+        import storage
+        self.storage = storage
+        if layer == 'api':
+            from app import create_app
+            self.client = create_app().test_client()
+
+    def fields(self):
+        self.serial += 1
+        year = self.rng.randint(1950, 2025)
+        return (f'Bench Title {self.serial}', f'{year}-0{self.rng.randint(1, 9)}-1{self.rng.randint(0, 9)}',
+                'Bench Author', self.rng.choice(CATEGORIES))
+
+    def run(self, op):
+        rng = self.rng
+        if self.layer == 'storage':
+            storage = self.storage
+            if op == 'get':
+                storage.get_by_id(rng.choice(self.ids))
+            elif op == 'page':
+                storage.get_page(100)
+            elif op == 'category':
+                storage.get_page(100, None, rng.choice(CATEGORIES))
+            elif op == 'search':
+                storage.search_items(rng.choice(self.words), 20)
+            elif op == 'date':
+                year = rng.randint(1950, 2025)
+                storage.filter_by_date_range(f'{year}-03-01', f'{year}-03-31')
+            elif op == 'create':
+                self.ids.append(storage.create_item(*self.fields())['id'])
+            elif op == 'update':
+                storage.update_item(rng.choice(self.ids), *self.fields())
+            elif op == 'delete':
+                storage.delete_item(self.ids.pop(rng.randrange(len(self.ids))))
+            return
+        c = self.client
+        if op == 'get':
+            r = c.get(f'/media/{rng.choice(self.ids)}')
+        elif op == 'page':
+            r = c.get('/media', query_string={'limit': 100})
+        elif op == 'category':
+            r = c.get('/media', query_string={'limit': 100, 'category': rng.choice(CATEGORIES)})
+        elif op == 'search':
+            r = c.get('/media/search', query_string={'q': rng.choice(self.words), 'limit': 20})
+        elif op == 'date':
+            r = c.get('/media', query_string={'limit': 100, 'sort': 'date'})
+        elif op == 'create':
+            name, date, author, category = self.fields()
+            r = c.post('/media', json={'name': name, 'publication_date': date, 'author': author,
+                                       'category': category})
+            self.ids.append(r.get_json()['id'])
+        elif op == 'update':
+            name, date, author, category = self.fields()
+            r = c.put(f'/media/{rng.choice(self.ids)}', json={'name': name, 'publication_date': date,
+                                                                'author': author, 'category': category})
+        else:
+            r = c.delete(f'/media/{self.ids.pop(rng.randrange(len(self.ids)))}')
+        if r.status_code >= 400:
+            raise RuntimeError(f'{op}: HTTP {r.status_code} {r.get_data(as_text=True)[:200]}')
+
+
+def run_child(n, engine, layers, workloads, ops, seed, data_dir):
+    """Run every workload for one library size and engine; prints one JSON document."""
+    import storage
+    db = make_library(n, seed)
+    suffix = '.db' if engine == 'sqlite' else '.json'
+    results = []
+    for layer in layers:
+        for workload in workloads:
+            # A fresh copy of the library for every run, so writes of one
+            # workload do not change the next.
+            store = storage.open_store(engine, Path(data_dir) / f'{layer}-{workload}{suffix}')
+            t0 = time.perf_counter()
+            store.replace_all(db)
+            storage.use_store(store)
+            storage.count_items()
+            load_s = time.perf_counter() - t0
+            driver = Driver(layer, db, seed)
+            for op in plan(workload, min(50, ops), seed + 1):
+                driver.run(op)  # warm-up: indexes, caches, imports
+            samples, by_op = [], {}
+            t_start = time.perf_counter()
+            for op in plan(workload, ops, seed):
+                t0 = time.perf_counter()
+                driver.run(op)
+                elapsed = time.perf_counter() - t0
+                samples.append(elapsed)
+                by_op.setdefault(op, []).append(elapsed)
+            total = time.perf_counter() - t_start
+            results.append({
+                'items': n, 'engine': engine, 'layer': layer, 'workload': workload, 'ops': ops,
+                'load_s': round(load_s, 3),
+                'throughput_ops_s': round(ops / total, 1),
+                **summarize(samples),
+                'by_op': {op: summarize(s) for op, s in sorted(by_op.items())},
+            })
+    print(json.dumps({'results': results, 'peak_rss_mb': peak_rss_mb()}))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def key(row):
+    return row['items'], row['engine'], row['layer'], row['workload']
+
+
+def compare(report, baseline, threshold):
+    """Print the change of each compared metric; return the number of regressions."""
+    old = {key(row): row for row in baseline['results']}
+    regressions = 0
+    print(f"\nvs {baseline['meta'].get('commit')}: change in %, '!' marks a regression over {threshold:g}%")
+    for row in report['results']:
+        base = old.get(key(row))
+        if base is None:
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED:
+            if not base[metric]:
+                continue
+            change = (row[metric] - base[metric]) / base[metric] * 100
+            worse = -change if higher_is_better else change
+            mark = '!' if worse > threshold else ' '
+            regressions += mark == '!'
+            cells.append(f'{metric.replace("_ms", "").replace("throughput_ops_s", "ops/s")} {change:+6.1f}%{mark}')
+        print(f"{row['items']:>9} {row['engine']:<6} {row['layer']:<7} {row['workload']:<11} " + '  '.join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated item counts (up to 1000000)')
+    parser.add_argument('--engines', default='json', help='comma-separated: json, sqlite')
+    parser.add_argument('--layers', default=','.join(LAYERS), help='comma-separated: storage, api')
+    parser.add_argument('--workloads', default=','.join(WORKLOADS), help='comma-separated: ' + ', '.join(WORKLOADS))
+    parser.add_argument('--ops', type=int, default=2000, help='operations per workload run')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='a previous report to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    layers, workloads = args.layers.split(','), args.workloads.split(',')
+
+    if args.child:
+        n, engine, data_dir = args.child.split(',', 2)
+        run_child(int(n), engine, layers, workloads, args.ops, args.seed, data_dir)
+        return
+
+    report = {
+        'meta': {'commit': git_commit(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count(), 'ops': args.ops, 'seed': args.seed},
+        'results': [],
+    }
+    print(f"{'items':>9} {'engine':<6} {'layer':<7} {'workload':<11} {'ops/s':>9} {'p50':>8} {'p95':>8} "
+          f"{'p99':>8} {'peak RSS':>9}")
+    for n in (int(s) for s in args.sizes.split(',')):
+        for engine in args.engines.split(','):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, LIBRARY_DATA_DIR=tmp, LIBRARY_STORAGE=engine)
+                out = subprocess.run([sys.executable, __file__, '--child', f'{n},{engine},{tmp}',
+                                      '--layers', args.layers, '--workloads', args.workloads,
+                                      '--ops', str(args.ops), '--seed', str(args.seed)],
+                                     env=env, capture_output=True, text=True)
+            if out.returncode != 0:
+                sys.exit(f'{n} items, {engine}: benchmark failed\n{out.stderr}')
+            child = json.loads(out.stdout.strip().splitlines()[-1])
+            for row in child['results']:
+                row['peak_rss_mb'] = child['peak_rss_mb']
+                report['results'].append(row)
+                print(f"{n:>9} {engine:<6} {row['layer']:<7} {row['workload']:<11} {row['throughput_ops_s']:>9.1f} "
+                      f"{row['p50_ms']:>6.3f}ms {row['p95_ms']:>6.3f}ms {row['p99_ms']:>6.3f}ms "
+                      f"{child['peak_rss_mb'] or 0:>7.1f}MB")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding='utf-8')
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Microbenchmark: validating item rows in bulk.
+
+Compares the per-item checks storage.py used to run (the date pattern
+looked up through re.match and the category list rebuilt on every call,
+stopping at the first error) with validation.validate_many, which also
+checks calendar dates and reports every bad field:
+
+    python scripts/bench_validation.py --rows 100000 --invalid 0.1
+"""
+import argparse
+import random
+import re
+import time
+
+from bench_common import make_library
+from validation import validate_many
+
+
+def legacy_build_item(item_id, name, pub_date, author, category):
+    """The validation storage.build_item did before validation.py."""
+    if not name or not isinstance(name, str) or not name.strip():
+        raise ValueError("Name is required and must be a non-empty string")
+    if not pub_date or not isinstance(pub_date, str) or not pub_date.strip():
+        raise ValueError("Publication date is required")
+    if not author or not isinstance(author, str) or not author.strip():
+        raise ValueError("Author is required and must be a non-empty string")
+    if not category or not isinstance(category, str) or not category.strip():
+        raise ValueError("Category is required")
+    if not re.match(r'^\d{4}-\d{2}-\d{2}$', pub_date.strip()):
+        raise ValueError("Publication date must be in YYYY-MM-DD format")
+    valid_categories = ["Book", "Film", "Magazine"]
+    if category.strip() not in valid_categories:
+        raise ValueError(f"Category must be one of: {', '.join(valid_categories)}")
+    return {"id": item_id, "name": name.strip(), "publication_date": pub_date.strip(),
+            "author": author.strip(), "category": category.strip()}
+
+
+def legacy(rows):
+    out = []
+    for row in rows:
+        try:
+            out.append(legacy_build_item(None, row['name'], row['publication_date'], row['author'], row['category']))
+        except ValueError as e:
+            out.append(str(e))
+    return out
+
+
+BREAKAGES = (
+    ('name', '   '),
+    ('publication_date', '2021-02-30'),
+    ('publication_date', '21-2-3'),
+    ('author', None),
+    ('category', 'Comic'),
+)
+
+
+def make_rows(n, invalid, seed):
+    rng = random.Random(seed)
+    rows = []
+    for item in make_library(n, seed).values():
+        row = {k: item[k] for k in ('name', 'publication_date', 'author', 'category')}
+        if rng.random() < invalid:
+            field, value = rng.choice(BREAKAGES)
+            row[field] = value
+        rows.append(row)
+    return rows
+
+
+def best_times(checks, rows, repeat):
+    """Best time of each check; they take turns so machine noise hits them alike."""
+    best = {}
+    for _ in range(repeat):
+        for name, fn in checks:
+            t0 = time.perf_counter()
+            fn(rows)
+            elapsed = time.perf_counter() - t0
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--invalid', type=float, default=0.1, help='share of rows with a bad field')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows, args.invalid, args.seed)
+    # Rows the old checks wrongly accept.
+    invalid = validate_many(rows)[1]
+    missed = sum(1 for index, old in enumerate(legacy(rows)) if index in invalid and isinstance(old, dict))
+    print(f'{args.rows} rows, {args.invalid:.0%} invalid, best of {args.repeat}')
+    print(f"{'checks':<14} {'time':>9} {'rows/s':>12}")
+    for name, seconds in best_times((('legacy', legacy), ('validate_many', validate_many)), rows, args.repeat).items():
+        print(f'{name:<14} {seconds * 1000:>7.1f}ms {args.rows / seconds:>12,.0f}')
+    print(f'impossible dates the legacy checks let through: {missed}')
+
+
+if __name__ == '__main__':
+    main()
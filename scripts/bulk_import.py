@@ -0,0 +1,78 @@
+"""Bulk-load items through POST /media/batch.
+
+Reads an NDJSON file (one row per line) or a JSON array and streams it to
+the backend in batches. Rows are create/update/delete operations; rows
+without an "op" use --op (default create), so an NDJSON export can be
+imported as-is.
+
+    python scripts/bulk_import.py items.ndjson --batch-size 5000
+"""
+import argparse
+import itertools
+import json
+import sys
+
+import requests
+
+BASE = 'http://127.0.0.1:5000'
+
+
+def read_rows(path, default_op):
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        rows = json.load(f) if head == '[' else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            if isinstance(row, dict) and 'op' not in row:
+                row = {'op': default_op, **row}
+                if default_op == 'create':
+                    row.pop('id', None)
+            yield row
+
+
+def send(session, base, batch, atomic):
+    body = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch).encode('utf-8')
+    r = session.post(f'{base}/media/batch', params={'atomic': str(atomic).lower()}, data=body,
+                     headers={'Content-Type': 'application/x-ndjson'}, timeout=600)
+    try:
+        return r.status_code, r.json()
+    except ValueError:
+        return r.status_code, {'error': r.text}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('path', help='NDJSON or JSON array file')
+    ap.add_argument('--base', default=BASE)
+    ap.add_argument('--batch-size', type=int, default=5000)
+    ap.add_argument('--op', default='create', choices=('create', 'update', 'delete'),
+                    help='operation for rows that do not name one')
+    ap.add_argument('--non-atomic', action='store_true',
+                    help='commit the valid rows of a batch even if others fail')
+    args = ap.parse_args()
+
+    rows = read_rows(args.path, args.op)
+    session = requests.Session()
+    applied = failed = 0
+    for batch_no in itertools.count():
+        batch = list(itertools.islice(rows, args.batch_size))
+        if not batch:
+            break
+        offset = batch_no * args.batch_size
+        status, result = send(session, args.base, batch, not args.non_atomic)
+        if 'error' in result:
+            print(f'batch {batch_no} failed ({status}): {result["error"]}')
+            sys.exit(1)
+        applied += result['applied']
+        for err in result['errors']:
+            failed += 1
+            print(f'row {offset + err["row"]}: {err["error"]}')
+        print(f'batch {batch_no}: {result["applied"]} applied, {len(result["errors"])} errors')
+    print(f'done: {applied} applied, {failed} rows with errors')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
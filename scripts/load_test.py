@@ -0,0 +1,143 @@
+"""Measure requests per second of the backend under concurrent clients.
+
+By default a synthetic library is written to a temporary data directory and
+served twice, first by the development server (backend/app.py) and then by
+the production entry point (backend/serve.py), and both are driven with the
+same number of concurrent clients:
+
+    python scripts/load_test.py --items 20000 --processes 4 --threads 8 --duration 15
+
+Against an already running backend:
+
+    python scripts/load_test.py --url http://127.0.0.1:5000
+
+Each client loops over a read-heavy mix of item lookups, list pages and
+searches. Clients are spread over several processes so the load generator
+itself is not limited to one core.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from bench_common import BACKEND_DIR, summarize, write_library
+
+
+def client(url, ids, words, duration, seed):
+    rng = random.Random(seed)
+    session = requests.Session()
+    samples, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while True:
+        roll = rng.random()
+        if roll < 0.6:
+            path, params = f'/media/{rng.choice(ids)}', None
+        elif roll < 0.8:
+            path, params = '/media', {'limit': 50, 'fields': 'id,name,category'}
+        else:
+            path, params = '/media/search', {'q': rng.choice(words), 'limit': 20}
+        t0 = time.perf_counter()
+        if t0 >= deadline:
+            return samples, errors
+        try:
+            ok = session.get(url + path, params=params, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            samples.append(time.perf_counter() - t0)
+        else:
+            errors += 1
+
+
+def process_main(args):
+    proc, url, ids, words, threads, duration = args
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(client, url, ids, words, duration, proc * 1000 + t) for t in range(threads)]
+        results = [f.result() for f in futures]
+    return [s for samples, _ in results for s in samples], sum(errors for _, errors in results)
+
+
+def run_load(url, ids, words, processes, threads, duration):
+    jobs = [(p, url, ids, words, threads, duration) for p in range(processes)]
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(process_main, jobs)
+    elapsed = time.perf_counter() - t0
+    samples = [s for proc_samples, _ in results for s in proc_samples]
+    errors = sum(e for _, e in results)
+    return {'rps': round(len(samples) / elapsed, 1), 'errors': errors, **summarize(samples)}
+
+
+def wait_until_up(url, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with code {proc.returncode}')
+        try:
+            if requests.get(f'{url}/media', params={'limit': 1}, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f'server did not come up at {url}')
+
+
+def start_server(script, data_dir, port, log):
+    env = dict(os.environ, LIBRARY_DATA_DIR=str(data_dir), LIBRARY_PORT=str(port), LIBRARY_DEBUG='0')
+    return subprocess.Popen([sys.executable, str(BACKEND_DIR / script)], cwd=str(BACKEND_DIR),
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def print_result(label, result):
+    print(f"{label:<12} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:.1f} ms  "
+          f"p95 {result['p95_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms  errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='load an already running backend instead of starting servers')
+    parser.add_argument('--items', type=int, default=20000, help='size of the synthetic library')
+    parser.add_argument('--processes', type=int, default=4, help='client processes')
+    parser.add_argument('--threads', type=int, default=8, help='client threads per process')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds of load per server')
+    parser.add_argument('--port', type=int, default=5050, help='port for the servers started here')
+    args = parser.parse_args()
+    concurrency = args.processes * args.threads
+
+    if args.url:
+        items = requests.get(f'{args.url}/media', params={'limit': 1000}, timeout=30).json()
+        ids = [item['id'] for item in items] or ['missing']
+        words = [item['name'].split()[0] for item in items if item['name'].split()] or ['a']
+        print(f'{concurrency} concurrent clients for {args.duration:g} s against {args.url}')
+        print_result('backend', run_load(args.url, ids, words, args.processes, args.threads, args.duration))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        db = write_library(data_dir / 'library.json', args.items)
+        rng = random.Random(0)
+        ids = rng.sample(list(db), min(len(db), 5000))
+        words = [db[i]['name'].split()[0] for i in ids[:500]]
+        url = f'http://127.0.0.1:{args.port}'
+        print(f'{args.items} items, {concurrency} concurrent clients, {args.duration:g} s per server')
+        for label, script in (('dev server', 'app.py'), ('serve.py', 'serve.py')):
+            with open(data_dir / f'{script}.log', 'w') as log:
+                proc = start_server(script, data_dir, args.port, log)
+                try:
+                    wait_until_up(url, proc)
+                    print_result(label, run_load(url, ids, words, args.processes, args.threads, args.duration))
+                finally:
+                    proc.terminate()
+                    proc.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Copy the JSON library (snapshot plus mutation log) into a SQLite database.
+
+    python scripts/migrate_to_sqlite.py
+    python scripts/migrate_to_sqlite.py --source data/library.json --target data/library.db
+
+Afterwards run the backend with LIBRARY_STORAGE=sqlite. Existing rows in the
+target database are replaced.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+import config
+from json_store import JsonStore
+from sqlite_store import SqliteStore
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--source', type=Path, default=config.DATA_DIR / 'library.json')
+    ap.add_argument('--target', type=Path, default=config.SQLITE_PATH)
+    args = ap.parse_args()
+
+    if not args.source.exists():
+        print('Source not found:', args.source)
+        sys.exit(1)
+    t0 = time.perf_counter()
+    source = JsonStore(args.source)
+    items = source.all()
+    target = SqliteStore(args.target)
+    target.replace_all({item['id']: item for item in items})
+    copied = target.count()
+    target.close()
+    source.close()
+    print(f'Copied {copied} of {len(items)} items to {args.target} in {time.perf_counter() - t0:.1f}s')
+    if copied != len(items):
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Fire concurrent creates from many processes and threads and check none are lost.
+
+Against the storage layer (default) every process opens its own store on a
+shared temporary data directory, as separate server workers would:
+
+    python scripts/stress_test.py --engine both --processes 4 --threads 8 --creates 250
+
+Against a running backend the creates go over HTTP instead:
+
+    python scripts/stress_test.py --url http://127.0.0.1:5000
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from bench_common import BACKEND_DIR  # noqa: F401  (puts backend/ on sys.path)
+
+import storage
+from json_store import JsonStore
+
+
+def open_store(engine, data_dir, compact_bytes):
+    if engine == 'json':
+        return JsonStore(Path(data_dir) / 'library.json', compact_bytes=compact_bytes)
+    return storage.open_store('sqlite', Path(data_dir) / 'library.db')
+
+
+def create_via_storage(worker, creates):
+    ids = []
+    for i in range(creates):
+        item = storage.create_item(f'Stress {worker}-{i}', '2024-01-01', f'Worker {worker}', 'Book')
+        ids.append(item['id'])
+    return ids
+
+
+def create_via_http(url, worker, creates):
+    import requests
+    session = requests.Session()
+    ids = []
+    for i in range(creates):
+        r = session.post(f'{url}/media', json={'name': f'Stress {worker}-{i}', 'publication_date': '2024-01-01',
+                                               'author': f'Worker {worker}', 'category': 'Book'}, timeout=30)
+        r.raise_for_status()
+        ids.append(r.json()['id'])
+    return ids
+
+
+def process_main(args):
+    proc, engine, data_dir, url, threads, creates, compact_bytes = args
+    if not url:
+        storage.use_store(open_store(engine, data_dir, compact_bytes))
+    with ThreadPoolExecutor(threads) as pool:
+        futures = [pool.submit(create_via_http, url, f'{proc}.{t}', creates) if url
+                   else pool.submit(create_via_storage, f'{proc}.{t}', creates)
+                   for t in range(threads)]
+        ids = [i for f in futures for i in f.result()]
+    if not url:
+        storage.use_store(open_store(engine, data_dir, compact_bytes))  # waits for compaction
+    return ids
+
+
+def run(engine, data_dir, args):
+    expected = args.processes * args.threads * args.creates
+    jobs = [(p, engine, data_dir, args.url, args.threads, args.creates, args.compact_bytes)
+            for p in range(args.processes)]
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        ids = [i for chunk in pool.map(process_main, jobs) for i in chunk]
+    elapsed = time.perf_counter() - t0
+
+    if args.url:
+        import requests
+        session = requests.Session()
+        missing = [i for i in ids if session.get(f'{args.url}/media/{i}', timeout=30).status_code != 200]
+    else:
+        store = open_store(engine, data_dir, args.compact_bytes)
+        missing = [i for i in ids if store.get(i) is None]
+        store.close()
+    label = args.url or engine
+    print(f'{label}: {len(ids)}/{expected} creates acknowledged in {elapsed:.1f}s '
+          f'({len(ids) / elapsed:.0f}/s), {len(set(ids))} unique ids, {len(missing)} missing after reload')
+    return len(ids) == expected and len(set(ids)) == expected and not missing
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--engine', choices=('json', 'sqlite', 'both'), default='both')
+    ap.add_argument('--url', help='stress a running backend over HTTP instead of the storage layer')
+    ap.add_argument('--processes', type=int, default=4)
+    ap.add_argument('--threads', type=int, default=8)
+    ap.add_argument('--creates', type=int, default=250, help='creates per thread')
+    ap.add_argument('--compact-bytes', type=int, default=64 * 1024,
+                    help='json engine: small threshold so compactions race with writers')
+    args = ap.parse_args()
+
+    ok = True
+    if args.url:
+        ok = run(None, None, args)
+    else:
+        engines = ('json', 'sqlite') if args.engine == 'both' else (args.engine,)
+        for engine in engines:
+            with tempfile.TemporaryDirectory() as tmp:
+                ok = run(engine, tmp, args) and ok
+    print('STRESS TEST PASSED' if ok else 'STRESS TEST FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
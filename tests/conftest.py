@@ -0,0 +1,53 @@
+"""Shared fixtures: the backend on sys.path and a Flask test client per engine.
+
+The data directory is pointed at a temporary one before ``storage`` is
+imported, so the tests never touch ``data/library.json``.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ["LIBRARY_DATA_DIR"] = tempfile.mkdtemp(prefix="library-tests-")
+
+import pytest  # noqa: E402
+
+import storage  # noqa: E402
+from app import create_app  # noqa: E402
+
+ENGINES = ("json", "sqlite")
+
+
+@pytest.fixture(params=ENGINES)
+def engine(request):
+    return request.param
+
+
+@pytest.fixture
+def store(engine, tmp_path):
+    """An empty store of each engine, used by the storage module for the test."""
+    name = "library.json" if engine == "json" else "library.db"
+    store = storage.open_store(engine, tmp_path / name)
+    storage.use_store(store)
+    yield store
+    storage.use_store(storage.open_store("json", tmp_path / "unused.json"))
+
+
+@pytest.fixture
+def client(store):
+    return create_app().test_client()
+
+
+def make_item(n, **fields):
+    """Item ``n`` of a small synthetic library; ``fields`` override its values."""
+    item = {
+        "id": f"00000000-0000-4000-8000-{n:012d}",
+        "name": f"Title {n:04d}",
+        "publication_date": f"{2000 + n % 20}-{1 + n % 12:02d}-{1 + n % 28:02d}",
+        "author": f"Author {n % 7}",
+        "category": ("Book", "Film", "Magazine")[n % 3],
+    }
+    item.update(fields)
+    return item
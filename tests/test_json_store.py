@@ -0,0 +1,70 @@
+"""JsonStore recovery from a compaction that died."""
+import pytest
+
+from conftest import make_item
+from json_store import JsonStore
+
+
+def crash_compaction(store, monkeypatch):
+    """Make the store's next compaction die after rotating the log, as a crash would."""
+    def die(snapshot):
+        store._compact_lock.release()
+        store._compactor = None
+    monkeypatch.setattr(store, "_compact", die)
+
+
+@pytest.mark.parametrize("reopen", [True, False])
+def test_leftover_compacting_log_is_merged(tmp_path, monkeypatch, reopen):
+    path = tmp_path / "library.json"
+    store = JsonStore(path, compact_bytes=2 ** 30)
+    store.replace_all({item["id"]: item for item in map(make_item, range(5))})
+    store.put(make_item(5))
+    store.put(make_item(1, name="Renamed"))
+    store.compact_bytes = 1
+    crash_compaction(store, monkeypatch)
+    store.put(make_item(6))
+    store.wait_for_compaction()
+    assert store.compacting_path.exists()
+    before = store.version_info()[0]
+
+    if reopen:
+        store = JsonStore(path, compact_bytes=2 ** 30)
+        assert not store.compacting_path.exists()
+    monkeypatch.undo()
+    store.compact_bytes = 2 ** 30
+    store.delete(make_item(1)["id"])
+    store.put(make_item(7))
+    # A compaction that finishes now must not leave records behind to replay.
+    store.compact_bytes = 1
+    store.put(make_item(8))
+    store.wait_for_compaction()
+    assert not store.compacting_path.exists()
+
+    fresh = JsonStore(path)
+    want = {item["id"]: item for item in map(make_item, (0, 2, 3, 4, 5, 6, 7, 8))}
+    assert {item["id"]: item for item in fresh.all()} == want
+    versions = [fresh.get_versioned(item_id)[1] for item_id in want]
+    assert min(versions) > 0
+    assert fresh.version_info()[0] == store.version_info()[0] > before + 2
+
+
+def test_log_rotated_without_version_record_keeps_versions(tmp_path):
+    path = tmp_path / "library.json"
+    store = JsonStore(path, compact_bytes=2 ** 30)
+    store.replace_all({item["id"]: item for item in map(make_item, range(5))})
+    store.put(make_item(5))
+    # Died right after rotating, before the new log's version record.
+    store.log_path.replace(store.compacting_path)
+    before = store.version_info()[0]
+
+    store = JsonStore(path, compact_bytes=2 ** 30)
+    store.put(make_item(6))
+    store.compact_bytes = 1
+    store.put(make_item(7))
+    store.wait_for_compaction()
+
+    fresh = JsonStore(path)
+    ids = [make_item(n)["id"] for n in range(8)]
+    assert [fresh.get_versioned(item_id)[0]["id"] for item_id in ids] == ids
+    assert min(fresh.get_versioned(item_id)[1] for item_id in ids) > 0
+    assert fresh.version_info()[0] == before + 2
@@ -0,0 +1,178 @@
+"""GET /media filters: date range, author, several categories, sort and order."""
+import pytest
+
+from conftest import make_item
+
+FIELDS = {"id": "id", "name": "name", "date": "publication_date", "author": "author"}
+
+
+@pytest.fixture
+def library(store):
+    items = [make_item(n) for n in range(300)]
+    # Items on the bounds used below, and an author differing only in case.
+    items.append(make_item(300, publication_date="2005-03-01", author="author 1"))
+    items.append(make_item(301, publication_date="2005-03-31", category="Magazine"))
+    db = {item["id"]: item for item in items}
+    store.replace_all(db)
+    return db
+
+
+def listing(client, **params):
+    resp = client.get("/media", query_string=params)
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()
+
+
+def page_through(client, limit=7, **params):
+    """Every page of a paged listing, following X-Next-Cursor; returns items and totals."""
+    items, totals, cursor = [], set(), None
+    while True:
+        query = dict(params, limit=limit, **({"cursor": cursor} if cursor else {}))
+        resp = client.get("/media", query_string=query)
+        assert resp.status_code == 200, resp.get_json()
+        items.extend(resp.get_json())
+        totals.add(int(resp.headers["X-Total-Count"]))
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            return items, totals
+
+
+def expected(db, categories=(), authors=(), low=None, high=None, sort="id", descending=False):
+    items = [i for i in db.values()
+             if (not categories or i["category"] in categories)
+             and (not authors or i["author"] in authors)
+             and (low is None or i["publication_date"] >= low)
+             and (high is None or i["publication_date"] <= high)]
+    field = FIELDS[sort]
+    items.sort(key=lambda i: (i[field].casefold(), i["id"]), reverse=descending)
+    return items
+
+
+def ids(items):
+    return [i["id"] for i in items]
+
+
+@pytest.mark.parametrize("after, before", [("published_after", "published_before"),
+                                           ("date_from", "date_to")])
+def test_date_bounds_are_inclusive(client, library, after, before):
+    items = listing(client, **{after: "2005-03-01", before: "2005-03-31"})
+    want = expected(library, low="2005-03-01", high="2005-03-31")
+    assert sorted(ids(items)) == sorted(ids(want))
+    dates = {i["publication_date"] for i in items}
+    assert {"2005-03-01", "2005-03-31"} <= dates
+    assert min(dates) >= "2005-03-01" and max(dates) <= "2005-03-31"
+
+
+def test_open_ended_date_ranges(client, library):
+    assert sorted(ids(listing(client, published_after="2015-06-01"))) == \
+        sorted(ids(expected(library, low="2015-06-01")))
+    assert sorted(ids(listing(client, date_to="2001-12-31"))) == \
+        sorted(ids(expected(library, high="2001-12-31")))
+
+
+@pytest.mark.parametrize("param", ["published_after", "published_before", "date_from", "date_to"])
+@pytest.mark.parametrize("value", ["2020-02-30", "2020", "2020-1-05", "yesterday"])
+def test_invalid_dates_are_rejected(client, library, param, value):
+    resp = client.get("/media", query_string={param: value})
+    assert resp.status_code == 400
+    assert param in resp.get_json()["error"]
+
+
+def test_author_matches_exactly(client, library):
+    items = listing(client, author="Author 1")
+    assert items and {i["author"] for i in items} == {"Author 1"}
+    assert sorted(ids(items)) == sorted(ids(expected(library, authors={"Author 1"})))
+    assert ids(listing(client, author="author 1")) == ids(expected(library, authors={"author 1"}))
+    assert listing(client, author="Nobody") == []
+
+
+def test_repeated_authors_and_categories(client, library):
+    resp = client.get("/media", query_string=[("author", "Author 2"), ("author", "Author 5"),
+                                              ("category", "Film"), ("category", "Magazine")])
+    want = expected(library, categories={"Film", "Magazine"}, authors={"Author 2", "Author 5"})
+    assert want and sorted(ids(resp.get_json())) == sorted(ids(want))
+    # Comma-separated categories mean the same as repeated ones.
+    assert sorted(ids(listing(client, category="Film,Magazine"))) == \
+        sorted(ids(expected(library, categories={"Film", "Magazine"})))
+
+
+@pytest.mark.parametrize("sort", list(FIELDS))
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_filters_with_sort_and_cursor_paging(client, library, sort, order):
+    params = [("category", "Book"), ("category", "Magazine"),
+              ("published_after", "2003-01-01"), ("published_before", "2016-12-31")]
+    items, cursor = [], None
+    while True:
+        query = params + [("sort", sort), ("order", order), ("limit", 9)]
+        if cursor:
+            query.append(("cursor", cursor))
+        resp = client.get("/media", query_string=query)
+        items.extend(resp.get_json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    want = expected(library, categories={"Book", "Magazine"}, low="2003-01-01", high="2016-12-31",
+                    sort=sort, descending=order == "desc")
+    assert len(want) > 9 and ids(items) == ids(want)
+    assert int(resp.headers["X-Total-Count"]) == len(want)
+
+
+def test_author_with_date_range_and_offset(client, library):
+    params = {"author": "Author 3", "date_from": "2004-01-01", "sort": "date", "order": "desc"}
+    want = expected(library, authors={"Author 3"}, low="2004-01-01", sort="date", descending=True)
+    resp = client.get("/media", query_string=dict(params, limit=5, offset=4))
+    assert ids(resp.get_json()) == ids(want[4:9])
+    assert int(resp.headers["X-Total-Count"]) == len(want)
+
+
+@pytest.mark.parametrize("params", [
+    {"published_after": "2010-01-01"},
+    {"author": "Author 4", "published_before": "2012-06-30"},
+    {"category": "Film,Magazine", "date_from": "2001-01-01", "date_to": "2018-12-31"},
+])
+def test_filters_match_the_unfiltered_list_filtered_in_python(client, library, params):
+    everything = listing(client)
+    low = params.get("published_after") or params.get("date_from")
+    high = params.get("published_before") or params.get("date_to")
+    categories = set(params["category"].split(",")) if "category" in params else set()
+    want = [i for i in everything
+            if (low is None or i["publication_date"] >= low)
+            and (high is None or i["publication_date"] <= high)
+            and (not categories or i["category"] in categories)
+            and ("author" not in params or i["author"] == params["author"])]
+    assert sorted(ids(listing(client, **params))) == sorted(ids(want))
+    paged, totals = page_through(client, **params, sort="id")
+    assert ids(paged) == sorted(ids(want)) and totals == {len(want)}
+
+
+def test_order_and_cursor_errors(client, library):
+    assert client.get("/media", query_string={"order": "up"}).status_code == 400
+    resp = client.get("/media", query_string={"sort": "name", "order": "desc", "limit": 5})
+    cursor = resp.headers["X-Next-Cursor"]
+    resp = client.get("/media", query_string={"sort": "name", "cursor": cursor})
+    assert resp.status_code == 400
+    assert "different sort order" in resp.get_json()["error"]
+
+
+@pytest.mark.parametrize("sort", list(FIELDS))
+def test_sort_and_offset_without_limit_return_the_whole_listing(client, library, sort):
+    resp = client.get("/media", query_string={"sort": sort, "order": "desc"})
+    assert "X-Next-Cursor" not in resp.headers
+    want = expected(library, sort=sort, descending=True)
+    assert ids(resp.get_json()) == ids(want)
+    assert ids(listing(client, sort=sort, offset=290)) == ids(expected(library, sort=sort)[290:])
+
+
+@pytest.mark.parametrize("sort", ["name", "author"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_non_ascii_names_sort_by_casefold(client, store, sort, order):
+    words = ["Émile", "ébène", "Zoë", "zed", "Ärger", "apple", "Straße", "STRASSE", "éa"]
+    db = {}
+    for n, word in enumerate(words):
+        item = make_item(n, name=word, author=word)
+        db[item["id"]] = item
+    store.replace_all(db)
+    want = ids(expected(db, sort=sort, descending=order == "desc"))
+    assert ids(listing(client, sort=sort, order=order)) == want
+    items, _ = page_through(client, limit=2, sort=sort, order=order)
+    assert ids(items) == want
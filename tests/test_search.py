@@ -0,0 +1,70 @@
+"""Ranked search: an exact title comes first however many items share its words."""
+from conftest import make_item
+from records import Record
+from search import SearchIndex
+
+LIMIT = 10
+
+
+def iron_library():
+    """5,000 titles containing "Iron", then the one titled exactly "Iron"."""
+    items = [make_item(n, name=f"Iron Title {n:04d}", author="Someone") for n in range(5000)]
+    items.append(make_item(5000, name="Iron", author="Someone"))
+    return items
+
+
+def test_exact_title_outside_the_collected_candidates_ranks_first():
+    records = [Record.from_dict(item) for item in iron_library()]
+    index = SearchIndex()
+    index.rebuild(records)
+    exact = records[-1].id
+    # The precondition of the bug: the early-stopping walk over the "iron"
+    # postings collects limit * 4 ids and never reaches the exact title.
+    assert exact not in list(index._postings["name"]["iron"])[:LIMIT * 4]
+    names = {r.id: r.name for r in records}
+    assert index.search("iron", LIMIT, names.__getitem__)[0] == exact
+    assert index.search("IRON!", LIMIT, names.__getitem__)[0] == exact
+
+
+def test_exact_title_ranks_first_through_the_api(store, client):
+    store.replace_all({item["id"]: item for item in iron_library()})
+    resp = client.get("/media/search", query_string={"q": "iron", "limit": LIMIT})
+    assert resp.status_code == 200
+    items = resp.get_json()
+    assert len(items) == LIMIT
+    assert items[0]["name"] == "Iron"
+
+
+def test_top_results_match_scoring_every_candidate():
+    import random
+    rng = random.Random(4)
+    words = ["iron", "man", "steel", "irony", "mango", "ironclad", "manor", "stern"]
+    items = [make_item(n, name=" ".join(rng.choices(words, k=rng.randint(1, 4))).title(),
+                       author=" ".join(rng.choices(words, k=2)).title())
+             for n in range(3000)]
+    records = [Record.from_dict(item) for item in items]
+    index = SearchIndex()
+    index.rebuild(records)
+    names = {r.id: r.name for r in records}
+    for query in ["iron man", "man iron", "ir ma", "steel", "st iron man", "mango manor"]:
+        everything = index.search(query, 10 ** 6, names.__getitem__)
+        assert index.search(query, LIMIT, names.__getitem__) == everything[:LIMIT], query
+
+
+def test_equal_scores_come_in_title_order_on_both_engines(store, client):
+    items = [make_item(n, name=f"Iron Man {n}", author="Someone") for n in (3, 0, 4, 2)]
+    items += [make_item(n, name=f"Other {n}", author="Someone") for n in range(5, 40)]
+    store.replace_all({item["id"]: item for item in items})
+    found = client.get("/media/search", query_string={"q": "iron man"}).get_json()
+    assert [i["name"] for i in found] == ["Iron Man 0", "Iron Man 2", "Iron Man 3", "Iron Man 4"]
+
+
+def test_diacritics_and_case_are_ignored_on_both_engines(store, client):
+    items = [make_item(0, name="Pokémon Adventures", author="Someone"),
+             make_item(1, name="POKÉMON!", author="Someone"),
+             make_item(2, name="Pokemon Red", author="Someone")]
+    store.replace_all({item["id"]: item for item in items})
+    for query in ("pokemon", "Pokémon", "POKEMON"):
+        found = client.get("/media/search", query_string={"q": query}).get_json()
+        assert [i["name"] for i in found][0] == "POKÉMON!", query
+        assert len(found) == 3, query
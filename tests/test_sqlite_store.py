@@ -0,0 +1,18 @@
+"""SqliteStore details that the API tests do not show."""
+import gc
+import threading
+
+from sqlite_store import SqliteStore
+
+
+def test_connections_of_finished_threads_are_closed(tmp_path):
+    store = SqliteStore(tmp_path / "library.db")
+    store.count()
+    for _ in range(50):
+        thread = threading.Thread(target=store.count)
+        thread.start()
+        thread.join()
+    gc.collect()
+    assert len(store._connections) == 1  # the main thread's
+    store.close()
+    assert not store._connections
@@ -0,0 +1,45 @@
+"""GET /media/events and GET /media/export must stream, profiled or not."""
+import time
+
+import pytest
+
+import config
+import profiling
+from conftest import make_item
+
+
+@pytest.fixture(params=["off", "sample"])
+def profile_mode(request, monkeypatch):
+    monkeypatch.setattr(profiling.settings, "refresh", lambda: None)
+    monkeypatch.setattr(profiling.settings, "mode", request.param)
+    monkeypatch.setattr(profiling.settings, "threshold", 0.0)
+    monkeypatch.setattr(config, "PROFILE_DIR", config.DATA_DIR / "test-profiles")
+    return request.param
+
+
+def test_first_event_arrives_before_the_stream_ends(client, profile_mode, monkeypatch):
+    # A buffered stream would only come back after these seconds.
+    monkeypatch.setattr(config, "EVENT_STREAM_SECONDS", 5)
+    monkeypatch.setattr(config, "EVENT_HEARTBEAT_SECONDS", 1)
+    start = time.monotonic()
+    resp = client.get("/media/events", buffered=False)
+    try:
+        assert resp.is_streamed
+        assert "Content-Length" not in resp.headers
+        first = next(iter(resp.response))
+        assert time.monotonic() - start < 2
+        assert b"event: sync" in first
+    finally:
+        resp.close()
+
+
+def test_export_streams_line_by_line(store, client, profile_mode):
+    store.replace_all({item["id"]: item for item in map(make_item, range(2500))})
+    resp = client.get("/media/export", buffered=False)
+    try:
+        assert resp.is_streamed
+        assert "Content-Length" not in resp.headers
+        first = next(iter(resp.response))
+        assert first.split(b"\n", 1)[0].startswith(b'{"id": "00000000-')
+    finally:
+        resp.close()